@@ -0,0 +1,112 @@
+from checks.fleet_checks import *
+from checks.utils.nia_utils import NetworkInsightsPoller
+from checks.utils.virtual_clock import VirtualClock
+from fake_aws import FakeAWS
+import argparse
+import json
+import logging
+import sys
+import tracemalloc
+
+# configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger()
+
+# get args from the user
+parser = argparse.ArgumentParser(description='Benchmark the diagnosis pipeline against a local stand-in for AWS')
+parser.add_argument('--databases', type=int, nargs='+', help='Fleet sizes of Postgres databases to run', default=[1])
+parser.add_argument('--msk-clusters', type=int, help='Number of MSK clusters in each run', default=0)
+parser.add_argument('--brokers-per-cluster', type=int, help='Number of brokers per MSK cluster', default=3)
+parser.add_argument('--parameter-groups', type=int, help='Number of parameter groups shared by the databases', default=1)
+parser.add_argument('--latency-ms', type=float, help='Simulated latency of every AWS call', default=50)
+parser.add_argument('--nia-duration', type=float, help='Simulated Network Insights analysis duration in seconds', default=60)
+parser.add_argument('--max-parallel-targets', type=int, help='Number of targets to check concurrently', default=16)
+parser.add_argument('--max-workers', type=int, help='Number of checks to run concurrently per target', default=4)
+parser.add_argument('--output', type=str, help='Write the results as JSON to this file')
+parser.add_argument('--baseline', type=str, help='JSON results of a previous run to compare against')
+parser.add_argument('--tolerance', type=float, help='Allowed wall-clock regression against the baseline', default=0.25)
+parser.add_argument('--verbose', action='store_true', help='Keep the check log output')
+args = parser.parse_args()
+
+EKS_CLUSTER_NAME = 'onehouse-customer-cluster-bench'
+
+
+def run_benchmark(database_count: int) -> dict:
+    """
+    Run the fleet checks against a fake AWS of the given size and measure time, calls and memory
+    """
+    clock = VirtualClock()
+    fake_aws = FakeAWS(EKS_CLUSTER_NAME, database_count=database_count, msk_cluster_count=args.msk_clusters,
+                       brokers_per_cluster=args.brokers_per_cluster, parameter_group_count=args.parameter_groups,
+                       latency=args.latency_ms / 1000, nia_duration=args.nia_duration, clock=clock)
+    session = boto3.Session(region_name='us-west-2', aws_access_key_id='bench', aws_secret_access_key='bench')
+    fake_aws.attach(session)
+
+    # the calls are paced on the virtual clock too, so the rate limits show up as simulated queueing
+    aws_utils = AWSUtils(session=session, call_scheduler=CallScheduler(clock=clock.time, sleep=clock.sleep))
+    aws_utils.nia_poller = NetworkInsightsPoller(aws_utils.clients, clock=clock.time, sleep=clock.sleep)
+    # the fake hosts don't exist in DNS, so their addresses are served from the run cache
+    for host, ip_address in fake_aws.hosts.items():
+        aws_utils.cache.set(('dns', host), ip_address, pin=True)
+
+    fleet_checks = FleetChecks(aws_utils, EKS_CLUSTER_NAME, args.max_parallel_targets, args.max_workers)
+    database_names = [db['DBInstanceIdentifier'] for db in fake_aws.db_instances]
+    msk_cluster_arns = [cluster['ClusterArn'] for cluster in fake_aws.msk_clusters]
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    fleet_checks.perform_all_fleet_checks(database_names=database_names or None, msk_cluster_arns=msk_cluster_arns or None)
+    wall_clock = time.perf_counter() - start
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    scheduler_stats = aws_utils.call_scheduler.stats()
+
+    return {
+        'databases': database_count,
+        'msk_clusters': args.msk_clusters,
+        'wall_clock_s': round(wall_clock, 3),
+        'simulated_nia_wait_s': round(clock.time(), 1),
+        'peak_memory_kb': round(peak_memory / 1024),
+        'api_calls': sum(fake_aws.calls.values()),
+        'api_calls_by_operation': dict(sorted(fake_aws.calls.items())),
+        'simulated_queue_wait_s': round(sum(bucket['wait_s'] for bucket in scheduler_stats['buckets'].values()), 1),
+        'coalesced_calls': sum(scheduler_stats['coalesced'].values()),
+    }
+
+
+if not args.verbose:
+    logger.setLevel(logging.WARNING)
+
+results = [run_benchmark(database_count) for database_count in args.databases]
+
+for result in results:
+    print(f'databases={result["databases"]} msk_clusters={result["msk_clusters"]} '
+          f'wall_clock={result["wall_clock_s"]}s simulated_nia_wait={result["simulated_nia_wait_s"]}s '
+          f'peak_memory={result["peak_memory_kb"]}KB api_calls={result["api_calls"]} '
+          f'simulated_queue_wait={result["simulated_queue_wait_s"]}s coalesced_calls={result["coalesced_calls"]}')
+    for operation, count in result['api_calls_by_operation'].items():
+        print(f'    {operation}: {count}')
+
+if args.output:
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+
+if args.baseline:
+    with open(args.baseline) as f:
+        baseline = {(result['databases'], result['msk_clusters']): result for result in json.load(f)}
+    regressions = []
+    for result in results:
+        previous = baseline.get((result['databases'], result['msk_clusters']))
+        if not previous:
+            continue
+        for operation, count in result['api_calls_by_operation'].items():
+            if count > previous['api_calls_by_operation'].get(operation, 0):
+                regressions.append(f'{operation} calls went from {previous["api_calls_by_operation"].get(operation, 0)} '
+                                   f'to {count} with {result["databases"]} databases')
+        if result['wall_clock_s'] > previous['wall_clock_s'] * (1 + args.tolerance):
+            regressions.append(f'wall clock went from {previous["wall_clock_s"]}s to {result["wall_clock_s"]}s '
+                               f'with {result["databases"]} databases')
+    for regression in regressions:
+        print(f'Regression: {regression} ❌')
+    if regressions:
+        sys.exit(1)
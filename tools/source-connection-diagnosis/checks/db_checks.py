@@ -1,100 +1,185 @@
 import boto3
+from .utils.db_utils import DatabaseUtils
+from .utils.cloudwatch_utils import analyze_replication_metrics
+from .utils.parameter_utils import ParameterIndex, analyze_cdc_readiness
+from .utils.result_utils import CheckOutcome, log_outcome
+from .utils.scheduler import CheckScheduler
 from .utils.set_logging import logger
 
 
 class DatabaseChecks:
-    def __init__(self, session: boto3.Session, database_name: str):
+    def __init__(self, session: boto3.Session, database_name: str, db_utils: DatabaseUtils = None,
+                 expected_slots: int = 1, metric_window_minutes: int = 60):
         self.session = session
-        self.rds = self.session.client('rds')
         self.database_name = database_name
+        # the number of replication slots CDC is expected to use on this database
+        self.expected_slots = expected_slots
+        self.metric_window_minutes = metric_window_minutes
+        # share the db utils of the run so each describe call is made once and clients are reused
+        self.db_utils = db_utils or DatabaseUtils(self.session)
 
-    def check_database(self) -> None:
+    @property
+    def rds(self):
+        return self.db_utils.clients.client('rds')
+
+    def check_database(self) -> CheckOutcome:
         """
         Check if the database is available
         """
         database_name = self.database_name
         logger.info(f'Checking database {database_name}...')
         try:
-            response = self.rds.describe_db_instances(DBInstanceIdentifier=database_name)
-            engine = response['DBInstances'][0]['Engine']
-            db_instance_status = response['DBInstances'][0]['DBInstanceStatus']
-            if engine in ['postgres', 'aurora-postgresql'] and db_instance_status == 'available':
-                logger.info(f'Database {database_name} is available ✅')
-            else:
-                logger.error(
-                    f'Database {database_name} is not available or is not of type postgres/aurora-postgresql ❌')
+            db_instance = self.db_utils.describe_db_instance(database_name)
+            details = {'engine': db_instance['Engine'], 'status': db_instance['DBInstanceStatus']}
         except Exception as e:
-            logger.error(f'Unable to check if database exists and is available: {e}')
+            return log_outcome(CheckOutcome('failing', f'Unable to check if database exists and is available: {e}'))
+        if details['engine'] in ['postgres', 'aurora-postgresql'] and details['status'] == 'available':
+            return log_outcome(CheckOutcome('passing', f'Database {database_name} is available', details))
+        return log_outcome(CheckOutcome(
+            'failing', f'Database {database_name} is not available or is not of type postgres/aurora-postgresql', details))
 
-    def check_database_parameter_group(self) -> None:
+    def check_database_parameter_group(self) -> CheckOutcome:
         """
         Check if the database parameter group is available and is attached to the database
         """
         database_name = self.database_name
         logger.info(f'Checking database parameter group for {database_name}...')
         try:
-            response = self.rds.describe_db_instances(DBInstanceIdentifier=database_name)
-            parameter_group_name = response['DBInstances'][0]['DBParameterGroups'][0]['DBParameterGroupName']
-            if parameter_group_name:
-                logger.info(f'Database parameter group {parameter_group_name} is attached to the database ✅')
-            else:
-                logger.error('Database parameter group is not attached to the database ❌')
+            db_instance = self.db_utils.describe_db_instance(database_name)
+            parameter_group_name = db_instance['DBParameterGroups'][0]['DBParameterGroupName']
         except Exception as e:
-            logger.error(f'Unable to check if the parameter group is available/attached to database: {e}')
+            return log_outcome(CheckOutcome(
+                'failing', f'Unable to check if the parameter group is available/attached to database: {e}'))
+        details = {'parameter_group': parameter_group_name}
+        if parameter_group_name:
+            return log_outcome(CheckOutcome(
+                'passing', f'Database parameter group {parameter_group_name} is attached to the database', details))
+        return log_outcome(CheckOutcome('failing', 'Database parameter group is not attached to the database', details))
+
+    def get_parameter_index(self, db_instance: dict) -> ParameterIndex:
+        """
+        The parameters of the database, for Aurora the cluster parameter group takes precedence over the instance one
+        """
+        parameter_group_name = db_instance['DBParameterGroups'][0]['DBParameterGroupName']
+        parameters = self.db_utils.get_parameter_index(parameter_group_name)
+        if db_instance.get('DBClusterIdentifier'):
+            db_cluster = self.db_utils.describe_db_cluster(db_instance['DBClusterIdentifier'])
+            parameters = parameters.merge(self.db_utils.get_cluster_parameter_index(db_cluster['DBClusterParameterGroup']))
+        return parameters
 
-    def check_logical_replication(self) -> None:
+    def check_logical_replication(self) -> CheckOutcome:
         """
-        Check if the database parameter group has rds.logical_replication enabled
+        Check if logical replication is enabled and if the parameters that limit CDC throughput and
+        replication slots fit the instance class and the expected number of CDC slots.
+        The details are the sizing verdict with a finding per parameter.
         """
         database_name = self.database_name
         logger.info(f'Checking logical replication for {database_name}...')
         try:
-            response = self.rds.describe_db_instances(DBInstanceIdentifier=database_name)
-            parameter_group_name = response['DBInstances'][0]['DBParameterGroups'][0]['DBParameterGroupName']
-
-            all_parameters = []
-            marker = None
+            db_instance = self.db_utils.describe_db_instance(database_name)
+            parameter_group_name = db_instance['DBParameterGroups'][0]['DBParameterGroupName']
+            # Aurora stores the WAL on the cluster volume, its instances report an AllocatedStorage of 1GB
+            aurora = db_instance.get('DBClusterIdentifier') or db_instance.get('Engine', '').startswith('aurora')
+            report = analyze_cdc_readiness(
+                self.get_parameter_index(db_instance),
+                self.db_utils.get_instance_class_memory(db_instance['DBInstanceClass']),
+                None if aurora else db_instance.get('AllocatedStorage'),
+                self.expected_slots,
+            )
+        except Exception as e:
+            return log_outcome(CheckOutcome(
+                'failing', f'Unable to check if logical replication is enabled for the parameter group: {e}'))
 
-            # loop to handle pagination
-            while True:
-                if marker:
-                    response = self.rds.describe_db_parameters(DBParameterGroupName=parameter_group_name, Marker=marker)
-                else:
-                    response = self.rds.describe_db_parameters(DBParameterGroupName=parameter_group_name)
-                all_parameters.extend(response['Parameters'])
-                if 'Marker' in response:
-                    marker = response['Marker']
-                else:
-                    break
+        for finding in report['findings']:
+            message = f'{finding["parameter"]} = {finding["value"]}: {finding["message"]}'
+            if finding['status'] == 'ok':
+                logger.info(f'{message} ✅')
+            elif finding['status'] == 'blocking':
+                logger.error(f'{message} ❌')
+            else:
+                logger.warning(f'{message} 🚧')
+        capacity = f', room for {report["slot_capacity"]} CDC slots' if report['slot_capacity'] is not None else ''
+        if report['verdict'] == 'not ready':
+            return log_outcome(CheckOutcome(
+                'failing', f'Parameter group {parameter_group_name} is not ready for CDC{capacity}', report))
+        if report['verdict'] == 'ready with warnings':
+            return log_outcome(CheckOutcome(
+                'warning', f'Parameter group {parameter_group_name} is ready for CDC with warnings{capacity}', report))
+        return log_outcome(CheckOutcome('passing', f'Parameter group {parameter_group_name} is ready for CDC{capacity}',
+                                        report))
 
-            for param in all_parameters:
-                if param['ParameterName'] == 'rds.logical_replication':
-                    if param['ParameterValue'] == '1':
-                        logger.info(f'Logical replication is enabled in {parameter_group_name} ✅')
-                    else:
-                        logger.error(f'Logical replication is not enabled in {parameter_group_name} ❌')
-                    return
-        except Exception as e:
-            logger.error(f'Unable to check if logical replication is enabled for the parameter group: {e}')
+    def logical_replication_inputs(self) -> dict:
+        """
+        The values of the CDC parameters, with those of the Aurora cluster parameter group taking precedence,
+        the parameter groups of the database and their apply status, the instance class and the storage.
+        A change to a static parameter such as rds.logical_replication sets the status to pending-reboot,
+        a change to a dynamic one such as max_slot_wal_keep_size only shows in its value.
+        """
+        db_instance = self.db_utils.describe_db_instance(self.database_name)
+        return {
+            **{key: db_instance.get(key) for key in
+               ('DBParameterGroups', 'DBClusterIdentifier', 'DBInstanceClass', 'AllocatedStorage')},
+            'parameters': self.get_parameter_index(db_instance).cdc_values(),
+        }
 
-    def check_logical_replication_effect(self) -> None:
+    def check_logical_replication_effect(self) -> CheckOutcome:
         """
         Check if logical replication has taken effect
         """
         database_name = self.database_name
         logger.info(f'Checking if logical replication has taken effect in {database_name}...')
         try:
-            response = self.rds.describe_db_instances(DBInstanceIdentifier=database_name)
-            parameter_apply_status = response['DBInstances'][0]['DBParameterGroups'][0]['ParameterApplyStatus']
-            if parameter_apply_status == 'in-sync':
-                logger.info(f'No need for reboot as there no pending-reboot updates in {database_name} ✅')
-            elif parameter_apply_status == 'pending-reboot':
-                logger.error(
-                    f'Reboot required to make logical replication changes effective in {database_name}, please reboot ❌')
-            else:
-                logger.error(f'Logical replication has not taken effect in {database_name} ❌')
+            db_instance = self.db_utils.describe_db_instance(database_name)
+            parameter_apply_status = db_instance['DBParameterGroups'][0]['ParameterApplyStatus']
+        except Exception as e:
+            return log_outcome(CheckOutcome(
+                'failing', f'Unable to check if the logical replication has taken effect in the parameter group: {e}'))
+        details = {'parameter_apply_status': parameter_apply_status}
+        if parameter_apply_status == 'in-sync':
+            return log_outcome(CheckOutcome(
+                'passing', f'No need for reboot as there no pending-reboot updates in {database_name}', details))
+        if parameter_apply_status == 'pending-reboot':
+            return log_outcome(CheckOutcome(
+                'failing', f'Reboot required to make logical replication changes effective in {database_name}, '
+                           f'please reboot', details))
+        return log_outcome(CheckOutcome('failing', f'Logical replication has not taken effect in {database_name}',
+                                        details))
+
+    def check_replication_metrics(self) -> CheckOutcome:
+        """
+        Check the replication slot lag, the WAL retained by the slots and the WAL generation rate from CloudWatch,
+        with the trends over the window and an estimate of the ingest throughput headroom.
+        The details are the report with a finding per metric.
+        """
+        database_name = self.database_name
+        logger.info(f'Checking replication metrics of {database_name} over the last {self.metric_window_minutes} minutes...')
+        try:
+            series = self.db_utils.get_db_metric_data([database_name], self.metric_window_minutes)[database_name]
+            report = analyze_replication_metrics(series)
         except Exception as e:
-            logger.error(f'Unable to check if the logical replication has taken effect in the parameter group: {e}')
+            return log_outcome(CheckOutcome('failing', f'Unable to check the replication metrics of {database_name}: {e}'))
+
+        for finding in report['findings']:
+            if finding['status'] == 'ok':
+                logger.info(f'{finding["message"]} ✅')
+            elif finding['status'] == 'error':
+                logger.error(f'{finding["message"]} ❌')
+            else:
+                logger.warning(f'{finding["message"]} 🚧')
+        headroom = report['headroom']
+        if headroom:
+            message = (f'WAL generation {headroom["wal_rate_bytes_per_s"] / 1024:.1f}kB/s on average, '
+                       f'{headroom["peak_wal_rate_bytes_per_s"] / 1024:.1f}kB/s at peak, '
+                       f'CDC reading {headroom["cdc_read_rate_bytes_per_s"] / 1024:.1f}kB/s')
+            if headroom['estimated_max_wal_rate_bytes_per_s']:
+                message += f', estimated CPU-bound limit {headroom["estimated_max_wal_rate_bytes_per_s"] / 1024:.1f}kB/s'
+            logger.info(message)
+        if report['status'] == 'ok':
+            return log_outcome(CheckOutcome('passing', f'Replication of {database_name} is keeping up', report))
+        # the findings are logged above, the first of the worst ones explains the outcome
+        levels = ('error',) if report['status'] == 'error' else ('warning', 'unknown')
+        worst = next(finding for finding in report['findings'] if finding['status'] in levels)
+        return CheckOutcome('failing' if report['status'] == 'error' else 'warning', worst['message'], report)
 
     def perform_all_database_checks(self) -> None:
         """
@@ -104,3 +189,15 @@ class DatabaseChecks:
         self.check_database_parameter_group()
         self.check_logical_replication()
         self.check_logical_replication_effect()
+        self.check_replication_metrics()
+
+    def schedule_all_database_checks(self, scheduler: CheckScheduler) -> None:
+        """
+        Register all database checks with the scheduler, none of them depend on each other
+        """
+        scheduler.add_check('database', self.check_database)
+        scheduler.add_check('database_parameter_group', self.check_database_parameter_group)
+        scheduler.add_check('logical_replication', self.check_logical_replication,
+                            inputs=self.logical_replication_inputs)
+        scheduler.add_check('logical_replication_effect', self.check_logical_replication_effect)
+        scheduler.add_check('replication_metrics', self.check_replication_metrics)
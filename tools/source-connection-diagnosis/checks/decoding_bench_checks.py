@@ -0,0 +1,50 @@
+from .utils.db_utils import DatabaseUtils
+from .utils.decoding_bench_utils import LogicalDecodingBenchmark
+from .utils.result_utils import CheckOutcome, log_outcome
+from .utils.scheduler import CheckScheduler
+from .utils.set_logging import logger
+
+
+class DecodingBenchmarkChecks:
+    def __init__(self, db_utils: DatabaseUtils, benchmark: LogicalDecodingBenchmark = None):
+        self.db_utils = db_utils
+        self.benchmark = benchmark or LogicalDecodingBenchmark()
+
+    def check_decoding_benchmark(self, database_name: str, host: str = None, port: int = None,
+                                 logical_replication: dict = None) -> CheckOutcome:
+        """
+        Write a synthetic load to the database and decode it through a temporary logical replication slot,
+        measuring the decode throughput and the slot lag. Connects to the database IP address unless a host is
+        given, e.g. a local Postgres. Skipped when the logical replication check found the database not ready.
+        The details are the benchmark report.
+        """
+        if not host and logical_replication and logical_replication['verdict'] == 'not ready':
+            return log_outcome(CheckOutcome(
+                'warning', f'Skipping the logical decoding benchmark, logical replication is not ready on {database_name}'))
+        logger.info(f'Benchmarking logical decoding on {host or database_name}...')
+        try:
+            if not host:
+                host = self.db_utils.get_database_ip_address(database_name)
+                port = port or self.db_utils.describe_db_instance(database_name)['Endpoint']['Port']
+            if not host:
+                return log_outcome(CheckOutcome('failing', f'No IP address found for database {database_name}'))
+            report = self.benchmark.run(host, port or 5432)
+        except Exception as e:
+            return log_outcome(CheckOutcome('failing', f'Unable to benchmark logical decoding on {host or database_name}: {e}'))
+        if LogicalDecodingBenchmark.log_report('Logical decoding benchmark', report):
+            return CheckOutcome('passing', f'All {report["written_rows"]} written rows were decoded', report)
+        if report['write_errors']:
+            return CheckOutcome('failing', f'{len(report["write_errors"])} writes failed: {report["write_errors"][0]}',
+                                report)
+        return CheckOutcome('failing', f'{report["written_rows"] - report["decoded_rows"]} of {report["written_rows"]} '
+                                       f'written rows were not decoded in time', report)
+
+    def schedule_all_decoding_benchmark_checks(self, scheduler: CheckScheduler, database_name: str,
+                                               host: str = None, port: int = None) -> None:
+        """
+        Register the logical decoding benchmark with the scheduler, after the logical replication check of the
+        database unless a host is given
+        """
+        depends_on = None if host else ['logical_replication']
+        scheduler.add_check('decoding_benchmark', self.check_decoding_benchmark, database_name, host, port,
+                            depends_on=depends_on)
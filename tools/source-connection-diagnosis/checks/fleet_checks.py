@@ -0,0 +1,103 @@
+import time
+from typing import TYPE_CHECKING
+from concurrent.futures import ThreadPoolExecutor
+from .db_checks import DatabaseChecks
+from .generic_checks import GenericChecks
+from .msk_checks import MSKChecks
+from .utils.fleet_utils import *
+from .utils.metrics_utils import CallMetrics
+from .utils.result_utils import ResultWriter
+from .utils.scheduler import CheckScheduler
+
+if TYPE_CHECKING:
+    from .utils.watch_utils import WatchState
+
+
+class FleetChecks:
+    def __init__(self, aws_utils: AWSUtils, eks_cluster_name: str, max_parallel_targets: int = 16,
+                 max_workers: int = 4, all_msk_brokers: bool = False, metrics: CallMetrics = None,
+                 reachability_modes: set[str] = None, watch_state: 'WatchState' = None,
+                 result_writer: ResultWriter = None, expected_slots: int = 1, metric_window_minutes: int = 60,
+                 expected_ingest_rate: float = 0.0, expected_partitions: int = None):
+        self.aws_utils = aws_utils
+        self.session = aws_utils.session
+        self.eks_cluster_name = eks_cluster_name
+        self.max_parallel_targets = max_parallel_targets
+        self.max_workers = max_workers
+        self.all_msk_brokers = all_msk_brokers
+        self.metrics = metrics
+        self.reachability_modes = reachability_modes or {'nia'}
+        self.watch_state = watch_state
+        self.result_writer = result_writer
+        self.expected_slots = expected_slots
+        self.metric_window_minutes = metric_window_minutes
+        self.expected_ingest_rate = expected_ingest_rate
+        self.expected_partitions = expected_partitions
+        self.fleet_utils = FleetUtils(aws_utils, max_workers=max_parallel_targets)
+        # the analyses of all targets share one pool, as many as the checks of the targets running at the same time
+        self.generic_checks = GenericChecks(self.session, aws_utils, max_parallel_targets * max_workers)
+
+    def check_database_target(self, database_name: str) -> None:
+        """
+        Run all checks of a single database, sharing the run cache with the rest of the fleet
+        """
+        scheduler = CheckScheduler(max_workers=self.max_workers, metrics=self.metrics, target=database_name,
+                                   watch_state=self.watch_state, result_writer=self.result_writer)
+        database_checks = DatabaseChecks(self.session, database_name, self.aws_utils.db_utils, self.expected_slots,
+                                         self.metric_window_minutes)
+        database_checks.schedule_all_database_checks(scheduler)
+        self.generic_checks.schedule_all_generic_checks(scheduler, self.eks_cluster_name, database_name=database_name,
+                                                        network_insights='nia' in self.reachability_modes,
+                                                        static_reachability='static' in self.reachability_modes)
+        scheduler.run()
+
+    def check_msk_target(self, msk_cluster_arn: str) -> None:
+        """
+        Run all checks of a single MSK cluster, sharing the run cache with the rest of the fleet
+        """
+        scheduler = CheckScheduler(max_workers=self.max_workers, metrics=self.metrics, target=msk_cluster_arn,
+                                   watch_state=self.watch_state, result_writer=self.result_writer)
+        msk_checks = MSKChecks(self.session, msk_cluster_arn, self.aws_utils.msk_utils, self.expected_ingest_rate,
+                               self.expected_partitions, self.metric_window_minutes)
+        msk_checks.schedule_all_msk_checks(scheduler)
+        self.generic_checks.schedule_all_generic_checks(scheduler, self.eks_cluster_name, msk_cluster_arn=msk_cluster_arn,
+                                                        all_msk_brokers=self.all_msk_brokers,
+                                                        network_insights='nia' in self.reachability_modes,
+                                                        static_reachability='static' in self.reachability_modes)
+        scheduler.run()
+
+    def fetch_inventory(self, database_names: list[str] = None,
+                        msk_cluster_arns: list[str] = None) -> tuple[list[str], list[str]]:
+        """
+        Resolve the target names and patterns and fetch the inventory of all targets in bulk into the run cache
+        """
+        start = time.monotonic()
+        database_names = self.fleet_utils.list_db_instances(database_names) if database_names else []
+        msk_cluster_arns = self.fleet_utils.list_msk_clusters(msk_cluster_arns) if msk_cluster_arns else []
+        if database_names:
+            self.fleet_utils.prefetch_database_network(database_names)
+            self.fleet_utils.prefetch_database_metrics(database_names, self.metric_window_minutes)
+        if msk_cluster_arns:
+            self.fleet_utils.prefetch_msk_network(msk_cluster_arns)
+            self.fleet_utils.prefetch_msk_metrics(msk_cluster_arns, self.metric_window_minutes)
+        logger.info(f'Fetched fleet inventory in {time.monotonic() - start:.1f}s')
+        return database_names, msk_cluster_arns
+
+    def perform_all_fleet_checks(self, database_names: list[str] = None, msk_cluster_arns: list[str] = None) -> None:
+        """
+        Resolve the targets and fetch their inventories in bulk, then check every target on a bounded worker pool
+        """
+        start = time.monotonic()
+        database_names, msk_cluster_arns = self.fetch_inventory(database_names, msk_cluster_arns)
+
+        with ThreadPoolExecutor(max_workers=self.max_parallel_targets) as executor:
+            futures = [executor.submit(self.check_database_target, name) for name in database_names]
+            futures += [executor.submit(self.check_msk_target, arn) for arn in msk_cluster_arns]
+            for future in futures:
+                try:
+                    future.result()
+                except Exception as e:
+                    logger.error(f'Error checking fleet target: {e}')
+
+        logger.info(f'Checked {len(database_names)} databases and {len(msk_cluster_arns)} MSK clusters '
+                    f'in {time.monotonic() - start:.1f}s')
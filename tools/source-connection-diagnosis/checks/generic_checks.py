@@ -1,105 +1,372 @@
-import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
 from .utils.generic_utils import *
+from .utils.result_utils import CheckOutcome, log_outcome, worst_outcome
+from .utils.scheduler import CheckScheduler
 
 
 class GenericChecks:
-    def __init__(self, session: boto3.Session):
+    def __init__(self, session: boto3.Session, aws_utils: AWSUtils = None, max_workers: int = 8):
         self.session = session
-        self.glue = self.session.client('glue')
-        self.ec2 = self.session.client('ec2')
-        self.aws_utils = AWSUtils(self.session.region_name)
+        # share the aws utils of the run so each describe call is made once and clients are reused
+        self.aws_utils = aws_utils or AWSUtils(session=self.session)
+        # one pool runs the Network Insights analyses of every reachability check, one per source or broker pair,
+        # so checks running at the same time share max_workers analyses instead of each running that many
+        self.max_workers = max_workers
+        self.analysis_executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='analysis')
+        self._reachability_utils = None
 
-    def check_glue_schema_registry(self) -> None:
+    @property
+    def reachability_utils(self):
+        # only the static reachability checks and the watch mode evaluate the VPC configuration locally
+        if self._reachability_utils is None:
+            from .utils.reachability_utils import ReachabilityUtils
+            self._reachability_utils = ReachabilityUtils(self.aws_utils)
+        return self._reachability_utils
+
+    @property
+    def glue(self):
+        return self.aws_utils.clients.client('glue')
+
+    @property
+    def ec2(self):
+        return self.aws_utils.clients.client('ec2')
+
+    def check_glue_schema_registry(self) -> CheckOutcome:
         """
         Check if there is a valid Glue schema registry
         """
         logger.info('Checking Glue schema registry...')
         try:
-            response = self.glue.list_registries()
-            if len(response['Registries']) > 0:
-                logger.info('At least one Glue schema registry is available ✅')
-            else:
-                logger.error('No Glue schema registry available ❌')
+            registries = self.aws_utils.cache.get(('glue', 'list_registries'), lambda: self.glue.list_registries()['Registries'])
         except Exception as e:
-            logger.error(f'Unable to retrieve schema registry: {e}')
+            return log_outcome(CheckOutcome('failing', f'Unable to retrieve schema registry: {e}'))
+        details = {'registries': [registry['RegistryName'] for registry in registries]}
+        if len(registries) > 0:
+            return log_outcome(CheckOutcome('passing', 'At least one Glue schema registry is available', details))
+        return log_outcome(CheckOutcome('failing', 'No Glue schema registry available', details))
 
-    def check_database_reachability(self, database_name: str, cluster_name: str) -> None:
+    def run_network_insights_analysis(self, path_id: str) -> dict:
         """
-        Check if the database is reachable from the EKS cluster
+        Start a Network Insights analysis for the path and wait for it with the shared poller
         """
-        self.aws_utils.check_if_db_vpc_equals_eks_vpc(database_name, cluster_name)
+        start_nia_response = self.ec2.start_network_insights_analysis(NetworkInsightsPathId=path_id)
+        logger.info(f'Network Insights analysis started for path {path_id}')
+        nia_id = start_nia_response['NetworkInsightsAnalysis']['NetworkInsightsAnalysisId']
+        logger.info(f'Network Insights Analysis ID: {nia_id}')
+        analysis = self.aws_utils.nia_poller.wait(nia_id)
+        logger.info(f'Network Insights Analysis status: {analysis["Status"]}')
+        logger.info(f'Network Path Found: {analysis.get("NetworkPathFound")}')
+        return analysis
 
-        logger.info(f'Checking database reachability from {cluster_name}...')
-        path_id = self.aws_utils.setup_reachability_path_to_db(database_name, cluster_name)
-        if path_id:
+    def check_reachability_from_sources(self, name: str, eks_cluster_name: str, eks_sources: list[dict],
+                                        setup_path: Callable[[str], str | None]) -> CheckOutcome:
+        """
+        Run a Network Insights analysis from every EKS source concurrently in the shared analysis pool, setting up
+        each path from the source instance ID, and report the results per source and per availability zone.
+        The details are whether each source reaches the destination and why not.
+        """
+        def check_source(source: dict) -> dict:
+            location = f'{eks_cluster_name} node {source["instance_id"]} in {source["availability_zone"]}'
+            result = {'instance_id': source['instance_id'], 'availability_zone': source['availability_zone'],
+                      'reachable': False, 'explanation': f'{name} is not reachable from {location}'}
+            path_id = setup_path(source['instance_id'])
+            if not path_id:
+                logger.error(f'{result["explanation"]} ❌')
+                return result
             try:
-                start_nia_response = self.ec2.start_network_insights_analysis(NetworkInsightsPathId=path_id)
-                logger.info(f'Network Insights analysis started for path {path_id}')
-                nia_id = start_nia_response['NetworkInsightsAnalysis']['NetworkInsightsAnalysisId']
-                logger.info(f'Network Insights Analysis ID: {nia_id}')
-                logger.info("Started Network Insights Analysis, sleeping for 10s before polling again...")
-                time.sleep(10)
-                describe_nia_response = self.ec2.describe_network_insights_analyses(NetworkInsightsAnalysisIds=[nia_id])
-                nia_status = describe_nia_response['NetworkInsightsAnalyses'][0]['Status']
-                # if status is running, poll every 10 seconds until it's succeeded or failed
-                while nia_status == 'running':
-                    logger.info("Network Insights Analysis is still running, sleeping for 10s before polling again...")
-                    time.sleep(10)
-                    describe_nia_response = self.ec2.describe_network_insights_analyses(NetworkInsightsAnalysisIds=[nia_id])
-                    nia_status = describe_nia_response['NetworkInsightsAnalyses'][0]['Status']
-                nia_network_path_found_flag = describe_nia_response['NetworkInsightsAnalyses'][0]['NetworkPathFound']
-                logger.info(f'Network Insights Analysis status: {nia_status}')
-                logger.info(f'Network Path Found: {nia_network_path_found_flag}')
-                if nia_status == 'succeeded' and nia_network_path_found_flag:
-                    logger.info(f'Database {database_name} is reachable from {cluster_name} ✅')
-                else:
-                    explanation = describe_nia_response['NetworkInsightsAnalyses'][0]['Explanations']
-                    logger.error(f'Database {database_name} is not reachable from {cluster_name} ❌')
-                    logger.error(f'Explanations: {explanation}')
+                analysis = self.run_network_insights_analysis(path_id)
+                if analysis['Status'] == 'succeeded' and analysis.get('NetworkPathFound'):
+                    result.update(reachable=True, explanation=f'{name} is reachable from {location}')
+                    logger.info(f'{result["explanation"]} ✅')
+                    return result
+                logger.error(f'{result["explanation"]} ❌')
+                logger.error(f'Explanations: {analysis.get("Explanations")}')
+                result['analysis_explanations'] = analysis.get('Explanations')
             except Exception as e:
-                logger.error(f'Error checking database reachability: {e}')
-        else:
-            logger.error(f'Database {database_name} is not reachable from {cluster_name} ❌')
+                result['explanation'] = f'Error checking {name} reachability from {location}: {e}'
+                logger.error(result['explanation'])
+            return result
 
-    def check_msk_reachability(self, msk_cluster_arn: str, eks_cluster_name: str) -> None:
+        results = list(self.analysis_executor.map(check_source, eks_sources))
+
+        sources_by_zone = {}
+        for result in results:
+            sources_by_zone.setdefault(result['availability_zone'] or 'unknown', []).append(result['reachable'])
+        outcomes = []
+        for zone, zone_results in sorted(sources_by_zone.items()):
+            if all(zone_results):
+                outcomes.append(log_outcome(CheckOutcome(
+                    'passing', f'{name} is reachable from all {len(zone_results)} EKS sources in {zone}')))
+            else:
+                outcomes.append(log_outcome(CheckOutcome(
+                    'failing', f'{name} is not reachable from {zone_results.count(False)} of {len(zone_results)} '
+                               f'EKS sources in {zone}')))
+        return worst_outcome(outcomes, {'sources': results})
+
+    def check_database_reachability(self, database_name: str, cluster_name: str,
+                                    db_eni: str = None, eks_sources: list[dict] = None) -> CheckOutcome:
         """
-        Check if the MSK cluster is reachable from the EKS cluster
+        Check if the database is reachable from every distinct subnet and security group of the EKS cluster nodes
+        """
+        self.aws_utils.check_if_db_vpc_equals_eks_vpc(database_name, cluster_name)
+
+        logger.info(f'Checking database reachability from {cluster_name}...')
+        db_eni = db_eni or self.aws_utils.get_database_eni(database_name)
+        eks_sources = eks_sources or self.aws_utils.get_eks_sources(cluster_name)
+        if not db_eni or not eks_sources:
+            return log_outcome(CheckOutcome('failing', f'Database {database_name} is not reachable from {cluster_name}'))
+        return self.check_reachability_from_sources(
+            f'Database {database_name}', cluster_name, eks_sources,
+            lambda instance_id: self.aws_utils.setup_reachability_path_to_db(database_name, cluster_name, db_eni,
+                                                                             instance_id))
+
+    def check_msk_reachability(self, msk_cluster_arn: str, eks_cluster_name: str,
+                               msk_eni: str = None, eks_sources: list[dict] = None) -> CheckOutcome:
+        """
+        Check if the MSK cluster is reachable from every distinct subnet and security group of the EKS cluster nodes
         """
         self.aws_utils.check_if_msk_vpc_equals_eks_vpc(msk_cluster_arn, eks_cluster_name)
 
         logger.info(f'Checking MSK reachability from {eks_cluster_name}...')
-        path_id = self.aws_utils.setup_reachability_path_to_msk(msk_cluster_arn, eks_cluster_name)
-        if path_id:
+        msk_eni = msk_eni or self.aws_utils.msk_utils.get_msk_eni(msk_cluster_arn)
+        eks_sources = eks_sources or self.aws_utils.get_eks_sources(eks_cluster_name)
+        if not msk_eni or not eks_sources:
+            return log_outcome(CheckOutcome('failing',
+                                            f'MSK cluster {msk_cluster_arn} is not reachable from {eks_cluster_name}'))
+        return self.check_reachability_from_sources(
+            f'MSK cluster {msk_cluster_arn}', eks_cluster_name, eks_sources,
+            lambda instance_id: self.aws_utils.setup_reachability_path_to_msk(msk_cluster_arn, eks_cluster_name, msk_eni,
+                                                                              instance_id))
+
+    def database_reachability_inputs(self, database_name: str, cluster_name: str,
+                                     db_eni: str = None, eks_sources: list[dict] = None) -> dict:
+        """
+        What the database reachability depends on: the database endpoint, the EKS VPC and the network configuration
+        """
+        db_instance = self.aws_utils.db_utils.describe_db_instance(database_name)
+        return {
+            'endpoint': db_instance['Endpoint'],
+            'vpc_id': db_instance['DBSubnetGroup']['VpcId'],
+            'eks_vpc': self.aws_utils.describe_eks_cluster(cluster_name)['resourcesVpcConfig'],
+            **self.reachability_utils.describe_path_inputs(
+                [source['instance_id'] for source in eks_sources or []], [db_eni]),
+        }
+
+    def msk_reachability_inputs(self, msk_cluster_arn: str, eks_cluster_name: str,
+                                msk_eni: str = None, eks_sources: list[dict] = None) -> dict:
+        """
+        What the MSK reachability depends on: the bootstrap brokers, the EKS VPC and the network configuration
+        """
+        return {
+            'bootstrap_brokers': self.aws_utils.msk_utils.get_bootstrap_brokers(msk_cluster_arn),
+            'eks_vpc': self.aws_utils.describe_eks_cluster(eks_cluster_name)['resourcesVpcConfig'],
+            **self.reachability_utils.describe_path_inputs(
+                [source['instance_id'] for source in eks_sources or []], [msk_eni]),
+        }
+
+    def msk_brokers_reachability_inputs(self, msk_cluster_arn: str, eks_cluster_name: str,
+                                        msk_brokers: list[dict] = None, eks_sources: list[dict] = None) -> dict:
+        """
+        What the reachability of all MSK brokers depends on: the brokers, the EKS VPC and the network configuration
+        """
+        if not msk_brokers:
+            # the check fails without brokers and only has to run again once they are found
+            return {'msk_brokers': None}
+        return {
+            'msk_brokers': msk_brokers,
+            'bootstrap_brokers': self.aws_utils.msk_utils.get_bootstrap_brokers(msk_cluster_arn),
+            'eks_vpc': self.aws_utils.describe_eks_cluster(eks_cluster_name)['resourcesVpcConfig'],
+            **self.reachability_utils.describe_path_inputs(
+                [source['instance_id'] for source in eks_sources or []],
+                [broker['eni_id'] for broker in msk_brokers if broker['eni_id']]),
+        }
+
+    def check_msk_brokers_reachability(self, msk_cluster_arn: str, eks_cluster_name: str,
+                                       msk_brokers: list[dict] = None, eks_sources: list[dict] = None) -> CheckOutcome:
+        """
+        Check if every MSK broker is reachable from every distinct subnet and security group of the EKS cluster nodes,
+        running the analyses concurrently, and report the results per broker and per availability zone.
+        The details are whether each broker is reachable from each source.
+        """
+        self.aws_utils.check_if_msk_vpc_equals_eks_vpc(msk_cluster_arn, eks_cluster_name)
+
+        logger.info(f'Checking reachability of all MSK brokers from {eks_cluster_name}...')
+        msk_brokers = msk_brokers or self.aws_utils.msk_utils.get_msk_brokers(msk_cluster_arn)
+        eks_sources = eks_sources or self.aws_utils.get_eks_sources(eks_cluster_name)
+        if not msk_brokers or not eks_sources:
+            return log_outcome(CheckOutcome('failing',
+                                            f'MSK cluster {msk_cluster_arn} is not reachable from {eks_cluster_name}'))
+
+        msk_port = self.aws_utils.msk_utils.get_msk_port(msk_cluster_arn)
+        for broker in msk_brokers:
+            if not broker['eni_id']:
+                logger.error(f'MSK broker {broker["broker_id"]} ({broker["host"]}) has no ENI, '
+                             f'IP address {broker["ip_address"]} ❌')
+
+        def check_broker(source: dict, broker: dict) -> dict:
+            location = f'{eks_cluster_name} node {source["instance_id"]} in {source["availability_zone"]}'
+            result = {'broker_id': broker['broker_id'], 'instance_id': source['instance_id'], 'reachable': False,
+                      'explanation': f'MSK broker {broker["broker_id"]} in {broker["availability_zone"]} '
+                                     f'is not reachable from {location}'}
             try:
-                start_nia_response = self.ec2.start_network_insights_analysis(NetworkInsightsPathId=path_id)
-                logger.info(f'Network Insights analysis started for path {path_id}')
-                nia_id = start_nia_response['NetworkInsightsAnalysis']['NetworkInsightsAnalysisId']
-                logger.info(f'Network Insights Analysis ID: {nia_id}')
-                logger.info("Started Network Insights Analysis, sleeping for 10s before polling again...")
-                time.sleep(10)
-                describe_nia_response = self.ec2.describe_network_insights_analyses(NetworkInsightsAnalysisIds=[nia_id])
-                nia_status = describe_nia_response['NetworkInsightsAnalyses'][0]['Status']
-                # if status is running, poll every 10 seconds until it's succeeded or failed
-                while nia_status == 'running':
-                    logger.info("Network Insights Analysis is still running, sleeping for 10s before polling again...")
-                    time.sleep(10)
-                    describe_nia_response = self.ec2.describe_network_insights_analyses(NetworkInsightsAnalysisIds=[nia_id])
-                    nia_status = describe_nia_response['NetworkInsightsAnalyses'][0]['Status']
-                nia_network_path_found_flag = describe_nia_response['NetworkInsightsAnalyses'][0]['NetworkPathFound']
-                logger.info(f'Network Insights Analysis status: {nia_status}')
-                logger.info(f'Network Path Found: {nia_network_path_found_flag}')
-                if nia_status == 'succeeded' and nia_network_path_found_flag:
-                    logger.info(f'MSK cluster {msk_cluster_arn} is reachable from {eks_cluster_name} ✅')
-                else:
-                    explanation = describe_nia_response['NetworkInsightsAnalyses'][0]['Explanations']
-                    logger.error(f'MSK cluster {msk_cluster_arn} is not reachable from {eks_cluster_name} ❌')
-                    logger.error(f'Explanations: {explanation}')
+                path_id = self.aws_utils.nia_paths.get_or_create_path(source['instance_id'], broker['eni_id'], 'TCP',
+                                                                      msk_port)
+                analysis = self.run_network_insights_analysis(path_id)
+                if analysis['Status'] == 'succeeded' and analysis.get('NetworkPathFound'):
+                    result.update(reachable=True, explanation=f'MSK broker {broker["broker_id"]} in '
+                                                              f'{broker["availability_zone"]} is reachable from {location}')
+                    logger.info(f'{result["explanation"]} ✅')
+                    return result
+                logger.error(f'{result["explanation"]} ❌')
+                logger.error(f'Explanations: {analysis.get("Explanations")}')
+                result['analysis_explanations'] = analysis.get('Explanations')
             except Exception as e:
-                logger.error(f'Error checking MSK reachability: {e}')
+                result['explanation'] = f'Error checking MSK broker {broker["broker_id"]} reachability from {location}: {e}'
+                logger.error(result['explanation'])
+            return result
+
+        pairs = [(source, broker) for broker in msk_brokers if broker['eni_id'] for source in eks_sources]
+        results = list(self.analysis_executor.map(lambda pair: check_broker(*pair), pairs))
+
+        # a broker is reachable when every EKS source reaches it
+        reachable = {broker['broker_id']: bool(broker['eni_id']) for broker in msk_brokers}
+        for result in results:
+            reachable[result['broker_id']] = reachable[result['broker_id']] and result['reachable']
+
+        brokers_by_zone = {}
+        for broker in msk_brokers:
+            brokers_by_zone.setdefault(broker['availability_zone'] or 'unknown', []).append(reachable[broker['broker_id']])
+        outcomes = []
+        for zone, zone_results in sorted(brokers_by_zone.items()):
+            if all(zone_results):
+                outcomes.append(log_outcome(CheckOutcome(
+                    'passing', f'All {len(zone_results)} MSK brokers in {zone} are reachable from all '
+                               f'{len(eks_sources)} EKS sources')))
+            else:
+                outcomes.append(log_outcome(CheckOutcome(
+                    'failing', f'{zone_results.count(False)} of {len(zone_results)} MSK brokers in {zone} '
+                               f'are not reachable from every EKS source')))
+        return worst_outcome(outcomes, {'brokers': reachable, 'pairs': results})
+
+    def log_static_reachability(self, name: str, eks_cluster_name: str, results: list[dict]) -> CheckOutcome:
+        """
+        Log the evaluation of every source and destination, the outcome is the one of the worst pair
+        """
+        outcomes = []
+        for result in results:
+            source = f'{eks_cluster_name} node {result["source"]}'
+            if result['status'] == 'reachable':
+                outcomes.append(log_outcome(CheckOutcome(
+                    'passing', f'{name} ({result["destination"]}) is reachable from {source} '
+                               f'on port {result["port"]} according to the VPC configuration')))
+            elif result['status'] == 'unknown':
+                outcomes.append(log_outcome(CheckOutcome(
+                    'warning', f'{name} ({result["destination"]}) reachability from {source} could not be '
+                               f'fully evaluated locally')))
+            else:
+                outcomes.append(log_outcome(CheckOutcome(
+                    'failing', f'{name} ({result["destination"]}) is not reachable from {source} '
+                               f'on port {result["port"]}')))
+            for explanation in result['explanations']:
+                logger.error(f'Explanation: {explanation}')
+        return worst_outcome(outcomes, results)
+
+    def check_database_static_reachability(self, database_name: str, eks_cluster_name: str,
+                                           db_eni: str = None, eks_sources: list[dict] = None) -> CheckOutcome:
+        """
+        Check if the database is reachable from every EKS source by evaluating the security groups,
+        network ACLs and route tables locally, without a Network Insights analysis. The details are the evaluation
+        results.
+        """
+        logger.info(f'Evaluating database reachability from {eks_cluster_name} locally...')
+        try:
+            db_eni = db_eni or self.aws_utils.get_database_eni(database_name)
+            eks_sources = eks_sources or self.aws_utils.get_eks_sources(eks_cluster_name)
+            if not db_eni or not eks_sources:
+                return log_outcome(CheckOutcome(
+                    'failing', f'Database {database_name} is not reachable from {eks_cluster_name}'))
+            db_port = self.aws_utils.db_utils.describe_db_instance(database_name)['Endpoint']['Port']
+            results = self.reachability_utils.evaluate(
+                [self.reachability_utils.get_instance_endpoint(source['instance_id']) for source in eks_sources],
+                [self.reachability_utils.get_eni_endpoint(db_eni)], db_port)
+            return self.log_static_reachability(f'Database {database_name}', eks_cluster_name, results)
+        except Exception as e:
+            return log_outcome(CheckOutcome('failing', f'Error evaluating database reachability: {e}'))
+
+    def check_msk_static_reachability(self, msk_cluster_arn: str, eks_cluster_name: str, msk_eni: str = None,
+                                      msk_brokers: list[dict] = None, eks_sources: list[dict] = None) -> CheckOutcome:
+        """
+        Check if the MSK brokers are reachable from every EKS source by evaluating the security groups,
+        network ACLs and route tables locally, without a Network Insights analysis. The details are the evaluation
+        results.
+        """
+        logger.info(f'Evaluating MSK reachability from {eks_cluster_name} locally...')
+        try:
+            if msk_brokers:
+                eni_ids = [broker['eni_id'] for broker in msk_brokers if broker['eni_id']]
+            else:
+                eni_ids = [msk_eni or self.aws_utils.msk_utils.get_msk_eni(msk_cluster_arn)]
+            eks_sources = eks_sources or self.aws_utils.get_eks_sources(eks_cluster_name)
+            if not all(eni_ids) or not eni_ids or not eks_sources:
+                return log_outcome(CheckOutcome(
+                    'failing', f'MSK cluster {msk_cluster_arn} is not reachable from {eks_cluster_name}'))
+            msk_port = self.aws_utils.msk_utils.get_msk_port(msk_cluster_arn)
+            results = self.reachability_utils.evaluate(
+                [self.reachability_utils.get_instance_endpoint(source['instance_id']) for source in eks_sources],
+                [self.reachability_utils.get_eni_endpoint(eni_id) for eni_id in eni_ids], msk_port)
+            return self.log_static_reachability('MSK broker', eks_cluster_name, results)
+        except Exception as e:
+            return log_outcome(CheckOutcome('failing', f'Error evaluating MSK reachability: {e}'))
 
     def perform_all_generic_checks(self, eks_cluster_name: str, database_name: str = None, msk_cluster_arn: str = None) -> None:
         if database_name:
             self.check_glue_schema_registry()
             self.check_database_reachability(database_name, eks_cluster_name)
         if msk_cluster_arn:
-            self.check_msk_reachability(msk_cluster_arn, eks_cluster_name)
\ No newline at end of file
+            self.check_msk_reachability(msk_cluster_arn, eks_cluster_name)
+
+    def schedule_all_generic_checks(self, scheduler: CheckScheduler, eks_cluster_name: str,
+                                    database_name: str = None, msk_cluster_arn: str = None,
+                                    network_insights: bool = True, all_msk_brokers: bool = False,
+                                    static_reachability: bool = False) -> None:
+        """
+        Register all generic checks with the scheduler. The ENI and EKS source lookups run
+        on their own so the reachability checks can start as soon as both are known.
+        The Network Insights reachability checks are left out when network_insights is False,
+        every MSK broker is checked instead of a single one when all_msk_brokers is True,
+        and the local static reachability checks are added when static_reachability is True.
+        """
+        if database_name:
+            scheduler.add_check('glue_schema_registry', self.check_glue_schema_registry)
+        if not network_insights and not static_reachability:
+            return
+
+        scheduler.add_check('eks_sources', self.aws_utils.get_eks_sources, eks_cluster_name)
+        if database_name:
+            scheduler.add_check('db_eni', self.aws_utils.get_database_eni, database_name)
+            if network_insights:
+                scheduler.add_check('database_reachability', self.check_database_reachability,
+                                    database_name, eks_cluster_name, depends_on=['db_eni', 'eks_sources'],
+                                    inputs=self.database_reachability_inputs)
+            if static_reachability:
+                scheduler.add_check('database_static_reachability', self.check_database_static_reachability,
+                                    database_name, eks_cluster_name, depends_on=['db_eni', 'eks_sources'])
+        if msk_cluster_arn and all_msk_brokers:
+            scheduler.add_check('msk_brokers', self.aws_utils.msk_utils.get_msk_brokers, msk_cluster_arn)
+            if network_insights:
+                scheduler.add_check('msk_brokers_reachability', self.check_msk_brokers_reachability,
+                                    msk_cluster_arn, eks_cluster_name, depends_on=['msk_brokers', 'eks_sources'],
+                                    inputs=self.msk_brokers_reachability_inputs)
+            if static_reachability:
+                scheduler.add_check('msk_static_reachability', self.check_msk_static_reachability,
+                                    msk_cluster_arn, eks_cluster_name, depends_on=['msk_brokers', 'eks_sources'])
+        elif msk_cluster_arn:
+            scheduler.add_check('msk_eni', self.aws_utils.msk_utils.get_msk_eni, msk_cluster_arn)
+            if network_insights:
+                scheduler.add_check('msk_reachability', self.check_msk_reachability,
+                                    msk_cluster_arn, eks_cluster_name, depends_on=['msk_eni', 'eks_sources'],
+                                    inputs=self.msk_reachability_inputs)
+            if static_reachability:
+                scheduler.add_check('msk_static_reachability', self.check_msk_static_reachability,
+                                    msk_cluster_arn, eks_cluster_name, depends_on=['msk_eni', 'eks_sources'])
@@ -0,0 +1,39 @@
+from .utils.generic_utils import *
+from .utils.kafka_bench_utils import KafkaBenchmark
+from .utils.result_utils import CheckOutcome, log_outcome
+from .utils.scheduler import CheckScheduler
+
+
+class KafkaBenchmarkChecks:
+    def __init__(self, aws_utils: AWSUtils, benchmark: KafkaBenchmark = None):
+        self.aws_utils = aws_utils
+        self.benchmark = benchmark or KafkaBenchmark(region=aws_utils.session.region_name)
+
+    def check_kafka_benchmark(self, msk_cluster_arn: str, bootstrap_servers: list[str] = None) -> CheckOutcome:
+        """
+        Produce and consume records through the MSK brokers, or the given bootstrap servers, and measure the
+        throughput and the end-to-end latency per broker. The details are the benchmark report.
+        """
+        logger.info(f'Benchmarking Kafka produce and consume through {bootstrap_servers or msk_cluster_arn}...')
+        try:
+            if not bootstrap_servers:
+                bootstrap_servers = self.aws_utils.msk_utils.get_bootstrap_servers(msk_cluster_arn,
+                                                                                   self.benchmark.security_protocol)
+            if not bootstrap_servers:
+                return log_outcome(CheckOutcome(
+                    'failing', f'No {self.benchmark.security_protocol} bootstrap brokers found for {msk_cluster_arn}'))
+            report = self.benchmark.run(bootstrap_servers)
+        except Exception as e:
+            return log_outcome(CheckOutcome(
+                'failing', f'Unable to benchmark Kafka through {bootstrap_servers or msk_cluster_arn}: {e}'))
+        if KafkaBenchmark.log_report('Kafka benchmark', report):
+            return CheckOutcome('passing', f'All {report["records"]} records made it through', report)
+        return CheckOutcome('failing', f'{report["records"] - report["received"]} of {report["records"]} records '
+                                       f'did not make it through', report)
+
+    def schedule_all_kafka_benchmark_checks(self, scheduler: CheckScheduler, msk_cluster_arn: str,
+                                            bootstrap_servers: list[str] = None) -> None:
+        """
+        Register the Kafka benchmark with the scheduler
+        """
+        scheduler.add_check('kafka_benchmark', self.check_kafka_benchmark, msk_cluster_arn, bootstrap_servers)
@@ -0,0 +1,66 @@
+import boto3
+from .utils.msk_capacity_utils import MB, analyze_msk_capacity
+from .utils.msk_utils import MSKUtils
+from .utils.result_utils import CheckOutcome, log_outcome
+from .utils.scheduler import CheckScheduler
+from .utils.set_logging import logger
+
+
+class MSKChecks:
+    def __init__(self, session: boto3.Session, msk_cluster_arn: str, msk_utils: MSKUtils = None,
+                 expected_ingest_rate: float = 0.0, expected_partitions: int = None, metric_window_minutes: int = 60):
+        self.session = session
+        self.msk_cluster_arn = msk_cluster_arn
+        # the ingest rate in MB/s and the number of partitions Onehouse is expected to consume from the cluster
+        self.expected_ingest_rate = expected_ingest_rate
+        self.expected_partitions = expected_partitions
+        self.metric_window_minutes = metric_window_minutes
+        # share the msk utils of the run so each describe call is made once and clients are reused
+        self.msk_utils = msk_utils or MSKUtils(self.session)
+
+    def check_msk_capacity(self) -> CheckOutcome:
+        """
+        Check whether the brokers and partitions of the MSK cluster can take the expected ingest rate on top of their
+        current load, from the broker configuration and the broker throughput and CPU metrics in CloudWatch.
+        The details are the report with the headroom of every broker.
+        """
+        msk_cluster_arn = self.msk_cluster_arn
+        logger.info(f'Checking capacity of MSK cluster {msk_cluster_arn} for {self.expected_ingest_rate:g}MB/s of ingest...')
+        try:
+            cluster_info = self.msk_utils.describe_cluster(msk_cluster_arn)
+            broker_series = self.msk_utils.get_broker_metric_data([msk_cluster_arn], self.metric_window_minutes)[msk_cluster_arn]
+            report = analyze_msk_capacity(cluster_info, broker_series, self.expected_ingest_rate * MB,
+                                          self.expected_partitions)
+        except Exception as e:
+            return log_outcome(CheckOutcome('failing', f'Unable to check the capacity of MSK cluster {msk_cluster_arn}: {e}'))
+
+        for broker in report['brokers']:
+            if broker['headroom_bytes_per_s'] is not None:
+                logger.info(f'Broker {broker["broker_id"]}: {broker["bytes_in_per_s"] / MB:.2f}MB/s in, '
+                            f'{broker["bytes_out_per_s"] / MB:.2f}MB/s out, CPU {broker["cpu_percent"]:.0f}%, '
+                            f'{broker["headroom_bytes_per_s"] / MB:.2f}MB/s headroom at the expected ingest rate')
+        for finding in report['findings']:
+            if finding['status'] == 'ok':
+                logger.info(f'{finding["message"]} ✅')
+            elif finding['status'] == 'error':
+                logger.error(f'{finding["message"]} ❌')
+            else:
+                logger.warning(f'{finding["message"]} 🚧')
+        status = {'ok': 'passing', 'warning': 'warning', 'error': 'failing'}[report['status']]
+        # the findings are logged above, the first of the worst ones explains the outcome
+        levels = ('error',) if report['status'] == 'error' else ('warning', 'unknown')
+        worst = [finding['message'] for finding in report['findings'] if finding['status'] in levels]
+        explanation = worst[0] if worst else f'MSK cluster {msk_cluster_arn} takes the expected ingest rate'
+        return CheckOutcome(status, explanation, report)
+
+    def perform_all_msk_checks(self) -> None:
+        """
+        Perform all MSK checks
+        """
+        self.check_msk_capacity()
+
+    def schedule_all_msk_checks(self, scheduler: CheckScheduler) -> None:
+        """
+        Register all MSK checks with the scheduler
+        """
+        scheduler.add_check('msk_capacity', self.check_msk_capacity)
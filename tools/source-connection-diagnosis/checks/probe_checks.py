@@ -0,0 +1,68 @@
+from .utils.generic_utils import *
+from .utils.probe_utils import ProbeUtils
+from .utils.result_utils import CheckOutcome, log_outcome
+from .utils.scheduler import CheckScheduler
+
+
+class ProbeChecks:
+    def __init__(self, aws_utils: AWSUtils, probe_utils: ProbeUtils = None):
+        self.aws_utils = aws_utils
+        self.probe_utils = probe_utils or ProbeUtils()
+
+    @staticmethod
+    def probe_outcome(name: str, report: dict[tuple[str, int], dict]) -> CheckOutcome:
+        """
+        Log the probe report, failing when an endpoint can't be reached at all and a warning when some attempts failed
+        """
+        ProbeUtils.log_report(name, report)
+        unreachable = [f'{host}:{port}' for (host, port), stats in report.items() if stats['connect_ms']['p50'] is None]
+        flaky = [f'{host}:{port}' for (host, port), stats in report.items() if stats['failures']]
+        if unreachable:
+            return CheckOutcome('failing', f'{name} {", ".join(unreachable)} is not reachable', report)
+        if flaky:
+            return CheckOutcome('warning', f'Some attempts to connect to {name} {", ".join(flaky)} failed', report)
+        return CheckOutcome('passing', f'{name} accepts connections from every attempt', report)
+
+    def check_database_connectivity(self, database_name: str) -> CheckOutcome:
+        """
+        Check that the database port accepts connections from where the tool runs and measure the latency.
+        The details are the probe report.
+        """
+        logger.info(f'Probing database {database_name}...')
+        try:
+            db_instance = self.aws_utils.db_utils.describe_db_instance(database_name)
+            endpoint = (db_instance['Endpoint']['Address'], db_instance['Endpoint']['Port'])
+            report = self.probe_utils.probe_endpoints([endpoint], protocol='postgres')
+            return self.probe_outcome(f'Database {database_name}', report)
+        except Exception as e:
+            return log_outcome(CheckOutcome('failing', f'Unable to probe database {database_name}: {e}'))
+
+    def check_msk_connectivity(self, msk_cluster_arn: str, all_msk_brokers: bool = False) -> CheckOutcome:
+        """
+        Check that the MSK bootstrap brokers, or every broker of the cluster, accept connections
+        from where the tool runs and measure the latency. The details are the probe report.
+        """
+        logger.info(f'Probing MSK brokers of {msk_cluster_arn}...')
+        try:
+            msk_utils = self.aws_utils.msk_utils
+            if all_msk_brokers:
+                msk_port = msk_utils.get_msk_port(msk_cluster_arn)
+                endpoints = [(broker['host'], msk_port) for broker in msk_utils.get_msk_brokers(msk_cluster_arn)]
+            else:
+                endpoints = msk_utils.get_bootstrap_broker_endpoints(msk_cluster_arn)
+            if not endpoints:
+                return log_outcome(CheckOutcome('failing', f'No MSK brokers found for {msk_cluster_arn}'))
+            report = self.probe_utils.probe_endpoints(endpoints)
+            return self.probe_outcome('MSK broker', report)
+        except Exception as e:
+            return log_outcome(CheckOutcome('failing', f'Unable to probe MSK brokers of {msk_cluster_arn}: {e}'))
+
+    def schedule_all_probe_checks(self, scheduler: CheckScheduler, database_name: str = None,
+                                  msk_cluster_arn: str = None, all_msk_brokers: bool = False) -> None:
+        """
+        Register the probe checks with the scheduler
+        """
+        if database_name:
+            scheduler.add_check('database_connectivity', self.check_database_connectivity, database_name)
+        if msk_cluster_arn:
+            scheduler.add_check('msk_connectivity', self.check_msk_connectivity, msk_cluster_arn, all_msk_brokers)
@@ -0,0 +1,108 @@
+import io
+import json
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from .fleet_checks import *
+from .utils.sweep_utils import create_sweep_session, sweep_target_label
+
+
+def run_sweep_target(target: dict, eks_cluster_name: str, database_names: list[str] = None,
+                     msk_cluster_arns: list[str] = None, fleet_options: dict = None) -> dict:
+    """
+    Check the fleet of one region and account in a worker process, with a session, clients and run cache of its own.
+    Returns the results of every check, tagged with the region and account, the call metrics and the time it took.
+    """
+    start = time.monotonic()
+    label = sweep_target_label(target)
+    # the log lines of all regions are interleaved, so each one names its region instead of the logger
+    for handler in logging.getLogger().handlers:
+        handler.setFormatter(logging.Formatter(f'%(asctime)s - {label} - %(levelname)s - %(message)s',
+                                               datefmt='%Y-%m-%d %H:%M:%S'))
+    report = {**target, 'account': None, 'error': None, 'results': [], 'metrics': None}
+    stream = io.StringIO()
+    try:
+        aws_utils = AWSUtils(session=create_sweep_session(target))
+        metrics = CallMetrics()
+        metrics.attach(aws_utils.session)
+        metrics.call_scheduler = aws_utils.call_scheduler
+        report['account'] = aws_utils.clients.client('sts').get_caller_identity()['Account']
+        fleet_checks = FleetChecks(aws_utils, eks_cluster_name, metrics=metrics, result_writer=ResultWriter(stream),
+                                   **(fleet_options or {}))
+        fleet_checks.perform_all_fleet_checks(database_names=database_names, msk_cluster_arns=msk_cluster_arns)
+        report['metrics'] = metrics.to_dict()
+    except Exception as e:
+        logger.error(f'Error sweeping {label}: {e}')
+        report['error'] = str(e)
+    for line in stream.getvalue().splitlines():
+        report['results'].append({'region': target['region'], 'account': report['account'], **json.loads(line)})
+    report['duration_s'] = time.monotonic() - start
+    return report
+
+
+class SweepChecks:
+    def __init__(self, eks_cluster_name: str, max_parallel_regions: int = 4, fleet_options: dict = None,
+                 result_writer: ResultWriter = None):
+        """
+        Runs the fleet checks of many regions and accounts in parallel, each one in a worker process of its own,
+        and merges their results into one report. The fleet options are passed on to the fleet checks of each region.
+        """
+        self.eks_cluster_name = eks_cluster_name
+        self.max_parallel_regions = max_parallel_regions
+        self.fleet_options = fleet_options or {}
+        self.result_writer = result_writer
+
+    def log_summary(self, report: dict) -> None:
+        label = sweep_target_label(report)
+        statuses = [result['status'] for result in report['results']]
+        message = (f'{label} (account {report["account"] or "unknown"}): {statuses.count("passing")} passing, '
+                   f'{statuses.count("warning")} warning, {statuses.count("failing")} failing, '
+                   f'{statuses.count("skipped")} skipped checks in {report["duration_s"]:.1f}s')
+        if report['error'] or 'failing' in statuses:
+            logger.error(f'{message} ❌')
+        else:
+            logger.info(f'{message} ✅')
+
+    def perform_sweep(self, targets: list[dict], database_names: list[str] = None,
+                      msk_cluster_arns: list[str] = None) -> dict:
+        """
+        Sweep every region and account target, streaming the results of each one as it finishes.
+        Returns the merged report with the time spent per region.
+        """
+        start = time.monotonic()
+        reports = [None] * len(targets)
+        # workers are spawned, forking a process that has loaded boto3, SSL and thread pools is not safe,
+        # a spawned worker imports the tool again, which only runs the checks under __main__
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=min(self.max_parallel_regions, len(targets)), mp_context=context) as executor:
+            futures = {executor.submit(run_sweep_target, target, self.eks_cluster_name, database_names,
+                                       msk_cluster_arns, self.fleet_options): index for index, target in enumerate(targets)}
+            for future in as_completed(futures):
+                index = futures[future]
+                try:
+                    report = future.result()
+                except Exception as e:
+                    # the worker process died
+                    report = {**targets[index], 'account': None, 'error': str(e), 'results': [], 'metrics': None,
+                              'duration_s': time.monotonic() - start}
+                if self.result_writer:
+                    for result in report['results']:
+                        self.result_writer.write(result)
+                self.log_summary(report)
+                reports[index] = report
+
+        duration = time.monotonic() - start
+        logger.info(f'Swept {len(targets)} regions in {duration:.1f}s, '
+                    f'{sum(report["duration_s"] for report in reports):.1f}s one after the other')
+        return {
+            'duration_s': duration,
+            'regions': [{
+                **{key: value for key, value in report.items() if key not in ('results', 'metrics')},
+                **{status: [result['status'] for result in report['results']].count(status)
+                   for status in ('passing', 'warning', 'failing', 'skipped')},
+            } for report in reports],
+            'metrics': [{'region': report['region'], 'account': report['account'], **(report['metrics'] or {})}
+                        for report in reports],
+            'results': [result for report in reports for result in report['results']],
+        }
@@ -0,0 +1,213 @@
+import copy
+import json
+import threading
+import time
+import boto3
+from botocore.awsrequest import AWSResponse
+from .metrics_utils import THROTTLING_ERROR_CODES
+
+# requests per second each service, and each operation with a limit of its own, is allowed to burst to and to
+# sustain. Close to the default account limits, the adaptive backoff finds the actual limit of the account.
+DEFAULT_RATE_LIMITS = {
+    'ec2': {'capacity': 100, 'rate': 20},
+    ('ec2', 'CreateNetworkInsightsPath'): {'capacity': 50, 'rate': 5},
+    ('ec2', 'StartNetworkInsightsAnalysis'): {'capacity': 50, 'rate': 5},
+    ('ec2', 'DeleteNetworkInsightsPath'): {'capacity': 50, 'rate': 5},
+    'rds': {'capacity': 40, 'rate': 10},
+    'kafka': {'capacity': 20, 'rate': 5},
+    'cloudwatch': {'capacity': 50, 'rate': 25},
+    'eks': {'capacity': 20, 'rate': 10},
+    'glue': {'capacity': 20, 'rate': 10},
+}
+# only calls that don't change anything can be answered with the response of an identical call in flight
+READ_ONLY_PREFIXES = ('Describe', 'List', 'Get')
+# a call waits at most this long for an identical call in flight before making its own
+COALESCE_TIMEOUT = 60.0
+
+
+class TokenBucket:
+    def __init__(self, capacity: float, rate: float, clock=time.monotonic):
+        """
+        Allows bursts of capacity requests and rate requests per second after that. The rate is halved on
+        throttling, down to a sixteenth, and grows back by a fiftieth of the limit with every successful call.
+        """
+        self.capacity = capacity
+        self.max_rate = rate
+        self.rate = rate
+        self.clock = clock
+        self.tokens = capacity
+        self.updated = clock()
+        self.calls = 0
+        self.waited = 0
+        self.wait_s = 0.0
+        self.max_wait_s = 0.0
+        self.throttled = 0
+        self.lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self) -> float:
+        """
+        Take a token and return how long to wait until it is available. Tokens can be taken ahead of time,
+        so callers are served in the order they arrive.
+        """
+        with self.lock:
+            self._refill()
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            self.calls += 1
+            if wait:
+                self.waited += 1
+                self.wait_s += wait
+                self.max_wait_s = max(self.max_wait_s, wait)
+            return wait
+
+    def on_throttle(self) -> None:
+        with self.lock:
+            self._refill()
+            self.throttled += 1
+            self.rate = max(self.rate / 2, self.max_rate / 16)
+            # stop the burst, the account is already over its limit
+            self.tokens = min(self.tokens, 0)
+
+    def on_success(self) -> None:
+        with self.lock:
+            if self.rate < self.max_rate:
+                self._refill()
+                self.rate = min(self.rate + self.max_rate / 50, self.max_rate)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                'calls': self.calls,
+                'waited': self.waited,
+                'wait_s': self.wait_s,
+                'max_wait_s': self.max_wait_s,
+                'throttled': self.throttled,
+                'rate': self.rate,
+                'max_rate': self.max_rate,
+            }
+
+
+class InFlightCall:
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+
+
+class CallScheduler:
+    def __init__(self, rate_limits: dict = None, clock=time.monotonic, sleep=time.sleep):
+        """
+        Paces the AWS calls of a session with a token bucket per service and per operation with a limit of its own,
+        backs off when AWS throttles, and answers identical describe calls in flight with a single request
+        """
+        self.rate_limits = DEFAULT_RATE_LIMITS if rate_limits is None else rate_limits
+        self.clock = clock
+        self.sleep = sleep
+        self.buckets = {}
+        self.in_flight = {}
+        self.coalesced = {}
+        self.lock = threading.Lock()
+
+    def attach(self, session: boto3.Session) -> None:
+        """
+        Hook the botocore events of the session. Must be called before the session creates its first client.
+        The calls are paced ahead of other handlers, so stand-ins answering them are paced as well.
+        """
+        session.events.register('before-parameter-build', self._remember_params)
+        session.events.register_first('before-call', self._before_call)
+        session.events.register('needs-retry', self._on_attempt)
+        session.events.register('after-call', self._after_call)
+        session.events.register('after-call-error', self._after_call_error)
+
+    def _bucket(self, key) -> TokenBucket | None:
+        if key not in self.rate_limits:
+            return None
+        with self.lock:
+            if key not in self.buckets:
+                limit = self.rate_limits[key]
+                self.buckets[key] = TokenBucket(limit['capacity'], limit['rate'], self.clock)
+            return self.buckets[key]
+
+    def _buckets(self, service_name: str, operation_name: str) -> list[TokenBucket]:
+        buckets = [self._bucket(service_name), self._bucket((service_name, operation_name))]
+        return [bucket for bucket in buckets if bucket]
+
+    def _remember_params(self, params: dict, context: dict, **kwargs) -> None:
+        context['scheduler_params'] = params
+
+    def _before_call(self, model, context: dict, **kwargs):
+        service_name, operation_name = model.service_model.service_name, model.name
+        if operation_name.startswith(READ_ONLY_PREFIXES):
+            key = (service_name, operation_name,
+                   json.dumps(context.get('scheduler_params', {}), sort_keys=True, default=str))
+            with self.lock:
+                in_flight = self.in_flight.get(key)
+                if in_flight is None:
+                    self.in_flight[key] = context['scheduler_in_flight'] = InFlightCall()
+                    context['scheduler_key'] = key
+            if in_flight is not None:
+                if in_flight.done.wait(COALESCE_TIMEOUT) and in_flight.response is not None:
+                    with self.lock:
+                        self.coalesced[(service_name, operation_name)] = self.coalesced.get((service_name, operation_name), 0) + 1
+                    http_response, parsed = in_flight.response
+                    return (AWSResponse(http_response.url, http_response.status_code, http_response.headers, None),
+                            copy.deepcopy(parsed))
+                # the identical call failed or is stuck, make this one on its own
+
+        wait = max([bucket.reserve() for bucket in self._buckets(service_name, operation_name)], default=0.0)
+        if wait:
+            self.sleep(wait)
+        return None
+
+    def _finish(self, context: dict, response: tuple = None) -> None:
+        in_flight = context.pop('scheduler_in_flight', None)
+        if in_flight is None:
+            return
+        in_flight.response = response
+        with self.lock:
+            if self.in_flight.get(context.get('scheduler_key')) is in_flight:
+                del self.in_flight[context['scheduler_key']]
+        in_flight.done.set()
+
+    def _on_attempt(self, response, operation, **kwargs) -> None:
+        """
+        Called once per HTTP attempt, so throttled attempts that are retried slow down the next calls too
+        """
+        if response is None:
+            return
+        _, parsed = response
+        if ((parsed or {}).get('Error') or {}).get('Code') in THROTTLING_ERROR_CODES:
+            for bucket in self._buckets(operation.service_model.service_name, operation.name):
+                bucket.on_throttle()
+
+    def _after_call(self, model, http_response, parsed: dict, context: dict, **kwargs) -> None:
+        throttled = ((parsed or {}).get('Error') or {}).get('Code') in THROTTLING_ERROR_CODES
+        # attempts that went over HTTP were seen by _on_attempt already, those answered by a stand-in were not
+        if 'scheduler_in_flight' in context or not model.name.startswith(READ_ONLY_PREFIXES):
+            for bucket in self._buckets(model.service_model.service_name, model.name):
+                if not throttled:
+                    bucket.on_success()
+                elif 'retries' not in context:
+                    bucket.on_throttle()
+        self._finish(context, (http_response, parsed) if http_response.status_code < 300 else None)
+
+    def _after_call_error(self, context: dict, **kwargs) -> None:
+        self._finish(context)
+
+    def stats(self) -> dict:
+        """
+        Calls, queueing delays, throttling and current rate of every bucket, and the calls answered by identical calls
+        """
+        with self.lock:
+            buckets = dict(self.buckets)
+            coalesced = dict(self.coalesced)
+        return {
+            'buckets': {key if isinstance(key, str) else '.'.join(key): bucket.stats()
+                        for key, bucket in sorted(buckets.items(), key=lambda item: str(item[0]))},
+            'coalesced': {f'{service_name}.{operation_name}': count
+                          for (service_name, operation_name), count in sorted(coalesced.items())},
+        }
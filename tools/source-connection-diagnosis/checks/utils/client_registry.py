@@ -0,0 +1,31 @@
+import threading
+import boto3
+from botocore.config import Config
+
+
+class ClientRegistry:
+    def __init__(self, session: boto3.Session, max_pool_connections: int = 32):
+        """
+        Service clients of a session, each one is created on first use and then reused
+        """
+        self.session = session
+        self.config = Config(
+            max_pool_connections=max_pool_connections,
+            tcp_keepalive=True,
+            retries={'mode': 'standard', 'max_attempts': 5},
+        )
+        self.clients = {}
+        # boto3 sessions are not thread-safe, so clients are created under a lock
+        self.lock = threading.Lock()
+
+    def client(self, service_name: str):
+        """
+        Return the client for the service, creating it if needed
+        """
+        client = self.clients.get(service_name)
+        if client is not None:
+            return client
+        with self.lock:
+            if service_name not in self.clients:
+                self.clients[service_name] = self.session.client(service_name, config=self.config)
+            return self.clients[service_name]
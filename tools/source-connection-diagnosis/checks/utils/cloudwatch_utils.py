@@ -0,0 +1,188 @@
+import datetime
+
+# RDS metrics of the replication health and the capacity of a database, with the statistic to read
+DB_METRICS = {
+    'OldestReplicationSlotLag': 'Maximum',
+    'ReplicationSlotDiskUsage': 'Maximum',
+    'TransactionLogsGeneration': 'Average',
+    'TransactionLogsDiskUsage': 'Maximum',
+    'FreeStorageSpace': 'Minimum',
+    'CPUUtilization': 'Average',
+    'NetworkThroughput': 'Average',
+    'WriteThroughput': 'Average',
+}
+# MSK broker metrics of the DEFAULT monitoring level that bound the throughput of a cluster
+BROKER_METRICS = {
+    'BytesInPerSec': 'Average',
+    'BytesOutPerSec': 'Average',
+    'CpuUser': 'Average',
+    'CpuSystem': 'Average',
+    'PartitionCount': 'Maximum',
+    'KafkaDataLogsDiskUsed': 'Maximum',
+}
+# maximum number of queries in a single GetMetricData request
+MAX_METRIC_QUERIES = 500
+# a slot lagging more than this many bytes is reported, and more than ten times as much is an error
+SLOT_LAG_WARNING_BYTES = 1024 ** 3
+# the storage running out within this many hours at the current WAL retention growth is an error
+STORAGE_EXHAUSTION_ERROR_HOURS = 24
+
+
+def metric_window(window_minutes: int, period: int, now: datetime.datetime = None) -> tuple[datetime.datetime, datetime.datetime]:
+    # aligned to the period, so the same window is requested by every database of a run
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    end = datetime.datetime.fromtimestamp(now.timestamp() // period * period, datetime.timezone.utc)
+    return end - datetime.timedelta(minutes=window_minutes), end
+
+
+def metric_query(query_id: str, namespace: str, metric_name: str, statistic: str, dimensions: dict[str, str],
+                 period: int) -> dict:
+    return {
+        'Id': query_id,
+        'MetricStat': {
+            'Metric': {
+                'Namespace': namespace,
+                'MetricName': metric_name,
+                'Dimensions': [{'Name': name, 'Value': value} for name, value in dimensions.items()],
+            },
+            'Period': period,
+            'Stat': statistic,
+        },
+        'ReturnData': True,
+    }
+
+
+def build_metric_queries(database_names: list[str], period: int) -> tuple[list[dict], dict[str, tuple[str, str]]]:
+    """
+    One query per database and metric, and the database and metric of every query ID
+    """
+    queries, query_ids = [], {}
+    for i, database_name in enumerate(database_names):
+        for j, (metric_name, statistic) in enumerate(DB_METRICS.items()):
+            query_id = f'db{i}_m{j}'
+            query_ids[query_id] = (database_name, metric_name)
+            queries.append(metric_query(query_id, 'AWS/RDS', metric_name, statistic,
+                                        {'DBInstanceIdentifier': database_name}, period))
+    return queries, query_ids
+
+
+def build_broker_metric_queries(brokers: list[tuple[str, int]], period: int) -> tuple[list[dict], dict[str, tuple]]:
+    """
+    One query per MSK broker, given as cluster name and broker ID, and metric, and the broker and metric of every query ID
+    """
+    queries, query_ids = [], {}
+    for i, (cluster_name, broker_id) in enumerate(brokers):
+        for j, (metric_name, statistic) in enumerate(BROKER_METRICS.items()):
+            query_id = f'b{i}_m{j}'
+            query_ids[query_id] = ((cluster_name, broker_id), metric_name)
+            queries.append(metric_query(query_id, 'AWS/Kafka', metric_name, statistic,
+                                        {'Cluster Name': cluster_name, 'Broker ID': str(broker_id)}, period))
+    return queries, query_ids
+
+
+def get_metric_data(cloudwatch, queries: list[dict], query_ids: dict[str, tuple], start_time: datetime.datetime,
+                    end_time: datetime.datetime) -> dict[tuple, list[tuple[datetime.datetime, float]]]:
+    """
+    Run the queries in as few GetMetricData requests as possible and return the sorted points of every
+    (target, metric) of the query IDs
+    """
+    series = {key: [] for key in query_ids.values()}
+    paginator = cloudwatch.get_paginator('get_metric_data')
+    for i in range(0, len(queries), MAX_METRIC_QUERIES):
+        for page in paginator.paginate(MetricDataQueries=queries[i:i + MAX_METRIC_QUERIES], StartTime=start_time,
+                                       EndTime=end_time, ScanBy='TimestampAscending'):
+            for result in page['MetricDataResults']:
+                series[query_ids[result['Id']]].extend(zip(result['Timestamps'], result['Values']))
+    # pages may split a series, so the points are sorted once all pages are in
+    return {key: sorted(points) for key, points in series.items()}
+
+
+def trend(points: list[tuple[datetime.datetime, float]]) -> float | None:
+    """
+    The least squares slope of the points in units per second, None with fewer than two points
+    """
+    if len(points) < 2:
+        return None
+    xs = [timestamp.timestamp() for timestamp, _ in points]
+    ys = [value for _, value in points]
+    mean_x, mean_y = sum(xs) / len(xs), sum(ys) / len(ys)
+    variance = sum((x - mean_x) ** 2 for x in xs)
+    if variance == 0:
+        return None
+    return sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / variance
+
+
+def summarize(points: list[tuple[datetime.datetime, float]]) -> dict | None:
+    if not points:
+        return None
+    values = [value for _, value in points]
+    return {
+        'latest': values[-1],
+        'average': sum(values) / len(values),
+        'maximum': max(values),
+        'trend_per_s': trend(points),
+    }
+
+
+def analyze_replication_metrics(series: dict[str, list[tuple[datetime.datetime, float]]]) -> dict:
+    """
+    Rates, trends and a headroom estimate from the metric series of a database. The status is error when a
+    replication slot lags far behind or its retained WAL fills the storage soon, warning when CDC falls behind
+    or when the slot lag or the WAL generation isn't reported, so whether CDC keeps up is unknown.
+    """
+    metrics = {metric_name: summarize(points) for metric_name, points in series.items()}
+    findings = []
+    status = 'ok'
+
+    def finding(level: str, message: str) -> None:
+        nonlocal status
+        findings.append({'status': level, 'message': message})
+        if level == 'error':
+            status = level
+        elif level in ('warning', 'unknown') and status == 'ok':
+            status = 'warning'
+
+    slot_lag = metrics.get('OldestReplicationSlotLag')
+    wal_rate = metrics.get('TransactionLogsGeneration')
+    lag_growth = (slot_lag['trend_per_s'] or 0.0) if slot_lag else 0.0
+    if slot_lag is None:
+        finding('unknown', 'No replication slot lag reported, the database may have no replication slots')
+    else:
+        falling_behind = lag_growth > 0 and wal_rate and lag_growth > wal_rate['average'] / 2
+        if slot_lag['latest'] >= SLOT_LAG_WARNING_BYTES * 10:
+            finding('error', f'The oldest replication slot lags {slot_lag["latest"] / 1024 ** 3:.1f}GB behind')
+        elif slot_lag['latest'] >= SLOT_LAG_WARNING_BYTES or falling_behind:
+            finding('warning', f'The oldest replication slot lags {slot_lag["latest"] / 1024 ** 2:.0f}MB behind '
+                               f'and grows {lag_growth / 1024:.1f}kB/s')
+        else:
+            finding('ok', f'The oldest replication slot lags {slot_lag["latest"] / 1024 ** 2:.0f}MB behind')
+
+    # the WAL the slots retain grows until the storage is full if CDC doesn't catch up
+    slot_disk_usage = metrics.get('ReplicationSlotDiskUsage')
+    free_storage = metrics.get('FreeStorageSpace')
+    hours_to_full = None
+    if slot_disk_usage and free_storage and (slot_disk_usage['trend_per_s'] or 0) > 0:
+        hours_to_full = free_storage['latest'] / slot_disk_usage['trend_per_s'] / 3600
+        level = 'error' if hours_to_full < STORAGE_EXHAUSTION_ERROR_HOURS else 'warning'
+        finding(level, f'WAL retained by replication slots fills the free storage in {hours_to_full:.0f} hours')
+
+    # CDC readers drain WAL at the generation rate minus the lag growth; the instance can sustain more WAL
+    # roughly in proportion to its spare CPU, which bounds the ingest throughput CDC has to keep up with
+    headroom = None
+    if wal_rate:
+        cdc_read_rate = max(wal_rate['average'] - lag_growth, 0.0)
+        cpu = metrics.get('CPUUtilization')
+        cpu_factor = 100 / cpu['maximum'] if cpu and cpu['maximum'] > 0 else None
+        headroom = {
+            'wal_rate_bytes_per_s': wal_rate['average'],
+            'peak_wal_rate_bytes_per_s': wal_rate['maximum'],
+            'cdc_read_rate_bytes_per_s': cdc_read_rate,
+            'estimated_max_wal_rate_bytes_per_s': wal_rate['average'] * cpu_factor if cpu_factor else None,
+        }
+        if cpu and cpu['maximum'] >= 90:
+            finding('warning', f'CPU peaked at {cpu["maximum"]:.0f}%, leaving no headroom for more ingest throughput')
+    else:
+        finding('unknown', 'No WAL generation reported, the rate CDC reads at and the headroom are unknown')
+
+    return {'status': status, 'metrics': metrics, 'hours_to_storage_full': hours_to_full,
+            'headroom': headroom, 'findings': findings}
@@ -1,23 +1,140 @@
 import boto3
 import socket
 import ipaddress
+from .client_registry import ClientRegistry
+from .cloudwatch_utils import build_metric_queries, get_metric_data, metric_window
+from .parameter_utils import ParameterIndex
+from .resource_cache import ResourceCache
 from .set_logging import logger
 
 
 class DatabaseUtils:
-    def __init__(self, session: boto3.Session):
+    def __init__(self, session: boto3.Session, cache: ResourceCache = None, clients: ClientRegistry = None):
         self.session = session
+        self.cache = cache or ResourceCache()
+        self.clients = clients or ClientRegistry(self.session)
+
+    @property
+    def rds(self):
+        return self.clients.client('rds')
+
+    @property
+    def ec2(self):
+        return self.clients.client('ec2')
+
+    @property
+    def cloudwatch(self):
+        return self.clients.client('cloudwatch')
+
+    def describe_db_instance(self, database_name: str) -> dict:
+        """
+        Describe the RDS instance, the response is cached for the rest of the run
+        """
+        return self.cache.get(
+            ('rds', 'describe_db_instances', database_name),
+            lambda: self.rds.describe_db_instances(DBInstanceIdentifier=database_name)['DBInstances'][0]
+        )
+
+    def describe_db_cluster(self, cluster_identifier: str) -> dict:
+        """
+        Describe the Aurora cluster, the response is cached for the rest of the run
+        """
+        return self.cache.get(
+            ('rds', 'describe_db_clusters', cluster_identifier),
+            lambda: self.rds.describe_db_clusters(DBClusterIdentifier=cluster_identifier)['DBClusters'][0]
+        )
+
+    def _paginate_parameters(self, operation: str, **kwargs) -> ParameterIndex:
+        # the API can't filter parameters by name, so the group is read once with the largest page size and indexed
+        parameters = []
+        for page in self.rds.get_paginator(operation).paginate(**kwargs, PaginationConfig={'PageSize': 100}):
+            parameters.extend(page['Parameters'])
+        return ParameterIndex(parameters)
+
+    def get_parameter_index(self, parameter_group_name: str) -> ParameterIndex:
+        """
+        Read the parameters of the DB parameter group once, the index is shared by every database using the group
+        """
+        return self.cache.get(
+            ('rds', 'describe_db_parameters', parameter_group_name),
+            lambda: self._paginate_parameters('describe_db_parameters', DBParameterGroupName=parameter_group_name)
+        )
+
+    def get_cluster_parameter_index(self, parameter_group_name: str) -> ParameterIndex:
+        """
+        Read the parameters of the DB cluster parameter group once, the index is shared by every cluster using the group
+        """
+        return self.cache.get(
+            ('rds', 'describe_db_cluster_parameters', parameter_group_name),
+            lambda: self._paginate_parameters('describe_db_cluster_parameters',
+                                              DBClusterParameterGroupName=parameter_group_name)
+        )
+
+    def get_instance_class_memory(self, db_instance_class: str) -> int | None:
+        """
+        Retrieve the memory in bytes of the DB instance class from its EC2 instance type, used for
+        the DBInstanceClassMemory of parameter formulas. Returns None for classes without one, e.g. db.serverless.
+        """
+        try:
+            instance_type = self.cache.get(
+                ('ec2', 'describe_instance_types', db_instance_class),
+                lambda: self.ec2.describe_instance_types(
+                    InstanceTypes=[db_instance_class.removeprefix('db.')]
+                )['InstanceTypes'][0]
+            )
+            return instance_type['MemoryInfo']['SizeInMiB'] * 1024 * 1024
+        except Exception as e:
+            logger.warning(f'Unable to retrieve the memory of instance class {db_instance_class}: {e}')
+            return None
+
+    def get_db_metric_data(self, database_names: list[str], window_minutes: int = 60,
+                           period: int = 60) -> dict[str, dict[str, list]]:
+        """
+        Retrieve the replication and capacity metrics of the databases over the window with a single batched
+        GetMetricData request (more only past 500 queries or when paginated). Each database's series are
+        cached for the rest of the run, so databases fetched together are not requested again.
+        """
+        start_time, end_time = metric_window(window_minutes, period)
+
+        def cache_key(database_name: str) -> tuple:
+            return 'cloudwatch', 'get_metric_data', database_name, window_minutes, period
+
+        missing = [name for name in dict.fromkeys(database_names) if not self.cache.contains(cache_key(name))]
+
+        if missing:
+            queries, query_ids = build_metric_queries(missing, period)
+            series = {name: {} for name in missing}
+            for (database_name, metric_name), points in get_metric_data(self.cloudwatch, queries, query_ids,
+                                                                        start_time, end_time).items():
+                series[database_name][metric_name] = points
+            for database_name, metrics in series.items():
+                self.cache.set(cache_key(database_name), metrics)
+
+        return {name: self.cache.get(cache_key(name), lambda: {}) for name in database_names}
+
+    def describe_network_interfaces_by_ip(self, ip_address: str, is_public_ip: bool = False) -> list:
+        """
+        Retrieve the network interfaces that own the IP address, the response is cached for the rest of the run
+        """
+        filter_name = 'association.public-ip' if is_public_ip else 'addresses.private-ip-address'
+        return self.cache.get(
+            ('ec2', 'describe_network_interfaces', filter_name, ip_address),
+            lambda: self.ec2.describe_network_interfaces(
+                Filters=[
+                    {'Name': filter_name, 'Values': [ip_address]}
+                ]
+            )['NetworkInterfaces']
+        )
 
     def get_database_ip_address(self, database_name: str) -> str | None:
-        rds = self.session.client('rds')
         """
         Retrieve the IP address of the database
         """
         try:
-            response = rds.describe_db_instances(DBInstanceIdentifier=database_name)
-            endpoint_address = response['DBInstances'][0]['Endpoint']['Address']
+            db_instance = self.describe_db_instance(database_name)
+            endpoint_address = db_instance['Endpoint']['Address']
             # lookup ip address
-            ip_address = socket.gethostbyname(endpoint_address)
+            ip_address = self.cache.get(('dns', endpoint_address), lambda: socket.gethostbyname(endpoint_address))
             return ip_address
         except Exception as e:
             logger.error(f'Error retrieving database IP address: {e}')
@@ -35,28 +152,13 @@ class DatabaseUtils:
             return None
 
     def get_db_eni(self, ip_address: str) -> str | None:
-        ec2 = self.session.client('ec2')
         """
         Retrieve the ENI ID from the IP address
         """
         is_public_ip = self.is_public_ip(ip_address)
         try:
-            if is_public_ip:
-                response = ec2.describe_network_interfaces(
-                    Filters=[
-                        {'Name': 'association.public-ip', 'Values': [ip_address]}
-                    ]
-                )
-                eni_id = response['NetworkInterfaces'][0]['NetworkInterfaceId']
-                logger.info(f'Database ENI ID: {eni_id}')
-                return eni_id
-            else:
-                response = ec2.describe_network_interfaces(
-                    Filters=[
-                        {'Name': 'addresses.private-ip-address', 'Values': [ip_address]}
-                    ]
-                )
-            eni_id = response['NetworkInterfaces'][0]['NetworkInterfaceId']
+            network_interfaces = self.describe_network_interfaces_by_ip(ip_address, bool(is_public_ip))
+            eni_id = network_interfaces[0]['NetworkInterfaceId']
             logger.info(f'Database ENI ID: {eni_id}')
             return eni_id
         except Exception as e:
@@ -67,10 +169,9 @@ class DatabaseUtils:
         """
         Retrieve the security group and VPC ID of the RDS database
         """
-        rds = self.session.client('rds')
         try:
-            response = rds.describe_db_instances(DBInstanceIdentifier=database_name)
-            vpc_id = response['DBInstances'][0]['DBSubnetGroup']['VpcId']
+            db_instance = self.describe_db_instance(database_name)
+            vpc_id = db_instance['DBSubnetGroup']['VpcId']
             logger.info(f'DB VPC ID: {vpc_id}')
             return vpc_id
         except Exception as e:
@@ -0,0 +1,187 @@
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from .set_logging import logger
+
+SCRATCH_PREFIX = 'onehouse_diagnosis_bench_'
+INSTALL_HINT = 'python3.10 -m pip install psycopg2-binary'
+# the output plugin shipped with Postgres and available on RDS, it decodes every change into a line of text
+DECODING_PLUGIN = 'test_decoding'
+
+
+def import_psycopg2():
+    """
+    psycopg2 is only needed for the logical decoding benchmark, so it is not a required dependency of the tool
+    """
+    try:
+        import psycopg2
+    except ImportError as e:
+        raise ImportError(f'The logical decoding benchmark requires psycopg2, install it with: {INSTALL_HINT}') from e
+    return psycopg2
+
+
+class LogicalDecodingBenchmark:
+    def __init__(self, user: str = None, dbname: str = None, rows: int = 100000,
+                 row_size: int = 512, batch_size: int = 1000, concurrency: int = 2, sslmode: str = 'prefer',
+                 sample_interval: float = 1.0, timeout: float = 120.0):
+        """
+        Creates a scratch table and a temporary logical replication slot, inserts rows rows of row_size bytes in
+        transactions of batch_size rows from concurrency writers, and decodes the slot while they write.
+        Measures the decode throughput and samples the slot lag, then drops the slot and the table.
+        The user and database fall back to PGUSER and PGDATABASE, libpq reads the password from PGPASSWORD
+        or ~/.pgpass, so it is never passed on the command line.
+        """
+        self.user = user or os.environ.get('PGUSER')
+        self.dbname = dbname or os.environ.get('PGDATABASE', 'postgres')
+        self.rows = rows
+        self.row_size = row_size
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.sslmode = sslmode
+        self.sample_interval = sample_interval
+        self.timeout = timeout
+
+    def connect(self, psycopg2, host: str, port: int, autocommit: bool = True):
+        connection = psycopg2.connect(host=host, port=port, user=self.user, dbname=self.dbname, sslmode=self.sslmode,
+                                      connect_timeout=10, application_name='onehouse-source-connection-diagnosis')
+        connection.autocommit = autocommit
+        return connection
+
+    def run(self, host: str, port: int = 5432) -> dict:
+        """
+        Run the benchmark and return the write and decode throughput and the slot lag samples
+        """
+        psycopg2 = import_psycopg2()
+        name = f'{SCRATCH_PREFIX}{uuid.uuid4().hex[:8]}'
+        connection = self.connect(psycopg2, host, port)
+        slot_created = False
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(f'CREATE TABLE {name} (id bigserial PRIMARY KEY, payload text NOT NULL)')
+                # a temporary slot is dropped by Postgres if the benchmark dies before cleaning up
+                cursor.execute('SELECT pg_create_logical_replication_slot(%s, %s, true)', (name, DECODING_PLUGIN))
+                slot_created = True
+            logger.info(f'Created scratch table and temporary replication slot {name}')
+            return self._write_and_decode(psycopg2, connection, host, port, name)
+        finally:
+            try:
+                with connection.cursor() as cursor:
+                    if slot_created:
+                        cursor.execute('SELECT pg_drop_replication_slot(%s)', (name,))
+                    cursor.execute(f'DROP TABLE IF EXISTS {name}')
+            except Exception as e:
+                logger.warning(f'Unable to clean up scratch table and replication slot {name}: {e}')
+            connection.close()
+
+    def _write_and_decode(self, psycopg2, connection, host: str, port: int, name: str) -> dict:
+        deadline = time.monotonic() + self.timeout
+        written = 0
+        lock = threading.Lock()
+
+        def write(count: int) -> None:
+            nonlocal written
+            writer = self.connect(psycopg2, host, port, autocommit=False)
+            try:
+                with writer.cursor() as cursor:
+                    while count > 0 and time.monotonic() < deadline:
+                        batch = min(self.batch_size, count)
+                        # random hex doesn't compress, so the WAL volume follows the row size
+                        payload = os.urandom(self.row_size // 2 + 1).hex()[:self.row_size]
+                        cursor.execute(f'INSERT INTO {name} (payload) SELECT %s FROM generate_series(1, %s)',
+                                       (payload, batch))
+                        writer.commit()
+                        count -= batch
+                        with lock:
+                            written += batch
+            finally:
+                writer.close()
+
+        shares = [self.rows // self.concurrency + (i < self.rows % self.concurrency) for i in range(self.concurrency)]
+        executor = ThreadPoolExecutor(max_workers=self.concurrency)
+        start = time.monotonic()
+        futures = [executor.submit(write, share) for share in shares]
+
+        decoded_rows = decoded_changes = decoded_bytes = 0
+        decode_seconds = 0.0
+        write_seconds = None
+        lag_samples = []
+        last_sample = None
+        insert_pattern = f'table %.{name}: INSERT:%'
+
+        def sample_lag(cursor) -> None:
+            cursor.execute('SELECT pg_wal_lsn_diff(pg_current_wal_lsn(), confirmed_flush_lsn) '
+                           'FROM pg_replication_slots WHERE slot_name = %s', (name,))
+            lag_samples.append((round(time.monotonic() - start, 3), int(cursor.fetchone()[0] or 0)))
+
+        with connection.cursor() as cursor:
+            while time.monotonic() < deadline:
+                writers_done = all(future.done() for future in futures)
+                if writers_done and write_seconds is None:
+                    write_seconds = time.monotonic() - start
+                if writers_done and decoded_rows >= written:
+                    break
+                fetch_start = time.monotonic()
+                cursor.execute('SELECT count(*) FILTER (WHERE data LIKE %s), count(*), coalesce(sum(octet_length(data)), 0) '
+                               'FROM pg_logical_slot_get_changes(%s, NULL, %s)',
+                               (insert_pattern, name, self.batch_size * 10))
+                rows, changes, size = cursor.fetchone()
+                if changes:
+                    decode_seconds += time.monotonic() - fetch_start
+                decoded_rows += rows
+                decoded_changes += changes
+                decoded_bytes += size
+                if last_sample is None or time.monotonic() - last_sample >= self.sample_interval:
+                    last_sample = time.monotonic()
+                    sample_lag(cursor)
+                if not changes:
+                    time.sleep(0.05)
+            sample_lag(cursor)
+        executor.shutdown(wait=True)
+        elapsed = time.monotonic() - start
+        errors = [str(future.exception()) for future in futures if future.exception()]
+        write_seconds = write_seconds or elapsed
+
+        lags = [lag for _, lag in lag_samples]
+        return {
+            'slot': name,
+            'rows': self.rows,
+            'row_size': self.row_size,
+            'written_rows': written,
+            'write_errors': errors,
+            'write_rows_per_s': written / write_seconds if write_seconds else None,
+            'decoded_rows': decoded_rows,
+            'decoded_changes': decoded_changes,
+            'decoded_mb': decoded_bytes / 1024 ** 2,
+            # the time spent inside the decoding calls, so the rate is what decoding can sustain rather than
+            # the rate the writers produced changes at
+            'decode_rows_per_s': decoded_rows / decode_seconds if decode_seconds else None,
+            'decode_mb_per_s': decoded_bytes / 1024 ** 2 / decode_seconds if decode_seconds else None,
+            'drain_seconds': elapsed - write_seconds,
+            'max_lag_bytes': max(lags) if lags else None,
+            'final_lag_bytes': lags[-1] if lags else None,
+            'lag_samples': lag_samples,
+        }
+
+    @staticmethod
+    def log_report(name: str, report: dict) -> bool:
+        """
+        Log the write and decode throughput and the slot lag, returns True if every written row was decoded
+        """
+        for error in report['write_errors']:
+            logger.error(f'{name}: write failed: {error} ❌')
+        logger.info(f'{name}: wrote {report["written_rows"]} rows of {report["row_size"]} bytes at '
+                    f'{report["write_rows_per_s"] or 0:.0f} rows/s')
+        if report['lag_samples']:
+            logger.info(f'{name}: slot lag peaked at {report["max_lag_bytes"] / 1024 ** 2:.1f}MB, '
+                        f'{report["final_lag_bytes"] / 1024 ** 2:.1f}MB at the end, drained '
+                        f'{report["drain_seconds"]:.1f}s after the writes finished')
+        summary = (f'{name}: decoded {report["decoded_rows"]} rows, {report["decoded_mb"]:.1f}MB of changes at '
+                   f'{report["decode_rows_per_s"] or 0:.0f} rows/s, {report["decode_mb_per_s"] or 0:.2f}MB/s')
+        ok = report['decoded_rows'] >= report['written_rows'] and not report['write_errors']
+        if ok:
+            logger.info(f'{summary} ✅')
+        else:
+            logger.error(f'{summary}, {report["written_rows"] - report["decoded_rows"]} rows not decoded in time ❌')
+        return ok
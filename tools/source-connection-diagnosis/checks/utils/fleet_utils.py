@@ -0,0 +1,179 @@
+import fnmatch
+from concurrent.futures import ThreadPoolExecutor
+from .generic_utils import *
+
+# maximum number of values in a single EC2 filter or ID list
+EC2_BATCH_SIZE = 200
+
+
+def is_pattern(target: str) -> bool:
+    return any(char in target for char in '*?[')
+
+
+def matches_any(value: str, patterns: list[str]) -> bool:
+    return any(fnmatch.fnmatchcase(value, pattern) for pattern in patterns)
+
+
+def chunks(values: list, size: int = EC2_BATCH_SIZE):
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+class FleetUtils:
+    def __init__(self, aws_utils: AWSUtils, max_workers: int = 16):
+        self.aws_utils = aws_utils
+        self.cache = aws_utils.cache
+        self.max_workers = max_workers
+
+    def list_db_instances(self, database_names: list[str]) -> list[str]:
+        """
+        Resolve database names and patterns with a single paginated describe_db_instances call.
+        Every instance found is stored in the run cache so the per-database checks don't describe it again.
+        """
+        found = []
+        try:
+            paginator = self.aws_utils.db_utils.rds.get_paginator('describe_db_instances')
+            for page in paginator.paginate():
+                for db_instance in page['DBInstances']:
+                    identifier = db_instance['DBInstanceIdentifier']
+                    self.cache.set(('rds', 'describe_db_instances', identifier), db_instance)
+                    if matches_any(identifier, database_names):
+                        found.append(identifier)
+        except Exception as e:
+            logger.error(f'Error listing database instances: {e}')
+            return []
+
+        missing = [name for name in database_names if not is_pattern(name) and name not in found]
+        for name in missing:
+            logger.error(f'Database {name} was not found in the region ❌')
+        logger.info(f'Found {len(found)} databases to diagnose')
+        return found
+
+    def list_msk_clusters(self, msk_cluster_arns: list[str]) -> list[str]:
+        """
+        Resolve MSK cluster ARNs and patterns (matched against the ARN or the cluster name) with a single
+        paginated list_clusters call. Every cluster found is stored in the run cache.
+        """
+        found = []
+        found_names = []
+        try:
+            paginator = self.aws_utils.msk_utils.msk.get_paginator('list_clusters')
+            for page in paginator.paginate():
+                for cluster_info in page['ClusterInfoList']:
+                    arn = cluster_info['ClusterArn']
+                    self.cache.set(('kafka', 'describe_cluster', arn), cluster_info)
+                    if matches_any(arn, msk_cluster_arns) or matches_any(cluster_info['ClusterName'], msk_cluster_arns):
+                        found.append(arn)
+                        found_names.append(cluster_info['ClusterName'])
+        except Exception as e:
+            logger.error(f'Error listing MSK clusters: {e}')
+            return []
+
+        missing = [arn for arn in msk_cluster_arns if not is_pattern(arn) and arn not in found and arn not in found_names]
+        for arn in missing:
+            logger.error(f'MSK cluster {arn} was not found in the region ❌')
+        logger.info(f'Found {len(found)} MSK clusters to diagnose')
+        return found
+
+    def prefetch_network_interfaces(self, ip_addresses: list[str]) -> None:
+        """
+        Describe the network interfaces of all IP addresses with multi-value filters, one call per batch,
+        and store the result of each IP address in the run cache
+        """
+        db_utils = self.aws_utils.db_utils
+        private_ips = sorted({ip for ip in ip_addresses if ip and not db_utils.is_public_ip(ip)})
+        public_ips = sorted({ip for ip in ip_addresses if ip and db_utils.is_public_ip(ip)})
+
+        for filter_name, ips in (('addresses.private-ip-address', private_ips), ('association.public-ip', public_ips)):
+            for batch in chunks(ips):
+                try:
+                    paginator = db_utils.ec2.get_paginator('describe_network_interfaces')
+                    network_interfaces = []
+                    for page in paginator.paginate(Filters=[{'Name': filter_name, 'Values': batch}]):
+                        network_interfaces.extend(page['NetworkInterfaces'])
+                except Exception as e:
+                    logger.error(f'Error retrieving network interfaces: {e}')
+                    continue
+
+                by_ip = {ip: [] for ip in batch}
+                for network_interface in network_interfaces:
+                    for address in network_interface.get('PrivateIpAddresses', []):
+                        if filter_name == 'association.public-ip':
+                            ip = address.get('Association', {}).get('PublicIp')
+                        else:
+                            ip = address.get('PrivateIpAddress')
+                        if ip in by_ip:
+                            by_ip[ip].append(network_interface)
+                    self.cache.set(('ec2', 'describe_network_interfaces', 'network-interface-id',
+                                    network_interface['NetworkInterfaceId']), network_interface)
+                for ip, matches in by_ip.items():
+                    # an empty result is not cached, so a per-target lookup can still report it
+                    if matches:
+                        self.cache.set(('ec2', 'describe_network_interfaces', filter_name, ip), matches)
+
+    def prefetch_msk_subnets(self, msk_cluster_arns: list[str]) -> None:
+        """
+        Describe the client subnets of all MSK clusters together and store each cluster's subnets in the run cache
+        """
+        msk_utils = self.aws_utils.msk_utils
+        subnet_ids_by_cluster = {}
+        for arn in msk_cluster_arns:
+            try:
+                cluster_info = msk_utils.describe_cluster(arn)
+                subnet_ids_by_cluster[arn] = cluster_info['BrokerNodeGroupInfo']['ClientSubnets']
+            except Exception as e:
+                logger.error(f'Error retrieving MSK cluster subnets: {e}')
+
+        all_subnet_ids = sorted({subnet_id for subnet_ids in subnet_ids_by_cluster.values() for subnet_id in subnet_ids})
+        subnets_by_id = {}
+        for batch in chunks(all_subnet_ids):
+            try:
+                for subnet in msk_utils.ec2.describe_subnets(SubnetIds=batch)['Subnets']:
+                    subnets_by_id[subnet['SubnetId']] = subnet
+            except Exception as e:
+                logger.error(f'Error retrieving MSK subnets: {e}')
+
+        for subnet_ids in subnet_ids_by_cluster.values():
+            if all(subnet_id in subnets_by_id for subnet_id in subnet_ids):
+                self.cache.set(
+                    ('ec2', 'describe_subnets', tuple(sorted(subnet_ids))),
+                    [subnets_by_id[subnet_id] for subnet_id in subnet_ids]
+                )
+
+    def prefetch_database_network(self, database_names: list[str]) -> None:
+        """
+        Resolve the endpoint IPs of all databases concurrently, then describe their ENIs in bulk
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            ip_addresses = list(executor.map(self.aws_utils.db_utils.get_database_ip_address, database_names))
+        self.prefetch_network_interfaces(ip_addresses)
+
+    def prefetch_database_metrics(self, database_names: list[str], window_minutes: int = 60) -> None:
+        """
+        Retrieve the replication metrics of all databases with batched GetMetricData requests into the run cache
+        """
+        try:
+            self.aws_utils.db_utils.get_db_metric_data(database_names, window_minutes)
+        except Exception as e:
+            logger.error(f'Error retrieving database metrics: {e}')
+
+    def prefetch_msk_network(self, msk_cluster_arns: list[str]) -> None:
+        """
+        Resolve a broker IP of all MSK clusters concurrently, then describe their ENIs and subnets in bulk
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            ip_addresses = list(executor.map(self.aws_utils.msk_utils.get_msk_ip_address, msk_cluster_arns))
+        self.prefetch_network_interfaces(ip_addresses)
+        self.prefetch_msk_subnets(msk_cluster_arns)
+
+    def prefetch_msk_metrics(self, msk_cluster_arns: list[str], window_minutes: int = 60) -> None:
+        """
+        List the brokers of all MSK clusters concurrently, then retrieve the metrics of every broker with batched
+        GetMetricData requests into the run cache
+        """
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                list(executor.map(self.aws_utils.msk_utils.get_broker_ids, msk_cluster_arns))
+            self.aws_utils.msk_utils.get_broker_metric_data(msk_cluster_arns, window_minutes)
+        except Exception as e:
+            logger.error(f'Error retrieving MSK broker metrics: {e}')
@@ -1,53 +1,193 @@
+import threading
+from typing import TYPE_CHECKING
+from .call_scheduler import CallScheduler
+from .client_registry import ClientRegistry
 from .db_utils import *
-from .msk_utils import *
+from .resource_cache import ResourceCache
 from .set_logging import *
 
+if TYPE_CHECKING:
+    from .msk_utils import MSKUtils
+    from .nia_utils import NetworkInsightsPathIndex, NetworkInsightsPoller
+
 
 class AWSUtils:
-    def __init__(self, region: str):
-        self.session = boto3.Session(region_name=region)
-        self.db_utils = DatabaseUtils(self.session)
-        self.msk_utils = MSKUtils(self.session)
+    def __init__(self, region: str = None, cache: ResourceCache = None, session: boto3.Session = None,
+                 call_scheduler: CallScheduler = None):
+        # a single session and client registry is shared by every utils and checks class of the run
+        self.session = session or boto3.Session(region_name=region)
+        self.cache = cache or ResourceCache()
+        # every AWS call of the run is paced by the same scheduler, so concurrent checks stay under the rate limits
+        self.call_scheduler = call_scheduler or CallScheduler()
+        self.call_scheduler.attach(self.session)
+        self.clients = ClientRegistry(self.session)
+        self.db_utils = DatabaseUtils(self.session, self.cache, self.clients)
+        # the MSK and Network Insights utils are created on first use, so a run that doesn't need them doesn't load them
+        self._msk_utils = None
+        self._nia_paths = None
+        self._nia_poller = None
+        self._lock = threading.Lock()
+
+    @property
+    def msk_utils(self) -> 'MSKUtils':
+        with self._lock:
+            if self._msk_utils is None:
+                from .msk_utils import MSKUtils
+                self._msk_utils = MSKUtils(self.session, self.cache, self.clients)
+            return self._msk_utils
+
+    @property
+    def nia_paths(self) -> 'NetworkInsightsPathIndex':
+        with self._lock:
+            if self._nia_paths is None:
+                from .nia_utils import NetworkInsightsPathIndex
+                self._nia_paths = NetworkInsightsPathIndex(self.clients)
+            return self._nia_paths
+
+    @property
+    def nia_poller(self) -> 'NetworkInsightsPoller':
+        with self._lock:
+            if self._nia_poller is None:
+                from .nia_utils import NetworkInsightsPoller
+                self._nia_poller = NetworkInsightsPoller(self.clients)
+            return self._nia_poller
+
+    @nia_poller.setter
+    def nia_poller(self, nia_poller: 'NetworkInsightsPoller') -> None:
+        self._nia_poller = nia_poller
+
+    @property
+    def eks(self):
+        return self.clients.client('eks')
+
+    @property
+    def ec2(self):
+        return self.clients.client('ec2')
+
+    def describe_eks_cluster(self, eks_cluster_name: str) -> dict:
+        """
+        Describe the EKS cluster, the response is cached for the rest of the run
+        """
+        return self.cache.get(
+            ('eks', 'describe_cluster', eks_cluster_name),
+            lambda: self.eks.describe_cluster(name=eks_cluster_name)['cluster']
+        )
 
     def get_eks_cluster_vpc(self, eks_cluster_name: str) -> str | None:
-        eks = self.session.client('eks')
         """
         Retrieve the security group and VPC ID of the EKS cluster
         """
         try:
-            response = eks.describe_cluster(name=eks_cluster_name)
-            vpc_id = response['cluster']['resourcesVpcConfig']['vpcId']
+            cluster = self.describe_eks_cluster(eks_cluster_name)
+            vpc_id = cluster['resourcesVpcConfig']['vpcId']
             logger.info(f'EKS VPC ID: {vpc_id}')
             return vpc_id
         except Exception as e:
             logger.error(f'Error retrieving EKS cluster security group and VPC: {e}')
             return None
 
-    def get_eks_instance_id(self, eks_cluster_name: str) -> str | None:
-        ec2 = self.session.client('ec2')
+    def list_eks_nodegroups(self, eks_cluster_name: str) -> list[str]:
+        """
+        List the node groups of the EKS cluster, the response is cached for the rest of the run
+        """
+        def load() -> list[str]:
+            nodegroups = []
+            for page in self.eks.get_paginator('list_nodegroups').paginate(clusterName=eks_cluster_name):
+                nodegroups.extend(page['nodegroups'])
+            return nodegroups
+
+        return self.cache.get(('eks', 'list_nodegroups', eks_cluster_name), load)
+
+    def describe_eks_nodegroup(self, eks_cluster_name: str, nodegroup_name: str) -> dict:
         """
-        Retrieve the instance ID of the EKS cluster
+        Describe the node group, the response is cached for the rest of the run
+        """
+        return self.cache.get(
+            ('eks', 'describe_nodegroup', eks_cluster_name, nodegroup_name),
+            lambda: self.eks.describe_nodegroup(clusterName=eks_cluster_name, nodegroupName=nodegroup_name)['nodegroup']
+        )
+
+    def describe_eks_node_instances(self, eks_cluster_name: str) -> list[dict]:
+        """
+        Retrieve the running instances of every node group of the EKS cluster, tagged as cluster nodes or named after
+        the cluster, with one paginated describe_instances call per tag. The result is cached for the rest of the run,
+        and so is every instance, so the reachability checks don't describe their source again.
+        """
+        def load() -> list[dict]:
+            instances = {}
+            for tag_filter in ({'Name': 'tag-key', 'Values': [f'kubernetes.io/cluster/{eks_cluster_name}']},
+                               {'Name': 'tag:Name', 'Values': [eks_cluster_name]}):
+                paginator = self.ec2.get_paginator('describe_instances')
+                for page in paginator.paginate(Filters=[tag_filter, {'Name': 'instance-state-name', 'Values': ['running']}]):
+                    for reservation in page['Reservations']:
+                        for instance in reservation['Instances']:
+                            instances[instance['InstanceId']] = instance
+                            self.cache.set(('ec2', 'describe_instances', 'instance-id', instance['InstanceId']), instance)
+            return [instances[instance_id] for instance_id in sorted(instances)]
+
+        return self.cache.get(('ec2', 'describe_instances', 'eks-nodes', eks_cluster_name), load)
+
+    def get_eks_sources(self, eks_cluster_name: str) -> list[dict] | None:
+        """
+        Retrieve one node of the EKS cluster per distinct subnet and security group combination. Nodes that share both
+        reach the same destinations, so checking reachability from each combination covers every node group and
+        availability zone. The node with the lowest instance ID represents its combination, so the Network Insights
+        paths are reused across runs.
         """
         try:
-            instance_name = eks_cluster_name
-            response = ec2.describe_instances(
-                Filters=[
-                    {
-                        'Name': 'tag:Name',
-                        'Values': [instance_name]
-                    }
-                ]
-            )
-            if response['Reservations']:
-                instance_info = response['Reservations'][0]['Instances'][0]
-                instance_id = instance_info['InstanceId']
-                return instance_id
-            else:
-                print(f"No instance found with name: {instance_name}")
-                return None
+            instances = self.describe_eks_node_instances(eks_cluster_name)
         except Exception as e:
-            print(f"Error describing instance: {e}")
+            logger.error(f'Error describing EKS nodes: {e}')
             return None
+        if not instances:
+            logger.error(f'No running nodes found for EKS cluster {eks_cluster_name}')
+            return None
+
+        sources = {}
+        for instance in instances:
+            security_group_ids = tuple(sorted(group['GroupId'] for group in instance.get('SecurityGroups', [])))
+            tags = {tag['Key']: tag['Value'] for tag in instance.get('Tags', [])}
+            source = sources.setdefault((instance['SubnetId'], security_group_ids), {
+                'instance_id': instance['InstanceId'],
+                'subnet_id': instance['SubnetId'],
+                'availability_zone': instance.get('Placement', {}).get('AvailabilityZone'),
+                'security_group_ids': list(security_group_ids),
+                'nodegroups': [],
+                'node_count': 0,
+            })
+            source['node_count'] += 1
+            nodegroup = tags.get('eks:nodegroup-name')
+            if nodegroup and nodegroup not in source['nodegroups']:
+                source['nodegroups'].append(nodegroup)
+        sources = sorted(sources.values(), key=lambda source: (source['availability_zone'] or '', source['instance_id']))
+
+        zones = {source['availability_zone'] for source in sources}
+        logger.info(f'Found {len(instances)} EKS nodes in {len(sources)} distinct subnet and security group '
+                    f'combinations across {len(zones)} availability zones')
+        self.check_eks_nodegroup_coverage(eks_cluster_name, sources)
+        return sources
+
+    def check_eks_nodegroup_coverage(self, eks_cluster_name: str, sources: list[dict]) -> None:
+        """
+        Warn about the subnets of node groups without a running node, reachability from those can't be checked
+        """
+        try:
+            covered = {source['subnet_id'] for source in sources}
+            for nodegroup_name in self.list_eks_nodegroups(eks_cluster_name):
+                nodegroup = self.describe_eks_nodegroup(eks_cluster_name, nodegroup_name)
+                uncovered = sorted(set(nodegroup.get('subnets', [])) - covered)
+                if uncovered:
+                    logger.warning(f'Node group {nodegroup_name} has no running node in subnets {", ".join(uncovered)}, '
+                                   f'reachability from them is not checked 🚧')
+        except Exception as e:
+            logger.warning(f'Unable to check the subnets of the EKS node groups: {e}')
+
+    def get_eks_instance_id(self, eks_cluster_name: str) -> str | None:
+        """
+        Retrieve the instance ID of a node of the EKS cluster
+        """
+        sources = self.get_eks_sources(eks_cluster_name)
+        return sources[0]['instance_id'] if sources else None
 
     def check_if_db_vpc_equals_eks_vpc(self, database_name: str, eks_cluster_name: str) -> None:
         """
@@ -103,60 +243,53 @@ class AWSUtils:
             logger.error(f'Error retrieving MSK/EKS VPC ID {e}')
             return
 
-    def setup_reachability_path_to_db(self, database_name: str, eks_cluster_name: str) -> str | None:
+    def get_database_eni(self, database_name: str) -> str | None:
         """
-        Setup the reachability path between the database and the EKS cluster
+        Retrieve the ENI ID of the database
         """
-        ec2 = self.session.client('ec2')
-
         database_ip = self.db_utils.get_database_ip_address(database_name)
         if not database_ip:
             return None
+        return self.db_utils.get_db_eni(database_ip)
 
-        db_eni = self.db_utils.get_db_eni(database_ip)
+    def setup_reachability_path_to_db(self, database_name: str, eks_cluster_name: str,
+                                      db_eni: str = None, eks_instance_id: str = None) -> str | None:
+        """
+        Setup the reachability path between the database and the EKS cluster.
+        The database ENI and the EKS instance ID are looked up unless they are passed in.
+        """
+        db_eni = db_eni or self.get_database_eni(database_name)
         if not db_eni:
             return None
 
-        eks_instance_id = self.get_eks_instance_id(eks_cluster_name)
+        eks_instance_id = eks_instance_id or self.get_eks_instance_id(eks_cluster_name)
         if not eks_instance_id:
             return None
 
         try:
-            response = ec2.create_network_insights_path(
-                Source=eks_instance_id,
-                Destination=db_eni,
-                Protocol='TCP',
-            )
-            path_id = response['NetworkInsightsPath']['NetworkInsightsPathId']
-            logger.info(f'Network Insights Path ID: {path_id}')
-            return path_id
+            db_port = self.db_utils.describe_db_instance(database_name)['Endpoint']['Port']
+            return self.nia_paths.get_or_create_path(eks_instance_id, db_eni, 'TCP', db_port)
         except Exception as e:
             logger.error(f'Error setting up reachability path: {e}')
             return None
 
-    def setup_reachability_path_to_msk(self, msk_cluster_arn: str, eks_cluster_name: str) -> str | None:
+    def setup_reachability_path_to_msk(self, msk_cluster_arn: str, eks_cluster_name: str,
+                                       msk_eni: str = None, eks_instance_id: str = None) -> str | None:
         """
-        Setup the reachability path between the MSK cluster and the EKS cluster
+        Setup the reachability path between the MSK cluster and the EKS cluster.
+        The MSK ENI and the EKS instance ID are looked up unless they are passed in.
         """
-        ec2 = self.session.client('ec2')
-
-        msk_eni = self.msk_utils.get_msk_eni(msk_cluster_arn)
+        msk_eni = msk_eni or self.msk_utils.get_msk_eni(msk_cluster_arn)
         if not msk_eni:
             return None
 
-        eks_instance_id = self.get_eks_instance_id(eks_cluster_name)
+        eks_instance_id = eks_instance_id or self.get_eks_instance_id(eks_cluster_name)
         if not eks_instance_id:
             return None
 
         try:
-            response = ec2.create_network_insights_path(
-                Source=eks_instance_id,
-                Destination=msk_eni,
-                Protocol='TCP',
-            )
-            path_id = response['NetworkInsightsPath']['NetworkInsightsPathId']
-            logger.info(f'Network Insights Path ID: {path_id}')
-            return path_id
+            msk_port = self.msk_utils.get_msk_port(msk_cluster_arn)
+            return self.nia_paths.get_or_create_path(eks_instance_id, msk_eni, 'TCP', msk_port)
         except Exception as e:
             logger.error(f'Error setting up reachability path: {e}')
             return None
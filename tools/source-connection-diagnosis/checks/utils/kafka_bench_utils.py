@@ -0,0 +1,228 @@
+import functools
+import struct
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from .probe_utils import summarize_latencies
+from .set_logging import logger
+
+# every record starts with the time it was produced at, so the consumer can measure the end-to-end latency
+TIMESTAMP_FORMAT = struct.Struct('>d')
+SCRATCH_TOPIC_PREFIX = 'onehouse-diagnosis-bench-'
+INSTALL_HINT = 'python3.10 -m pip install kafka-python aws-msk-iam-sasl-signer-python'
+
+
+def import_kafka():
+    """
+    kafka-python is only needed for the produce/consume benchmark, so it is not a required dependency of the tool
+    """
+    try:
+        import kafka
+        from kafka.admin import NewTopic
+    except ImportError as e:
+        raise ImportError(f'The Kafka benchmark requires kafka-python, install it with: {INSTALL_HINT}') from e
+    return kafka, NewTopic
+
+
+def msk_iam_token_provider(region: str):
+    """
+    Token provider signing OAUTHBEARER tokens for MSK IAM authentication with the credentials of the tool
+    """
+    try:
+        from aws_msk_iam_sasl_signer import MSKAuthTokenProvider
+    except ImportError as e:
+        raise ImportError(f'MSK IAM authentication requires aws-msk-iam-sasl-signer-python, install it with: '
+                          f'{INSTALL_HINT}') from e
+    # the token provider base class moved between kafka-python releases
+    try:
+        from kafka.net.sasl.oauth import AbstractTokenProvider
+    except ImportError:
+        try:
+            from kafka.sasl.oauth import AbstractTokenProvider
+        except ImportError:
+            from kafka.oauth.abstract import AbstractTokenProvider
+
+    class MSKTokenProvider(AbstractTokenProvider):
+        def token(self) -> str:
+            token, _ = MSKAuthTokenProvider.generate_auth_token(region)
+            return token
+
+    return MSKTokenProvider()
+
+
+class KafkaBenchmark:
+    def __init__(self, record_count: int = 10000, record_size: int = 1024, batch_size: int = 16384,
+                 linger_ms: int = 5, concurrency: int = 4, security_protocol: str = 'SASL_SSL', region: str = None,
+                 timeout: float = 60.0):
+        """
+        Produces record_count records of record_size bytes to a scratch topic with one partition led by each broker,
+        from concurrency producers at once, while a consumer reads them back. The topic is deleted afterwards.
+        With SASL_SSL the clients authenticate with MSK IAM, PLAINTEXT works with a local Kafka-compatible broker.
+        """
+        self.record_count = record_count
+        self.record_size = max(record_size, TIMESTAMP_FORMAT.size)
+        self.batch_size = batch_size
+        self.linger_ms = linger_ms
+        self.concurrency = concurrency
+        self.security_protocol = security_protocol
+        self.region = region
+        self.timeout = timeout
+
+    def client_config(self, bootstrap_servers: list[str]) -> dict:
+        config = {
+            'bootstrap_servers': bootstrap_servers,
+            'security_protocol': self.security_protocol,
+            'client_id': 'onehouse-source-connection-diagnosis',
+            'request_timeout_ms': int(self.timeout * 1000),
+        }
+        if self.security_protocol == 'SASL_SSL':
+            config['sasl_mechanism'] = 'OAUTHBEARER'
+            config['sasl_oauth_token_provider'] = msk_iam_token_provider(self.region)
+        return config
+
+    def run(self, bootstrap_servers: list[str]) -> dict:
+        """
+        Run the benchmark and return the throughput and the produce and end-to-end latency percentiles per broker
+        """
+        kafka, NewTopic = import_kafka()
+        config = self.client_config(bootstrap_servers)
+        admin = kafka.KafkaAdminClient(**config)
+        topic = f'{SCRATCH_TOPIC_PREFIX}{uuid.uuid4().hex[:8]}'
+        created = False
+        try:
+            brokers = {}
+            for broker in admin.describe_cluster()['brokers']:
+                # the key of the broker ID differs between kafka-python releases
+                broker_id = broker.get('node_id', broker.get('broker_id'))
+                brokers[broker_id] = f'{broker["host"]}:{broker["port"]}'
+            broker_ids = sorted(brokers)
+            replication_factor = min(3, len(broker_ids))
+            # partition i is led by the i-th broker, so its latencies are those of that broker
+            assignments = {partition: [broker_ids[(partition + k) % len(broker_ids)] for k in range(replication_factor)]
+                           for partition in range(len(broker_ids))}
+            admin.create_topics([NewTopic(topic, replica_assignments=assignments)])
+            created = True
+            logger.info(f'Created scratch topic {topic} with a partition on each of {len(broker_ids)} brokers')
+            return self._produce_and_consume(kafka, config, topic, assignments, brokers)
+        finally:
+            try:
+                if created:
+                    admin.delete_topics([topic])
+            except Exception as e:
+                logger.warning(f'Unable to delete scratch topic {topic}: {e}')
+            admin.close()
+
+    def _produce_and_consume(self, kafka, config: dict, topic: str, assignments: dict[int, list[int]],
+                             brokers: dict[int, str]) -> dict:
+        partitions = sorted(assignments)
+        lock = threading.Lock()
+        produce_latencies = {partition: [] for partition in partitions}
+        end_to_end_latencies = {partition: [] for partition in partitions}
+        errors = {partition: 0 for partition in partitions}
+        deadline = time.monotonic() + self.timeout
+
+        consumer = kafka.KafkaConsumer(**config, enable_auto_commit=False, auto_offset_reset='earliest')
+        consumer.assign([kafka.TopicPartition(topic, partition) for partition in partitions])
+        # wait until the topic metadata has reached the brokers before producing to it
+        while len(consumer.partitions_for_topic(topic) or ()) < len(partitions) and time.monotonic() < deadline:
+            time.sleep(0.1)
+
+        # set once producing is over and the consumer had until the deadline, so it stops polling before it is closed
+        stop = threading.Event()
+
+        def consume() -> None:
+            received = 0
+            while received < self.record_count and time.monotonic() < deadline and not stop.is_set():
+                for topic_partition, records in consumer.poll(timeout_ms=200).items():
+                    now = time.time()
+                    for record in records:
+                        sent_at, = TIMESTAMP_FORMAT.unpack_from(record.value)
+                        end_to_end_latencies[topic_partition.partition].append((now - sent_at) * 1000)
+                    received += len(records)
+
+        def on_ack(partition: int, start: float, _) -> None:
+            with lock:
+                produce_latencies[partition].append((time.perf_counter() - start) * 1000)
+
+        def on_error(partition: int, _) -> None:
+            with lock:
+                errors[partition] += 1
+
+        def produce(count: int, offset: int) -> None:
+            producer = kafka.KafkaProducer(**config, acks='all', batch_size=self.batch_size, linger_ms=self.linger_ms)
+            padding = bytes(self.record_size - TIMESTAMP_FORMAT.size)
+            try:
+                for i in range(count):
+                    partition = partitions[(offset + i) % len(partitions)]
+                    start = time.perf_counter()
+                    future = producer.send(topic, TIMESTAMP_FORMAT.pack(time.time()) + padding, partition=partition)
+                    future.add_callback(functools.partial(on_ack, partition, start))
+                    future.add_errback(functools.partial(on_error, partition))
+                producer.flush(timeout=max(deadline - time.monotonic(), 0))
+            finally:
+                producer.close()
+
+        consumer_thread = threading.Thread(target=consume, daemon=True)
+        consumer_thread.start()
+        shares = [self.record_count // self.concurrency + (i < self.record_count % self.concurrency)
+                  for i in range(self.concurrency)]
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            list(executor.map(produce, shares, [sum(shares[:i]) for i in range(len(shares))]))
+        produce_seconds = time.monotonic() - start
+        consumer_thread.join(max(deadline - time.monotonic(), 0))
+        consume_seconds = time.monotonic() - start
+        stop.set()
+        # the consumer is not thread-safe, the last poll has to return before closing it
+        consumer_thread.join()
+        consumer.close()
+
+        received = sum(len(latencies) for latencies in end_to_end_latencies.values())
+        produced = sum(len(latencies) for latencies in produce_latencies.values())
+        return {
+            'topic': topic,
+            'records': self.record_count,
+            'record_size': self.record_size,
+            'produced': produced,
+            'received': received,
+            'produce_records_per_s': produced / produce_seconds if produce_seconds else None,
+            'produce_mb_per_s': produced * self.record_size / 1024 ** 2 / produce_seconds if produce_seconds else None,
+            'consume_mb_per_s': received * self.record_size / 1024 ** 2 / consume_seconds if consume_seconds else None,
+            'brokers': {
+                assignments[partition][0]: {
+                    'host': brokers[assignments[partition][0]],
+                    'produced': len(produce_latencies[partition]),
+                    'received': len(end_to_end_latencies[partition]),
+                    'errors': errors[partition],
+                    'produce_latency_ms': summarize_latencies(produce_latencies[partition]),
+                    'end_to_end_latency_ms': summarize_latencies(end_to_end_latencies[partition]),
+                }
+                for partition in partitions
+            },
+        }
+
+    @staticmethod
+    def log_report(name: str, report: dict) -> bool:
+        """
+        Log the throughput and the latency percentiles of each broker, returns True if every record made it through
+        """
+        ok = report['received'] == report['records']
+        for broker_id, broker in sorted(report['brokers'].items()):
+            produce, end_to_end = broker['produce_latency_ms'], broker['end_to_end_latency_ms']
+            message = f'{name} broker {broker_id} ({broker["host"]}): {broker["received"]}/{broker["produced"]} records'
+            if end_to_end['p50'] is not None:
+                message += (f', produce p50={produce["p50"]:.1f}ms p99={produce["p99"]:.1f}ms'
+                            f', end-to-end p50={end_to_end["p50"]:.1f}ms p99={end_to_end["p99"]:.1f}ms')
+            if broker['errors'] or broker['received'] < broker['produced']:
+                logger.error(f'{message}, {broker["errors"]} produce errors ❌')
+            else:
+                logger.info(f'{message} ✅')
+        summary = (f'{name}: produced {report["produced"]} and consumed {report["received"]} of {report["records"]} '
+                   f'records of {report["record_size"]} bytes, {report["produce_mb_per_s"] or 0:.2f}MB/s produce, '
+                   f'{report["consume_mb_per_s"] or 0:.2f}MB/s end-to-end')
+        if ok:
+            logger.info(f'{summary} ✅')
+        else:
+            logger.error(f'{summary} ❌')
+        return ok
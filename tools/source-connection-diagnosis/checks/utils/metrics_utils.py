@@ -0,0 +1,258 @@
+import bisect
+import json
+import threading
+import time
+from contextlib import contextmanager
+import boto3
+
+# error codes AWS returns when a caller goes over an API rate limit
+THROTTLING_ERROR_CODES = {
+    'Throttling', 'ThrottlingException', 'ThrottledException', 'RequestThrottledException',
+    'TooManyRequestsException', 'RequestLimitExceeded', 'ProvisionedThroughputExceededException',
+    'TransactionInProgressException', 'SlowDown', 'PriorRequestNotComplete', 'EC2ThrottledException',
+}
+# upper bounds in seconds of the AWS call latency buckets, the defaults of the Prometheus clients
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class LatencyHistogram:
+    def __init__(self, bounds: tuple[float, ...] = LATENCY_BUCKETS):
+        """
+        The number of latencies in each bucket with their sum and maximum, in constant memory however many
+        calls are made, e.g. over the cycles of watch mode
+        """
+        self.bounds = bounds
+        # the last bucket has no upper bound
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = None
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = value if self.max is None else max(self.max, value)
+
+    def quantile(self, q: float) -> float | None:
+        """
+        Estimate the quantile by interpolating within its bucket, as Prometheus does, never above the maximum
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for i, count in enumerate(self.counts):
+            if count and cumulative + count >= rank:
+                if i == len(self.bounds):
+                    return self.max
+                lower = self.bounds[i - 1] if i else 0.0
+                return min(lower + (self.bounds[i] - lower) * (rank - cumulative) / count, self.max)
+            cumulative += count
+        return self.max
+
+    def cumulative(self) -> list[tuple[str, int]]:
+        """
+        The number of latencies up to each upper bound, the buckets of a Prometheus histogram
+        """
+        buckets, cumulative = [], 0
+        for bound, count in zip([*map(str, self.bounds), '+Inf'], self.counts):
+            cumulative += count
+            buckets.append((bound, cumulative))
+        return buckets
+
+
+class CallMetrics:
+    def __init__(self):
+        """
+        Latency, retries, throttling and response size of every AWS call, plus the duration of every check.
+        Latencies are counted in histogram buckets and only the last run of each check of each target is kept,
+        so the memory doesn't grow with the number of calls or of watch cycles.
+        """
+        self.operations = {}
+        self.spans = {}
+        # seconds from the start of the tool until its first check, set by the tool
+        self.startup_s = None
+        # the call scheduler of the session, its queueing and throttling are reported with the calls, set by the tool
+        self.call_scheduler = None
+        self.lock = threading.Lock()
+
+    def attach(self, session: boto3.Session) -> None:
+        """
+        Hook the botocore events of the session. Must be called before the session creates its first client.
+        """
+        session.events.register('before-parameter-build', self._on_start)
+        session.events.register('response-received', self._on_attempt)
+        session.events.register('after-call', self._on_call)
+        session.events.register('after-call-error', self._on_call_error)
+
+    def _operation(self, event_name: str) -> dict:
+        # event names look like after-call.ec2.DescribeNetworkInterfaces
+        _, service_name, operation_name = event_name.split('.', 2)
+        key = (service_name, operation_name)
+        if key not in self.operations:
+            self.operations[key] = {
+                'calls': 0, 'errors': 0, 'attempts': 0, 'retries': 0, 'throttled': 0,
+                'response_bytes': 0, 'latency': LatencyHistogram(),
+            }
+        return self.operations[key]
+
+    def _on_start(self, context: dict, **kwargs) -> None:
+        context['metrics_start'] = time.perf_counter()
+
+    def _on_attempt(self, event_name: str, response_dict: dict = None, parsed_response: dict = None,
+                    context: dict = None, **kwargs) -> None:
+        """
+        Called once per HTTP attempt, including the attempts that are retried
+        """
+        if context is not None:
+            context['metrics_attempted'] = True
+        with self.lock:
+            operation = self._operation(event_name)
+            operation['attempts'] += 1
+            error_code = ((parsed_response or {}).get('Error') or {}).get('Code')
+            if error_code in THROTTLING_ERROR_CODES:
+                operation['throttled'] += 1
+            if response_dict:
+                headers = response_dict.get('headers') or {}
+                body = response_dict.get('body')
+                size = headers.get('content-length') or (len(body) if isinstance(body, (bytes, str)) else 0)
+                operation['response_bytes'] += int(size)
+
+    def _on_call(self, event_name: str, http_response, parsed: dict, context: dict, **kwargs) -> None:
+        latency = time.perf_counter() - context.get('metrics_start', time.perf_counter())
+        with self.lock:
+            operation = self._operation(event_name)
+            operation['calls'] += 1
+            operation['latency'].observe(latency)
+            operation['retries'] += (parsed or {}).get('ResponseMetadata', {}).get('RetryAttempts', 0)
+            if not context.get('metrics_attempted'):
+                # the response was served without an HTTP request, e.g. by a stand-in, count it as one attempt
+                operation['attempts'] += 1
+                if ((parsed or {}).get('Error') or {}).get('Code') in THROTTLING_ERROR_CODES:
+                    operation['throttled'] += 1
+            if http_response.status_code >= 300:
+                operation['errors'] += 1
+
+    def _on_call_error(self, event_name: str, context: dict, **kwargs) -> None:
+        latency = time.perf_counter() - context.get('metrics_start', time.perf_counter())
+        with self.lock:
+            operation = self._operation(event_name)
+            operation['calls'] += 1
+            operation['errors'] += 1
+            operation['latency'].observe(latency)
+
+    @contextmanager
+    def span(self, name: str, target: str = None):
+        """
+        Record the duration of a check, replacing the one of its previous run
+        """
+        start = time.perf_counter()
+        status = 'ok'
+        try:
+            yield
+        except Exception:
+            status = 'error'
+            raise
+        finally:
+            with self.lock:
+                runs = self.spans.get((target, name), {}).get('runs', 0)
+                self.spans[(target, name)] = {'check': name, 'target': target, 'status': status,
+                                              'duration_s': time.perf_counter() - start, 'runs': runs + 1}
+
+    def to_dict(self) -> dict:
+        with self.lock:
+            operations = []
+            for (service_name, operation_name), operation in sorted(self.operations.items()):
+                latency = operation['latency']
+                operations.append({
+                    'service': service_name,
+                    'operation': operation_name,
+                    'calls': operation['calls'],
+                    'errors': operation['errors'],
+                    'attempts': operation['attempts'],
+                    'retries': operation['retries'],
+                    'throttled': operation['throttled'],
+                    'response_bytes': operation['response_bytes'],
+                    'latency_s': {
+                        'total': latency.sum,
+                        'p50': latency.quantile(0.5),
+                        'p95': latency.quantile(0.95),
+                        'max': latency.max,
+                        'buckets': dict(latency.cumulative()),
+                    },
+                })
+            # the operations that took the most time in total come first
+            operations.sort(key=lambda operation: operation['latency_s']['total'], reverse=True)
+            report = {'startup_s': self.startup_s, 'aws_calls': operations, 'checks': list(self.spans.values())}
+        if self.call_scheduler is not None:
+            report['call_scheduler'] = self.call_scheduler.stats()
+        return report
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), indent=2)
+
+    def to_prometheus(self) -> str:
+        """
+        Render the metrics in the Prometheus text exposition format
+        """
+        report = self.to_dict()
+        lines = []
+
+        def metric(name: str, metric_type: str, help_text: str, samples: list[tuple[str, float]]) -> None:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {metric_type}')
+            for labels, value in samples:
+                lines.append(f'{name}{{{labels}}} {value}')
+
+        def labels(operation: dict) -> str:
+            return f'service="{operation["service"]}",operation="{operation["operation"]}"'
+
+        calls = report['aws_calls']
+        metric('aws_api_calls_total', 'counter', 'AWS API calls made',
+               [(labels(operation), operation['calls']) for operation in calls])
+        metric('aws_api_errors_total', 'counter', 'AWS API calls that failed',
+               [(labels(operation), operation['errors']) for operation in calls])
+        metric('aws_api_retries_total', 'counter', 'AWS API call retries',
+               [(labels(operation), operation['retries']) for operation in calls])
+        metric('aws_api_throttled_total', 'counter', 'AWS API attempts rejected by throttling',
+               [(labels(operation), operation['throttled']) for operation in calls])
+        metric('aws_api_response_bytes_total', 'counter', 'Bytes received from the AWS API',
+               [(labels(operation), operation['response_bytes']) for operation in calls])
+        lines.append('# HELP aws_api_call_duration_seconds Latency of the AWS API calls')
+        lines.append('# TYPE aws_api_call_duration_seconds histogram')
+        for operation in calls:
+            for bound, count in operation['latency_s']['buckets'].items():
+                lines.append(f'aws_api_call_duration_seconds_bucket{{{labels(operation)},le="{bound}"}} {count}')
+            lines.append(f'aws_api_call_duration_seconds_sum{{{labels(operation)}}} '
+                         f'{round(operation["latency_s"]["total"], 6)}')
+            lines.append(f'aws_api_call_duration_seconds_count{{{labels(operation)}}} {operation["calls"]}')
+        metric('aws_api_call_max_duration_seconds', 'gauge', 'Slowest AWS API call',
+               [(labels(operation), round(operation['latency_s']['max'] or 0, 6)) for operation in calls])
+        metric('check_duration_seconds', 'gauge', 'Duration of the last run of each check',
+               [(f'check="{span["check"]}",target="{span["target"] or ""}",status="{span["status"]}"',
+                 round(span['duration_s'], 6)) for span in report['checks']])
+        metric('check_runs_total', 'counter', 'Runs of each check',
+               [(f'check="{span["check"]}",target="{span["target"] or ""}"', span['runs'])
+                for span in report['checks']])
+        if 'call_scheduler' in report:
+            buckets = report['call_scheduler']['buckets']
+            metric('aws_api_queue_wait_seconds_sum', 'counter', 'Total time AWS API calls waited for their rate limit',
+                   [(f'bucket="{name}"', round(bucket['wait_s'], 6)) for name, bucket in buckets.items()])
+            metric('aws_api_queue_wait_seconds_max', 'gauge', 'Longest wait of an AWS API call for its rate limit',
+                   [(f'bucket="{name}"', round(bucket['max_wait_s'], 6)) for name, bucket in buckets.items()])
+            metric('aws_api_queued_total', 'counter', 'AWS API calls that waited for their rate limit',
+                   [(f'bucket="{name}"', bucket['waited']) for name, bucket in buckets.items()])
+            metric('aws_api_rate_limit', 'gauge', 'Current calls per second allowed by the rate limit',
+                   [(f'bucket="{name}"', round(bucket['rate'], 3)) for name, bucket in buckets.items()])
+            metric('aws_api_coalesced_total', 'counter', 'AWS API calls answered by an identical call in flight',
+                   [(f'operation="{name}"', count) for name, count in report['call_scheduler']['coalesced'].items()])
+        if report['startup_s'] is not None:
+            lines.append('# HELP tool_startup_seconds Time from the start of the tool until its first check')
+            lines.append('# TYPE tool_startup_seconds gauge')
+            lines.append(f'tool_startup_seconds {round(report["startup_s"], 6)}')
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path: str, output_format: str = 'json') -> None:
+        with open(path, 'w') as f:
+            f.write(self.to_prometheus() if output_format == 'prometheus' else self.to_json())
@@ -0,0 +1,180 @@
+from .cloudwatch_utils import summarize
+
+MB = 1024 ** 2
+# baseline network bandwidth per direction and baseline EBS throughput of the broker instance types in MB/s, and the
+# number of partitions per broker (leaders and followers) MSK recommends at most
+BROKER_CAPACITY = {
+    'kafka.t3.small': {'network': 16, 'storage': 21, 'max_partitions': 300},
+    'kafka.m5.large': {'network': 93, 'storage': 81, 'max_partitions': 1000},
+    'kafka.m5.xlarge': {'network': 156, 'storage': 143, 'max_partitions': 1000},
+    'kafka.m5.2xlarge': {'network': 312, 'storage': 287, 'max_partitions': 2000},
+    'kafka.m5.4xlarge': {'network': 625, 'storage': 593, 'max_partitions': 4000},
+    'kafka.m5.8xlarge': {'network': 1250, 'storage': 850, 'max_partitions': 4000},
+    'kafka.m5.12xlarge': {'network': 1500, 'storage': 1187, 'max_partitions': 4000},
+    'kafka.m5.16xlarge': {'network': 2500, 'storage': 1700, 'max_partitions': 4000},
+    'kafka.m5.24xlarge': {'network': 3125, 'storage': 2375, 'max_partitions': 4000},
+    'kafka.m7g.large': {'network': 117, 'storage': 78, 'max_partitions': 1000},
+    'kafka.m7g.xlarge': {'network': 234, 'storage': 156, 'max_partitions': 1000},
+    'kafka.m7g.2xlarge': {'network': 468, 'storage': 312, 'max_partitions': 2000},
+    'kafka.m7g.4xlarge': {'network': 937, 'storage': 625, 'max_partitions': 4000},
+    'kafka.m7g.8xlarge': {'network': 1875, 'storage': 1250, 'max_partitions': 4000},
+    'kafka.m7g.12xlarge': {'network': 2812, 'storage': 1875, 'max_partitions': 4000},
+    'kafka.m7g.16xlarge': {'network': 3750, 'storage': 2500, 'max_partitions': 4000},
+}
+# throughput of a gp2 broker volume without provisioned throughput, in MB/s
+DEFAULT_VOLUME_THROUGHPUT = 250
+# share of the network, storage and CPU capacity of a broker it should run at, leaving room for a broker
+# failure and rebalancing, MSK recommends keeping the CPU below 60%
+TARGET_UTILIZATION = 0.6
+TARGET_CPU_PERCENT = 60
+# CPU is only projected from the current load of a broker that takes at least this many bytes per second, and at
+# most this many times that load. Below it, e.g. on an idle or new cluster, the CPU mostly goes to the broker itself.
+MIN_CPU_PROJECTION_BYTES_PER_S = 1 * MB
+MAX_CPU_PROJECTION_FACTOR = 4
+# above this, a single consumer of a partition tends to fall behind
+MAX_PARTITION_THROUGHPUT = 10 * MB
+DISK_USED_WARNING_PERCENT = 85
+
+
+def broker_capacity(cluster_info: dict) -> dict | None:
+    """
+    The network and storage throughput of a broker of the cluster in bytes per second, None for unknown instance types
+    """
+    node_group = cluster_info.get('BrokerNodeGroupInfo', {})
+    capacity = BROKER_CAPACITY.get(node_group.get('InstanceType'))
+    if capacity is None:
+        return None
+    ebs_info = node_group.get('StorageInfo', {}).get('EbsStorageInfo', {})
+    provisioned = ebs_info.get('ProvisionedThroughput', {})
+    volume_throughput = provisioned['VolumeThroughput'] if provisioned.get('Enabled') else DEFAULT_VOLUME_THROUGHPUT
+    return {
+        'network_bytes_per_s': capacity['network'] * MB,
+        'storage_bytes_per_s': min(capacity['storage'], volume_throughput) * MB,
+        'max_partitions': capacity['max_partitions'],
+        'volume_size_gb': ebs_info.get('VolumeSize'),
+    }
+
+
+def analyze_msk_capacity(cluster_info: dict, broker_series: dict[int, dict[str, list]],
+                         expected_ingest_bytes_per_s: float = 0.0, expected_partitions: int = None,
+                         replication_factor: int = None) -> dict:
+    """
+    Project the load of every broker with the expected ingest rate added, spread evenly over the brokers, onto
+    its network, storage and CPU capacity, and the expected rate onto the partitions it is written to.
+    Every produced byte is written replication_factor times and read by the followers and by one more consumer.
+    The CPU is only projected from a current load that is large enough to scale from, otherwise it is unknown.
+    The status is error when a broker or a partition can't take the expected rate, warning when it runs hot
+    or when the capacity or the load of a broker is unknown.
+    """
+    findings = []
+    status = 'ok'
+
+    def finding(level: str, message: str) -> None:
+        nonlocal status
+        findings.append({'status': level, 'message': message})
+        if level == 'error':
+            status = level
+        elif level in ('warning', 'unknown') and status == 'ok':
+            status = 'warning'
+
+    instance_type = cluster_info.get('BrokerNodeGroupInfo', {}).get('InstanceType')
+    broker_count = cluster_info.get('NumberOfBrokerNodes') or len(broker_series)
+    replication_factor = replication_factor or min(3, broker_count or 1)
+    capacity = broker_capacity(cluster_info)
+    if capacity is None:
+        finding('unknown', f'Unknown capacity of broker instance type {instance_type}')
+    if not broker_series:
+        finding('unknown', 'No broker metrics, the headroom of the brokers is unknown')
+
+    added_per_broker = expected_ingest_bytes_per_s / broker_count if broker_count else 0.0
+    brokers = []
+    total_partitions = 0
+    for broker_id, series in sorted(broker_series.items()):
+        metrics = {metric_name: summarize(points) for metric_name, points in series.items()}
+        bytes_in = metrics['BytesInPerSec']['average'] if metrics.get('BytesInPerSec') else 0.0
+        bytes_out = metrics['BytesOutPerSec']['average'] if metrics.get('BytesOutPerSec') else 0.0
+        cpu = sum(metrics[name]['maximum'] for name in ('CpuUser', 'CpuSystem') if metrics.get(name))
+        partitions = int(metrics['PartitionCount']['latest']) if metrics.get('PartitionCount') else None
+        disk_used = metrics['KafkaDataLogsDiskUsed']['latest'] if metrics.get('KafkaDataLogsDiskUsed') else None
+        total_partitions += partitions or 0
+        if not any(metrics.values()):
+            finding('unknown', f'No metrics reported by broker {broker_id}')
+
+        projected_in = bytes_in + added_per_broker
+        # producer and follower traffic come in, follower fetches and consumers, including CDC, go out
+        network_in = projected_in * replication_factor
+        network_out = bytes_out + bytes_in * (replication_factor - 1) + added_per_broker * replication_factor
+        storage_write = projected_in * replication_factor
+        broker = {
+            'broker_id': broker_id,
+            'bytes_in_per_s': bytes_in,
+            'bytes_out_per_s': bytes_out,
+            'cpu_percent': cpu,
+            'partitions': partitions,
+            'disk_used_percent': disk_used,
+            'projected_bytes_in_per_s': projected_in,
+            'utilization': None,
+            'headroom_bytes_per_s': None,
+        }
+        if capacity:
+            utilization = {
+                'network_in': network_in / capacity['network_bytes_per_s'],
+                'network_out': network_out / capacity['network_bytes_per_s'],
+                'storage': storage_write / capacity['storage_bytes_per_s'],
+            }
+            # the producer bytes per second the broker can still take before reaching the target utilization
+            headroom = [
+                TARGET_UTILIZATION * capacity['network_bytes_per_s'] / replication_factor - projected_in,
+                (TARGET_UTILIZATION * capacity['network_bytes_per_s'] - network_out) / replication_factor,
+                TARGET_UTILIZATION * capacity['storage_bytes_per_s'] / replication_factor - projected_in,
+            ]
+            if cpu and bytes_in >= MIN_CPU_PROJECTION_BYTES_PER_S and projected_in <= bytes_in * MAX_CPU_PROJECTION_FACTOR:
+                # CPU grows roughly with the bytes a broker takes in
+                utilization['cpu'] = cpu * projected_in / bytes_in / 100
+                headroom.append(projected_in * (TARGET_UTILIZATION / utilization['cpu'] - 1))
+            elif cpu:
+                finding('unknown', f'Broker {broker_id} takes {bytes_in / MB:.2f}MB/s, too little to project its CPU '
+                                   f'at the expected ingest rate')
+                if cpu >= TARGET_CPU_PERCENT:
+                    finding('warning', f'Broker {broker_id} CPU peaked at {cpu:.0f}%')
+            broker['utilization'] = utilization
+            broker['headroom_bytes_per_s'] = min(headroom)
+            bottleneck = max(utilization, key=utilization.get)
+            peak = utilization[bottleneck]
+            if peak >= 1:
+                finding('error', f'Broker {broker_id} needs {peak:.0%} of its {bottleneck.replace("_", " ")} '
+                                 f'capacity at the expected ingest rate')
+            elif peak > TARGET_UTILIZATION:
+                finding('warning', f'Broker {broker_id} runs at {peak:.0%} of its {bottleneck.replace("_", " ")} '
+                                   f'capacity at the expected ingest rate, above the {TARGET_UTILIZATION:.0%} target')
+            if partitions and partitions > capacity['max_partitions']:
+                finding('warning', f'Broker {broker_id} hosts {partitions} partitions, more than the '
+                                   f'{capacity["max_partitions"]} recommended for {instance_type}')
+        elif cpu >= TARGET_CPU_PERCENT:
+            finding('warning', f'Broker {broker_id} CPU peaked at {cpu:.0f}%')
+        if disk_used is not None and disk_used >= DISK_USED_WARNING_PERCENT:
+            finding('warning', f'Broker {broker_id} uses {disk_used:.0f}% of its storage')
+        brokers.append(broker)
+
+    # the partitions the expected rate is written to, by default all leader partitions of the cluster
+    partitions = expected_partitions or (total_partitions // replication_factor if total_partitions else None)
+    partition_report = None
+    if partitions and expected_ingest_bytes_per_s:
+        per_partition = expected_ingest_bytes_per_s / partitions
+        partition_report = {
+            'partitions': partitions,
+            'bytes_per_s': per_partition,
+            'headroom_bytes_per_s': MAX_PARTITION_THROUGHPUT - per_partition,
+        }
+        if per_partition > MAX_PARTITION_THROUGHPUT:
+            finding('error', f'{per_partition / MB:.1f}MB/s per partition over {partitions} partitions is more than a '
+                             f'single consumer keeps up with, at least '
+                             f'{-(-expected_ingest_bytes_per_s // MAX_PARTITION_THROUGHPUT):.0f} partitions are needed')
+        else:
+            finding('ok', f'{per_partition / MB:.2f}MB/s per partition over {partitions} partitions')
+
+    if capacity and brokers and status == 'ok':
+        finding('ok', f'{broker_count} {instance_type} brokers take the expected ingest rate')
+    return {'status': status, 'instance_type': instance_type, 'broker_count': broker_count,
+            'replication_factor': replication_factor, 'capacity': capacity, 'brokers': brokers,
+            'partitions': partition_report, 'findings': findings}
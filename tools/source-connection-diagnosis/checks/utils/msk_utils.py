@@ -1,38 +1,132 @@
 import boto3
+import re
 import socket
+from concurrent.futures import ThreadPoolExecutor
+from .client_registry import ClientRegistry
+from .cloudwatch_utils import build_broker_metric_queries, get_metric_data, metric_window
+from .resource_cache import ResourceCache
 from .set_logging import logger
 
+# the bootstrap broker string of each security protocol Kafka clients connect with
+BOOTSTRAP_BROKER_STRINGS = {
+    'SASL_SSL': 'BootstrapBrokerStringSaslIam',
+    'SSL': 'BootstrapBrokerStringTls',
+    'PLAINTEXT': 'BootstrapBrokerString',
+}
+# MSK broker hosts start with the broker ID, e.g. b-2.orders.abc123.c3.kafka.us-west-2.amazonaws.com
+BROKER_HOST_PATTERN = re.compile(r'^b-(\d+)\.')
+
+
+def broker_id_from_host(host: str) -> int | None:
+    match = BROKER_HOST_PATTERN.match(host)
+    return int(match.group(1)) if match else None
+
 
 class MSKUtils:
-    def __init__(self, session: boto3.Session):
+    def __init__(self, session: boto3.Session, cache: ResourceCache = None, clients: ClientRegistry = None):
         self.session = session
-        self.msk = self.session.client('kafka')
-        self.ec2 = self.session.client('ec2')
+        self.cache = cache or ResourceCache()
+        self.clients = clients or ClientRegistry(self.session)
+
+    @property
+    def msk(self):
+        return self.clients.client('kafka')
+
+    @property
+    def ec2(self):
+        return self.clients.client('ec2')
+
+    @property
+    def cloudwatch(self):
+        return self.clients.client('cloudwatch')
+
+    def describe_cluster(self, msk_cluster_arn: str) -> dict:
+        """
+        Describe the MSK cluster, the response is cached for the rest of the run
+        """
+        return self.cache.get(
+            ('kafka', 'describe_cluster', msk_cluster_arn),
+            lambda: self.msk.describe_cluster(ClusterArn=msk_cluster_arn)['ClusterInfo']
+        )
+
+    def get_bootstrap_brokers(self, msk_cluster_arn: str) -> dict:
+        """
+        Retrieve the bootstrap broker strings of the MSK cluster, the response is cached for the rest of the run
+        """
+        return self.cache.get(
+            ('kafka', 'get_bootstrap_brokers', msk_cluster_arn),
+            lambda: self.msk.get_bootstrap_brokers(ClusterArn=msk_cluster_arn)
+        )
+
+    def describe_subnets(self, subnet_ids: list[str]) -> list:
+        """
+        Describe the subnets, the response is cached for the rest of the run
+        """
+        return self.cache.get(
+            ('ec2', 'describe_subnets', tuple(sorted(subnet_ids))),
+            lambda: self.ec2.describe_subnets(SubnetIds=subnet_ids)['Subnets']
+        )
 
     def get_msk_ip_address(self, msk_cluster_arn: str) -> str | None:
         try:
-            response = self.msk.get_bootstrap_brokers(ClusterArn=msk_cluster_arn)
-            bootstrap_broker_string = response['BootstrapBrokerStringSaslIam']
-            first_bootstrap_broker_endpoint = bootstrap_broker_string.split(',')[1].split(':')[0]
+            first_bootstrap_broker_host, _ = self.get_bootstrap_broker_endpoints(msk_cluster_arn)[0]
             # lookup ip address
-            ip_address = socket.gethostbyname(first_bootstrap_broker_endpoint)
+            ip_address = self.resolve_host(first_bootstrap_broker_host)
             return ip_address
         except Exception as e:
             logger.error(f'Error retrieving MSK IP address: {e}')
             return None
 
+    def get_bootstrap_broker_endpoints(self, msk_cluster_arn: str) -> list[tuple[str, int]]:
+        """
+        Retrieve the host and port of every SASL/IAM bootstrap broker
+        """
+        try:
+            response = self.get_bootstrap_brokers(msk_cluster_arn)
+            endpoints = []
+            for broker in response['BootstrapBrokerStringSaslIam'].split(','):
+                host, port = broker.rsplit(':', 1)
+                endpoints.append((host, int(port)))
+            return endpoints
+        except Exception as e:
+            logger.error(f'Error retrieving MSK bootstrap brokers: {e}')
+            return []
+
+    def get_bootstrap_servers(self, msk_cluster_arn: str, security_protocol: str = 'SASL_SSL') -> list[str]:
+        """
+        Retrieve the host:port of every bootstrap broker for the security protocol, empty if the cluster doesn't allow it
+        """
+        response = self.get_bootstrap_brokers(msk_cluster_arn)
+        broker_string = response.get(BOOTSTRAP_BROKER_STRINGS[security_protocol])
+        return broker_string.split(',') if broker_string else []
+
+    def get_msk_port(self, msk_cluster_arn: str) -> int | None:
+        """
+        Retrieve the port of the SASL/IAM bootstrap brokers
+        """
+        try:
+            response = self.get_bootstrap_brokers(msk_cluster_arn)
+            bootstrap_broker_string = response['BootstrapBrokerStringSaslIam']
+            return int(bootstrap_broker_string.split(',')[0].split(':')[1])
+        except Exception as e:
+            logger.error(f'Error retrieving MSK port: {e}')
+            return None
+
     def get_msk_eni(self, msk_cluster_arn: str) -> str | None:
         """
         Retrieve the ENI ID from the IP address
         """
         ip_address = self.get_msk_ip_address(msk_cluster_arn)
         try:
-            response = self.ec2.describe_network_interfaces(
-                Filters=[
-                    {'Name': 'addresses.private-ip-address', 'Values': [ip_address]}
-                ]
+            network_interfaces = self.cache.get(
+                ('ec2', 'describe_network_interfaces', 'addresses.private-ip-address', ip_address),
+                lambda: self.ec2.describe_network_interfaces(
+                    Filters=[
+                        {'Name': 'addresses.private-ip-address', 'Values': [ip_address]}
+                    ]
+                )['NetworkInterfaces']
             )
-            eni_id = response['NetworkInterfaces'][0]['NetworkInterfaceId']
+            eni_id = network_interfaces[0]['NetworkInterfaceId']
             logger.info(f'MSK ENI ID: {eni_id}')
             return eni_id
         except Exception as e:
@@ -44,11 +138,137 @@ class MSKUtils:
         Retrieve the VPC ID of the MSK cluster
         """
         try:
-            response = self.msk.describe_cluster(ClusterArn=msk_cluster_arn)
-            subnet_id_list = response['ClusterInfo']['BrokerNodeGroupInfo']['ClientSubnets']
-            vpc_id = self.ec2.describe_subnets(SubnetIds=subnet_id_list)['Subnets'][0]['VpcId']
+            cluster_info = self.describe_cluster(msk_cluster_arn)
+            subnet_id_list = cluster_info['BrokerNodeGroupInfo']['ClientSubnets']
+            vpc_id = self.describe_subnets(subnet_id_list)[0]['VpcId']
             logger.info(f'MSK VPC ID: {vpc_id}')
             return vpc_id
         except Exception as e:
             logger.error(f'Error retrieving MSK cluster VPC: {e}')
             return None
+
+    def resolve_host(self, host: str) -> str:
+        """
+        Resolve the host name, the result is cached for the rest of the run
+        """
+        return self.cache.get(('dns', host), lambda: socket.gethostbyname(host))
+
+    def list_broker_nodes(self, msk_cluster_arn: str) -> list:
+        """
+        Retrieve the broker nodes of the MSK cluster, the response is cached for the rest of the run
+        """
+        def load() -> list:
+            paginator = self.msk.get_paginator('list_nodes')
+            nodes = []
+            for page in paginator.paginate(ClusterArn=msk_cluster_arn):
+                nodes.extend(node for node in page['NodeInfoList'] if 'BrokerNodeInfo' in node)
+            return nodes
+
+        return self.cache.get(('kafka', 'list_nodes', msk_cluster_arn), load)
+
+    def get_msk_brokers(self, msk_cluster_arn: str, max_workers: int = 16) -> list[dict]:
+        """
+        Retrieve every broker of the MSK cluster with its IP address, ENI, subnet and availability zone.
+        The broker hosts are resolved concurrently and all IPs are mapped to ENIs in one batched call.
+        """
+        brokers = []
+        try:
+            for node in self.list_broker_nodes(msk_cluster_arn):
+                broker_info = node['BrokerNodeInfo']
+                brokers.append({
+                    'broker_id': int(broker_info['BrokerId']),
+                    'host': broker_info['Endpoints'][0],
+                    'subnet_id': broker_info.get('ClientSubnet'),
+                    'ip_address': None,
+                    'eni_id': None,
+                    'availability_zone': None,
+                })
+        except Exception as e:
+            # fall back to the bootstrap brokers, e.g. when kafka:ListNodes is not allowed
+            logger.warning(f'Unable to list MSK broker nodes, using the bootstrap brokers instead: {e}')
+            for position, (host, _) in enumerate(self.get_bootstrap_broker_endpoints(msk_cluster_arn), start=1):
+                # the metrics and results of a broker are keyed by its real ID
+                broker_id = broker_id_from_host(host)
+                if broker_id is None:
+                    logger.warning(f'Unable to read the broker ID of MSK broker {host}, numbering it {position}')
+                    broker_id = position
+                brokers.append({'broker_id': broker_id, 'host': host, 'subnet_id': None, 'ip_address': None,
+                                'eni_id': None, 'availability_zone': None})
+        if not brokers:
+            return []
+
+        def resolve(host: str) -> str | None:
+            try:
+                return self.resolve_host(host)
+            except Exception as e:
+                logger.error(f'Error resolving MSK broker {host}: {e}')
+                return None
+
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(brokers))) as executor:
+            for broker, ip_address in zip(brokers, executor.map(resolve, [broker['host'] for broker in brokers])):
+                broker['ip_address'] = ip_address
+
+        ip_addresses = sorted({broker['ip_address'] for broker in brokers if broker['ip_address']})
+        network_interfaces_by_ip = {}
+        if ip_addresses:
+            try:
+                paginator = self.ec2.get_paginator('describe_network_interfaces')
+                for page in paginator.paginate(Filters=[{'Name': 'addresses.private-ip-address', 'Values': ip_addresses}]):
+                    for network_interface in page['NetworkInterfaces']:
+                        for address in network_interface.get('PrivateIpAddresses', []):
+                            if address.get('PrivateIpAddress') in ip_addresses:
+                                network_interfaces_by_ip.setdefault(address['PrivateIpAddress'], []).append(network_interface)
+            except Exception as e:
+                logger.error(f'Error retrieving MSK broker ENIs: {e}')
+
+        for ip_address, network_interfaces in network_interfaces_by_ip.items():
+            self.cache.set(('ec2', 'describe_network_interfaces', 'addresses.private-ip-address', ip_address), network_interfaces)
+        for broker in brokers:
+            network_interfaces = network_interfaces_by_ip.get(broker['ip_address'])
+            if network_interfaces:
+                broker['eni_id'] = network_interfaces[0]['NetworkInterfaceId']
+                broker['subnet_id'] = network_interfaces[0]['SubnetId']
+                broker['availability_zone'] = network_interfaces[0]['AvailabilityZone']
+        logger.info(f'Found {len(brokers)} MSK brokers in '
+                    f'{len({broker["availability_zone"] for broker in brokers if broker["availability_zone"]})} availability zones')
+        return sorted(brokers, key=lambda broker: broker['broker_id'])
+
+    def get_broker_ids(self, msk_cluster_arn: str) -> list[int]:
+        """
+        Retrieve the broker IDs of the MSK cluster, numbered from 1 when the nodes can't be listed
+        """
+        try:
+            return sorted(int(node['BrokerNodeInfo']['BrokerId']) for node in self.list_broker_nodes(msk_cluster_arn))
+        except Exception as e:
+            logger.warning(f'Unable to list MSK broker nodes, numbering the brokers instead: {e}')
+            return list(range(1, self.describe_cluster(msk_cluster_arn)['NumberOfBrokerNodes'] + 1))
+
+    def get_broker_metric_data(self, msk_cluster_arns: list[str], window_minutes: int = 60,
+                               period: int = 60) -> dict[str, dict[int, dict[str, list]]]:
+        """
+        Retrieve the throughput, CPU, partition and disk metrics of every broker of the clusters over the window with
+        a single batched GetMetricData request (more only past 500 queries or when paginated). Each cluster's series
+        are cached for the rest of the run, so clusters fetched together are not requested again.
+        """
+        start_time, end_time = metric_window(window_minutes, period)
+
+        def cache_key(msk_cluster_arn: str) -> tuple:
+            return 'cloudwatch', 'get_metric_data', msk_cluster_arn, window_minutes, period
+
+        missing = [arn for arn in dict.fromkeys(msk_cluster_arns) if not self.cache.contains(cache_key(arn))]
+
+        if missing:
+            brokers, cluster_arns = [], {}
+            for msk_cluster_arn in missing:
+                cluster_name = self.describe_cluster(msk_cluster_arn)['ClusterName']
+                cluster_arns[cluster_name] = msk_cluster_arn
+                brokers.extend((cluster_name, broker_id) for broker_id in self.get_broker_ids(msk_cluster_arn))
+            queries, query_ids = build_broker_metric_queries(brokers, period)
+            series = {arn: {} for arn in missing}
+            for ((cluster_name, broker_id), metric_name), points in get_metric_data(self.cloudwatch, queries, query_ids,
+                                                                                    start_time, end_time).items():
+                series[cluster_arns[cluster_name]].setdefault(broker_id, {})[metric_name] = points
+            for msk_cluster_arn, brokers_series in series.items():
+                self.cache.set(cache_key(msk_cluster_arn), brokers_series)
+
+        return {arn: self.cache.get(cache_key(arn), lambda: {}) for arn in msk_cluster_arns}
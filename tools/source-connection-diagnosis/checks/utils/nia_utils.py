@@ -0,0 +1,151 @@
+import threading
+import time
+from .client_registry import ClientRegistry
+from .set_logging import logger
+
+
+class NetworkInsightsPathIndex:
+    def __init__(self, clients: ClientRegistry):
+        """
+        Index of the existing Network Insights paths keyed by source, destination, protocol and port,
+        so a matching path is reused instead of created again on every run
+        """
+        self.clients = clients
+        self.paths = None
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def path_key(source: str, destination: str, protocol: str, destination_port: int = None) -> tuple:
+        return source, destination, protocol.lower(), destination_port
+
+    def _load(self) -> None:
+        self.paths = {}
+        paginator = self.clients.client('ec2').get_paginator('describe_network_insights_paths')
+        for page in paginator.paginate():
+            for path in page['NetworkInsightsPaths']:
+                # paths pinned to specific IPs or filters answer a different question than ours
+                if path.get('SourceIp') or path.get('DestinationIp') or path.get('FilterAtSource') or path.get('FilterAtDestination'):
+                    continue
+                key = self.path_key(path['Source'], path.get('Destination'), path['Protocol'], path.get('DestinationPort'))
+                self.paths.setdefault(key, path['NetworkInsightsPathId'])
+        logger.info(f'Found {len(self.paths)} existing Network Insights paths')
+
+    def get_or_create_path(self, source: str, destination: str, protocol: str = 'TCP', destination_port: int = None) -> str:
+        """
+        Return the ID of a matching existing path, creating the path if there is none
+        """
+        key = self.path_key(source, destination, protocol, destination_port)
+        with self.lock:
+            if self.paths is None:
+                self._load()
+            if key in self.paths:
+                logger.info(f'Reusing Network Insights Path ID: {self.paths[key]}')
+                return self.paths[key]
+
+            params = {'Source': source, 'Destination': destination, 'Protocol': protocol}
+            if destination_port:
+                params['DestinationPort'] = destination_port
+            response = self.clients.client('ec2').create_network_insights_path(**params)
+            path_id = response['NetworkInsightsPath']['NetworkInsightsPathId']
+            self.paths[key] = path_id
+            logger.info(f'Network Insights Path ID: {path_id}')
+            return path_id
+
+
+class NetworkInsightsPoller:
+    def __init__(self, clients: ClientRegistry, initial_interval: float = 2.0, max_interval: float = 10.0,
+                 backoff: float = 1.5, clock=time.monotonic, sleep=time.sleep):
+        """
+        Follows any number of Network Insights analyses with one batched describe call per tick.
+        Each analysis is polled after a short first interval that grows by the backoff factor up to the cap.
+        Whichever waiting thread finds no poll in progress does the polling for all of them.
+        """
+        self.clients = clients
+        self.initial_interval = initial_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.clock = clock
+        self.sleep = sleep
+        self.pending = {}
+        self.results = {}
+        self.polling = False
+        self.condition = threading.Condition()
+
+    def wait(self, analysis_id: str, timeout: float = None) -> dict:
+        """
+        Block until the analysis is no longer running and return its description
+        """
+        deadline = self.clock() + timeout if timeout else None
+        with self.condition:
+            self.pending[analysis_id] = {
+                'next_poll': self.clock() + self.initial_interval,
+                'interval': self.initial_interval,
+            }
+
+        while True:
+            with self.condition:
+                while analysis_id not in self.results and self.polling:
+                    self.condition.wait()
+                if analysis_id in self.results:
+                    result = self.results.pop(analysis_id)
+                    if isinstance(result, Exception):
+                        raise result
+                    return result
+                if deadline and self.clock() >= deadline:
+                    self.pending.pop(analysis_id, None)
+                    raise TimeoutError(f'Network Insights Analysis {analysis_id} did not finish in {timeout}s')
+                self.polling = True
+
+            try:
+                self._poll_once(deadline)
+            finally:
+                with self.condition:
+                    self.polling = False
+                    self.condition.notify_all()
+
+    def _poll_once(self, deadline: float = None) -> None:
+        with self.condition:
+            if not self.pending:
+                return
+            next_poll = min(state['next_poll'] for state in self.pending.values())
+        if deadline:
+            next_poll = min(next_poll, deadline)
+        delay = next_poll - self.clock()
+        if delay > 0:
+            self.sleep(delay)
+
+        # analyses that are nearly due are polled in the same call instead of a separate tick right after
+        coalesce_until = self.clock() + self.initial_interval / 2
+        with self.condition:
+            due_ids = [analysis_id for analysis_id, state in self.pending.items() if state['next_poll'] <= coalesce_until]
+        if not due_ids:
+            return
+
+        try:
+            analyses = []
+            paginator = self.clients.client('ec2').get_paginator('describe_network_insights_analyses')
+            for page in paginator.paginate(NetworkInsightsAnalysisIds=due_ids):
+                analyses.extend(page['NetworkInsightsAnalyses'])
+        except Exception as e:
+            with self.condition:
+                for analysis_id in due_ids:
+                    self.pending.pop(analysis_id, None)
+                    self.results[analysis_id] = e
+            return
+
+        analyses_by_id = {analysis['NetworkInsightsAnalysisId']: analysis for analysis in analyses}
+        now = self.clock()
+        with self.condition:
+            for analysis_id in due_ids:
+                state = self.pending.get(analysis_id)
+                if state is None:
+                    continue
+                analysis = analyses_by_id.get(analysis_id)
+                # a freshly started analysis may not be listed yet, keep polling it like a running one
+                if analysis is None or analysis['Status'] == 'running':
+                    state['interval'] = min(state['interval'] * self.backoff, self.max_interval)
+                    state['next_poll'] = now + state['interval']
+                else:
+                    del self.pending[analysis_id]
+                    self.results[analysis_id] = analysis
+        logger.info(f'Polled {len(due_ids)} Network Insights analyses, {len(self.pending)} still running')
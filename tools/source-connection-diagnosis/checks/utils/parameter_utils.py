@@ -0,0 +1,196 @@
+import ast
+import operator
+
+# PostgreSQL defaults of the parameters that limit CDC, used when the parameter group leaves them unset
+CDC_PARAMETER_DEFAULTS = {
+    'rds.logical_replication': '0',
+    'max_wal_senders': '10',
+    'max_replication_slots': '10',
+    'max_logical_replication_workers': '4',
+    'max_worker_processes': '8',
+    'wal_sender_timeout': '60000',
+    'max_slot_wal_keep_size': '-1',
+    'logical_decoding_work_mem': '65536',
+}
+# a consumer pausing longer than this (ms) is disconnected, e.g. during a sync of a large table
+MIN_WAL_SENDER_TIMEOUT_MS = 10000
+# a slot retaining less WAL than this (MB) is invalidated by a short consumer outage
+MIN_SLOT_WAL_KEEP_SIZE_MB = 1024
+# the share of the storage the retained WAL of lagging slots may take before the instance runs out of space
+MAX_SLOT_WAL_KEEP_STORAGE_SHARE = 0.5
+# the share of the memory all logical decoding buffers together may take
+MAX_DECODING_MEMORY_SHARE = 0.25
+
+FORMULA_FUNCTIONS = {'GREATEST': max, 'LEAST': min, 'SUM': lambda *values: sum(values)}
+FORMULA_OPERATORS = {ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul, ast.Div: operator.floordiv}
+
+
+def evaluate_formula(value: str, variables: dict[str, int]) -> int | None:
+    """
+    Evaluate a numeric parameter value, including RDS formulas such as GREATEST({DBInstanceClassMemory/9531392},5000).
+    Returns None when the value isn't numeric or uses an unknown variable.
+    """
+    expression = value.replace('{', '(').replace('}', ')')
+
+    def evaluate(node: ast.AST) -> int:
+        if isinstance(node, ast.Expression):
+            return evaluate(node.body)
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+            return int(node.value)
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+            return -evaluate(node.operand)
+        if isinstance(node, ast.BinOp) and type(node.op) in FORMULA_OPERATORS:
+            return FORMULA_OPERATORS[type(node.op)](evaluate(node.left), evaluate(node.right))
+        if isinstance(node, ast.Name) and node.id in variables:
+            return variables[node.id]
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in FORMULA_FUNCTIONS:
+            return FORMULA_FUNCTIONS[node.func.id](*[evaluate(arg) for arg in node.args])
+        raise ValueError(f'Unsupported expression in {value}')
+
+    try:
+        return evaluate(ast.parse(expression, mode='eval'))
+    except (SyntaxError, ValueError, ZeroDivisionError):
+        return None
+
+
+class ParameterIndex:
+    def __init__(self, parameters: list[dict]):
+        """
+        The parameters of a parameter group indexed by name, built once per group and shared by its databases
+        """
+        self.parameters = {parameter['ParameterName']: parameter for parameter in parameters}
+
+    def merge(self, other: 'ParameterIndex') -> 'ParameterIndex':
+        """
+        Return an index with the parameters set in the other group taking precedence,
+        e.g. an Aurora cluster parameter group over the instance parameter group
+        """
+        merged = ParameterIndex([])
+        merged.parameters = dict(self.parameters)
+        for name, parameter in other.parameters.items():
+            if 'ParameterValue' in parameter or name not in merged.parameters:
+                merged.parameters[name] = parameter
+        return merged
+
+    def raw_value(self, name: str) -> str | None:
+        parameter = self.parameters.get(name, {})
+        return parameter.get('ParameterValue', CDC_PARAMETER_DEFAULTS.get(name))
+
+    def value(self, name: str, variables: dict[str, int]) -> int | None:
+        raw_value = self.raw_value(name)
+        return evaluate_formula(raw_value, variables) if raw_value is not None else None
+
+    def cdc_values(self) -> dict[str, str | None]:
+        """
+        The raw values of the parameters that limit CDC, what the CDC readiness of the group depends on
+        """
+        return {name: self.raw_value(name) for name in CDC_PARAMETER_DEFAULTS}
+
+
+def analyze_cdc_readiness(parameters: ParameterIndex, memory_bytes: int | None, allocated_storage_gb: int | None,
+                          expected_slots: int = 1) -> dict:
+    """
+    Evaluate the parameters that limit logical replication against the instance class, its storage and the
+    number of replication slots CDC is expected to use. Returns a sizing verdict with one finding per parameter.
+    """
+    variables = {'DBInstanceClassMemory': memory_bytes} if memory_bytes else {}
+    findings = []
+
+    def finding(name: str, value, status: str, message: str) -> None:
+        findings.append({'parameter': name, 'value': value, 'status': status, 'message': message})
+
+    logical_replication = parameters.raw_value('rds.logical_replication')
+    if logical_replication == '1':
+        finding('rds.logical_replication', logical_replication, 'ok', 'Logical replication is enabled')
+    else:
+        finding('rds.logical_replication', logical_replication, 'blocking', 'Logical replication is not enabled')
+
+    max_replication_slots = parameters.value('max_replication_slots', variables)
+    if max_replication_slots is None:
+        finding('max_replication_slots', parameters.raw_value('max_replication_slots'), 'unknown',
+                'Unable to evaluate the number of replication slots')
+    elif max_replication_slots < expected_slots:
+        finding('max_replication_slots', max_replication_slots, 'blocking',
+                f'Only {max_replication_slots} replication slots for {expected_slots} expected CDC slots')
+    elif max_replication_slots < expected_slots + 2:
+        finding('max_replication_slots', max_replication_slots, 'warning',
+                f'{max_replication_slots} replication slots leave little room next to {expected_slots} CDC slots '
+                f'for other consumers or re-creating a slot')
+    else:
+        finding('max_replication_slots', max_replication_slots, 'ok',
+                f'{max_replication_slots} replication slots for {expected_slots} expected CDC slots')
+
+    max_wal_senders = parameters.value('max_wal_senders', variables)
+    if max_wal_senders is None:
+        finding('max_wal_senders', parameters.raw_value('max_wal_senders'), 'unknown',
+                'Unable to evaluate the number of WAL senders')
+    elif max_wal_senders < expected_slots:
+        finding('max_wal_senders', max_wal_senders, 'blocking',
+                f'Only {max_wal_senders} WAL senders for {expected_slots} expected CDC slots, each streaming slot uses one')
+    elif max_replication_slots is not None and max_wal_senders < max_replication_slots:
+        finding('max_wal_senders', max_wal_senders, 'warning',
+                f'{max_wal_senders} WAL senders can stream only part of the {max_replication_slots} replication slots')
+    else:
+        finding('max_wal_senders', max_wal_senders, 'ok', f'{max_wal_senders} WAL senders')
+
+    max_logical_replication_workers = parameters.value('max_logical_replication_workers', variables)
+    max_worker_processes = parameters.value('max_worker_processes', variables)
+    if (max_logical_replication_workers is not None and max_worker_processes is not None
+            and max_logical_replication_workers >= max_worker_processes):
+        finding('max_logical_replication_workers', max_logical_replication_workers, 'warning',
+                f'{max_logical_replication_workers} logical replication workers take all {max_worker_processes} '
+                f'worker processes, only subscriptions on this instance use them')
+    else:
+        finding('max_logical_replication_workers', max_logical_replication_workers, 'ok',
+                'Logical replication workers only serve subscriptions on this instance, not external CDC readers')
+
+    wal_sender_timeout = parameters.value('wal_sender_timeout', variables)
+    if wal_sender_timeout is not None and 0 < wal_sender_timeout < MIN_WAL_SENDER_TIMEOUT_MS:
+        finding('wal_sender_timeout', wal_sender_timeout, 'warning',
+                f'A WAL sender timeout of {wal_sender_timeout}ms disconnects CDC readers that pause briefly')
+    else:
+        finding('wal_sender_timeout', wal_sender_timeout, 'ok', f'WAL sender timeout is {wal_sender_timeout}ms')
+
+    max_slot_wal_keep_size = parameters.value('max_slot_wal_keep_size', variables)
+    storage_mb = allocated_storage_gb * 1024 if allocated_storage_gb else None
+    if max_slot_wal_keep_size is None or max_slot_wal_keep_size < 0:
+        finding('max_slot_wal_keep_size', max_slot_wal_keep_size, 'warning',
+                'A stalled replication slot can retain WAL until the storage is full')
+    elif max_slot_wal_keep_size < MIN_SLOT_WAL_KEEP_SIZE_MB:
+        finding('max_slot_wal_keep_size', max_slot_wal_keep_size, 'warning',
+                f'A slot lagging more than {max_slot_wal_keep_size}MB is invalidated and CDC has to resync')
+    elif storage_mb and max_slot_wal_keep_size * expected_slots > storage_mb * MAX_SLOT_WAL_KEEP_STORAGE_SHARE:
+        finding('max_slot_wal_keep_size', max_slot_wal_keep_size, 'warning',
+                f'{expected_slots} slots retaining {max_slot_wal_keep_size}MB each can take more than half of '
+                f'the {allocated_storage_gb}GB storage')
+    else:
+        finding('max_slot_wal_keep_size', max_slot_wal_keep_size, 'ok',
+                f'Each slot retains at most {max_slot_wal_keep_size}MB of WAL')
+
+    logical_decoding_work_mem = parameters.value('logical_decoding_work_mem', variables)
+    max_senders = max_wal_senders or expected_slots
+    if logical_decoding_work_mem is None:
+        finding('logical_decoding_work_mem', parameters.raw_value('logical_decoding_work_mem'), 'unknown',
+                'Unable to evaluate the logical decoding memory')
+    elif memory_bytes and logical_decoding_work_mem * 1024 * max_senders > memory_bytes * MAX_DECODING_MEMORY_SHARE:
+        finding('logical_decoding_work_mem', logical_decoding_work_mem, 'warning',
+                f'{max_senders} WAL senders decoding with {logical_decoding_work_mem}kB each can take more than a '
+                f'quarter of the instance memory')
+    elif logical_decoding_work_mem < 65536:
+        finding('logical_decoding_work_mem', logical_decoding_work_mem, 'warning',
+                f'Transactions larger than {logical_decoding_work_mem}kB spill to disk while decoding')
+    else:
+        finding('logical_decoding_work_mem', logical_decoding_work_mem, 'ok',
+                f'Transactions up to {logical_decoding_work_mem}kB are decoded in memory')
+
+    statuses = {item['status'] for item in findings}
+    if 'blocking' in statuses:
+        verdict = 'not ready'
+    elif statuses & {'warning', 'unknown'}:
+        verdict = 'ready with warnings'
+    else:
+        verdict = 'ready'
+    slot_capacity = None
+    if max_replication_slots is not None and max_wal_senders is not None:
+        slot_capacity = min(max_replication_slots, max_wal_senders)
+    return {'verdict': verdict, 'expected_slots': expected_slots, 'slot_capacity': slot_capacity, 'findings': findings}
@@ -0,0 +1,124 @@
+import math
+import socket
+import ssl
+import struct
+import time
+from concurrent.futures import ThreadPoolExecutor
+from .set_logging import logger
+
+# message a Postgres client sends to ask the server to switch to TLS
+POSTGRES_SSL_REQUEST = struct.pack('!ii', 8, 80877103)
+
+
+def percentile(values: list[float], pct: float) -> float | None:
+    """
+    Nearest-rank percentile of the values
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize_latencies(values: list[float]) -> dict:
+    return {
+        'min': min(values) if values else None,
+        'p50': percentile(values, 50),
+        'p95': percentile(values, 95),
+        'p99': percentile(values, 99),
+        'max': max(values) if values else None,
+    }
+
+
+class ProbeUtils:
+    def __init__(self, timeout: float = 3.0, count: int = 5, concurrency: int = 16, tls: bool = False,
+                 verify_tls: bool = False):
+        """
+        Measures reachability by opening real TCP connections, optionally followed by a TLS handshake
+        """
+        self.timeout = timeout
+        self.count = count
+        self.concurrency = concurrency
+        self.tls = tls
+        self.ssl_context = ssl.create_default_context()
+        if not verify_tls:
+            # only the handshake latency matters here, the certificate is checked by the real clients
+            self.ssl_context.check_hostname = False
+            self.ssl_context.verify_mode = ssl.CERT_NONE
+
+    def probe_once(self, host: str, port: int, protocol: str = None) -> dict:
+        """
+        Open one connection to the endpoint and time the TCP connect and the TLS handshake in milliseconds.
+        With protocol 'postgres' the TLS handshake is preceded by the Postgres SSLRequest message.
+        """
+        result = {'connect_ms': None, 'handshake_ms': None, 'error': None}
+        start = time.perf_counter()
+        try:
+            with socket.create_connection((host, port), timeout=self.timeout) as sock:
+                result['connect_ms'] = (time.perf_counter() - start) * 1000
+                if not self.tls:
+                    return result
+
+                handshake_start = time.perf_counter()
+                if protocol == 'postgres':
+                    sock.sendall(POSTGRES_SSL_REQUEST)
+                    answer = sock.recv(1)
+                    if answer != b'S':
+                        result['error'] = 'server refused TLS'
+                        return result
+                with self.ssl_context.wrap_socket(sock, server_hostname=host):
+                    result['handshake_ms'] = (time.perf_counter() - handshake_start) * 1000
+        except Exception as e:
+            result['error'] = str(e) or type(e).__name__
+        return result
+
+    def probe_endpoints(self, endpoints: list[tuple[str, int]], protocol: str = None) -> dict[tuple[str, int], dict]:
+        """
+        Probe every endpoint the configured number of times, running up to the configured number of
+        connections at once, and return the latency percentiles per endpoint
+        """
+        attempts = [endpoint for endpoint in endpoints for _ in range(self.count)]
+        with ThreadPoolExecutor(max_workers=max(1, min(self.concurrency, len(attempts)))) as executor:
+            results = list(executor.map(lambda endpoint: self.probe_once(*endpoint, protocol), attempts))
+
+        report = {}
+        for endpoint in endpoints:
+            endpoint_results = [result for endpoint_attempt, result in zip(attempts, results) if endpoint_attempt == endpoint]
+            errors = [result['error'] for result in endpoint_results if result['error']]
+            connect_ms = [result['connect_ms'] for result in endpoint_results if result['connect_ms'] is not None]
+            handshake_ms = [result['handshake_ms'] for result in endpoint_results if result['handshake_ms'] is not None]
+            report[endpoint] = {
+                'attempts': len(endpoint_results),
+                'failures': len(errors),
+                'errors': sorted(set(errors)),
+                'connect_ms': summarize_latencies(connect_ms),
+                'handshake_ms': summarize_latencies(handshake_ms) if self.tls else None,
+            }
+        return report
+
+    @staticmethod
+    def log_report(name: str, report: dict[tuple[str, int], dict]) -> bool:
+        """
+        Log the latency percentiles of each endpoint, returns True if every attempt succeeded
+        """
+        all_ok = True
+        for (host, port), stats in report.items():
+            connect = stats['connect_ms']
+            if connect['p50'] is None:
+                logger.error(f'{name} {host}:{port} is not reachable: {", ".join(stats["errors"])} ❌')
+                all_ok = False
+                continue
+            message = (f'{name} {host}:{port} connect p50={connect["p50"]:.1f}ms '
+                       f'p95={connect["p95"]:.1f}ms p99={connect["p99"]:.1f}ms')
+            handshake = stats['handshake_ms']
+            if handshake and handshake['p50'] is not None:
+                message += (f', TLS handshake p50={handshake["p50"]:.1f}ms '
+                            f'p95={handshake["p95"]:.1f}ms p99={handshake["p99"]:.1f}ms')
+            if stats['failures']:
+                logger.warning(f'{message}, {stats["failures"]}/{stats["attempts"]} attempts failed: '
+                               f'{", ".join(stats["errors"])} 🚧')
+                all_ok = False
+            else:
+                logger.info(f'{message} ✅')
+        return all_ok
@@ -0,0 +1,318 @@
+import ipaddress
+from .generic_utils import *
+
+# Linux ephemeral port range, used by the EKS nodes for the client side of a connection
+EPHEMERAL_PORTS = (32768, 60999)
+ALL_PORTS = (0, 65535)
+
+
+def ip_in_cidr(ip_address: str, cidr: str) -> bool:
+    try:
+        return ipaddress.ip_address(ip_address) in ipaddress.ip_network(cidr, strict=False)
+    except ValueError:
+        return False
+
+
+def format_ports(ports: tuple[int, int]) -> str:
+    return str(ports[0]) if ports[0] == ports[1] else f'{ports[0]}-{ports[1]}'
+
+
+def protocol_matches(rule_protocol: str, protocol: str) -> bool:
+    # rules use either the protocol name or its IANA number, -1 means all protocols
+    numbers = {'tcp': '6', 'udp': '17', 'icmp': '1'}
+    rule_protocol = str(rule_protocol).lower()
+    return rule_protocol in ('-1', 'all') or rule_protocol == protocol or rule_protocol == numbers.get(protocol)
+
+
+class VPCSnapshot:
+    def __init__(self, security_groups: list, network_acls: list, route_tables: list, subnets: list,
+                 peering_connections: list, transit_gateway_attachments: list):
+        """
+        Indexed view of the network configuration of one or more VPCs, fetched once and evaluated locally
+        """
+        self.security_groups = {group['GroupId']: group for group in security_groups}
+        self.subnets = {subnet['SubnetId']: subnet for subnet in subnets}
+
+        self.network_acl_by_subnet = {}
+        for network_acl in network_acls:
+            for association in network_acl.get('Associations', []):
+                self.network_acl_by_subnet[association['SubnetId']] = network_acl
+
+        self.route_table_by_subnet = {}
+        self.main_route_table_by_vpc = {}
+        for route_table in route_tables:
+            for association in route_table.get('Associations', []):
+                if association.get('Main'):
+                    self.main_route_table_by_vpc[route_table['VpcId']] = route_table
+                elif association.get('SubnetId'):
+                    self.route_table_by_subnet[association['SubnetId']] = route_table
+
+        self.peering_connections = {}
+        for peering_connection in peering_connections:
+            if peering_connection.get('Status', {}).get('Code') == 'active':
+                self.peering_connections[peering_connection['VpcPeeringConnectionId']] = {
+                    peering_connection['RequesterVpcInfo']['VpcId'],
+                    peering_connection['AccepterVpcInfo']['VpcId'],
+                }
+
+        self.transit_gateways_by_vpc = {}
+        for attachment in transit_gateway_attachments:
+            if attachment.get('State') == 'available':
+                self.transit_gateways_by_vpc.setdefault(attachment['ResourceId'], set()).add(attachment['TransitGatewayId'])
+
+    def route_table(self, subnet_id: str) -> dict | None:
+        if subnet_id in self.route_table_by_subnet:
+            return self.route_table_by_subnet[subnet_id]
+        subnet = self.subnets.get(subnet_id)
+        return self.main_route_table_by_vpc.get(subnet['VpcId']) if subnet else None
+
+
+class StaticReachability:
+    def __init__(self, snapshot: VPCSnapshot):
+        """
+        Evaluates whether a source can open a connection to a destination using only the snapshot:
+        security groups, network ACLs (both directions, they are stateless) and the route tables of both subnets
+        """
+        self.snapshot = snapshot
+
+    def _security_groups_allow(self, group_ids: list[str], egress: bool, peer_ip: str, peer_group_ids: list[str],
+                               port: int, protocol: str) -> tuple[bool, bool]:
+        """
+        Returns whether a rule of the groups allows the traffic, and whether an unevaluated prefix list rule could
+        """
+        maybe = False
+        for group_id in group_ids:
+            group = self.snapshot.security_groups.get(group_id, {})
+            for permission in group.get('IpPermissionsEgress' if egress else 'IpPermissions', []):
+                if not protocol_matches(permission['IpProtocol'], protocol):
+                    continue
+                if str(permission['IpProtocol']) != '-1' and 'FromPort' in permission:
+                    if not permission['FromPort'] <= port <= permission['ToPort']:
+                        continue
+                if any(ip_in_cidr(peer_ip, ip_range['CidrIp']) for ip_range in permission.get('IpRanges', [])):
+                    return True, False
+                if any(pair.get('GroupId') in peer_group_ids for pair in permission.get('UserIdGroupPairs', [])):
+                    return True, False
+                if permission.get('PrefixListIds'):
+                    maybe = True
+        return False, maybe
+
+    def _network_acl_decision(self, subnet_id: str, egress: bool, peer_ip: str, ports: tuple[int, int],
+                              protocol: str) -> tuple[bool, str, tuple[int, int] | None]:
+        """
+        Returns whether the network ACL of the subnet allows the traffic on every port of the range, the ACL rule
+        that decided it and the first ports it denies. Each rule decides the ports no lower numbered rule matched.
+        """
+        network_acl = self.snapshot.network_acl_by_subnet.get(subnet_id)
+        if network_acl is None:
+            return True, f'no network ACL found for {subnet_id}', None
+        entries = sorted((entry for entry in network_acl['Entries'] if entry['Egress'] == egress and 'CidrBlock' in entry),
+                         key=lambda entry: entry['RuleNumber'])
+        undecided = [ports]
+        rule = None
+        for entry in entries:
+            if not protocol_matches(entry['Protocol'], protocol) or not ip_in_cidr(peer_ip, entry['CidrBlock']):
+                continue
+            port_range = entry.get('PortRange')
+            low, high = (port_range['From'], port_range['To']) if port_range else ALL_PORTS
+            matched = [(max(start, low), min(end, high)) for start, end in undecided if max(start, low) <= min(end, high)]
+            if not matched:
+                continue
+            rule = f'{network_acl["NetworkAclId"]} rule {entry["RuleNumber"]}'
+            if entry['RuleAction'] != 'allow':
+                return False, rule, matched[0]
+            # the ports below and above the rule are left for the next rules
+            undecided = [part for start, end in undecided
+                         for part in ((start, min(end, low - 1)), (max(start, high + 1), end)) if part[0] <= part[1]]
+            if not undecided:
+                return True, rule, None
+        return False, f'{network_acl["NetworkAclId"]} default rule', undecided[0]
+
+    def _route_decision(self, subnet_id: str, vpc_id: str, peer_ip: str, peer_vpc_id: str) -> tuple[str, str]:
+        """
+        Returns the status of the route from the subnet to the peer IP and a description of the route used
+        """
+        route_table = self.snapshot.route_table(subnet_id)
+        if route_table is None:
+            return 'unknown', f'no route table found for {subnet_id}'
+
+        best_route, best_prefix = None, -1
+        for route in route_table.get('Routes', []):
+            cidr = route.get('DestinationCidrBlock')
+            if cidr and ip_in_cidr(peer_ip, cidr):
+                prefix = ipaddress.ip_network(cidr, strict=False).prefixlen
+                if prefix > best_prefix:
+                    best_route, best_prefix = route, prefix
+        table_id = route_table['RouteTableId']
+        if best_route is None:
+            return 'blocked', f'route table {table_id} has no route to {peer_ip}'
+
+        destination = best_route['DestinationCidrBlock']
+        if best_route.get('State') == 'blackhole':
+            return 'blocked', f'route {destination} in {table_id} is a blackhole'
+        if best_route.get('GatewayId') == 'local':
+            if peer_vpc_id == vpc_id:
+                return 'reachable', f'local route {destination} in {table_id}'
+            return 'blocked', f'route table {table_id} sends {peer_ip} to the local VPC, not to {peer_vpc_id}'
+        if best_route.get('VpcPeeringConnectionId'):
+            peering_id = best_route['VpcPeeringConnectionId']
+            if self.snapshot.peering_connections.get(peering_id) == {vpc_id, peer_vpc_id}:
+                return 'reachable', f'route {destination} via peering connection {peering_id} in {table_id}'
+            return 'blocked', f'peering connection {peering_id} in {table_id} is not active between {vpc_id} and {peer_vpc_id}'
+        if best_route.get('TransitGatewayId'):
+            transit_gateway_id = best_route['TransitGatewayId']
+            attached = [transit_gateway_id in self.snapshot.transit_gateways_by_vpc.get(vpc, set()) for vpc in (vpc_id, peer_vpc_id)]
+            if all(attached):
+                # the transit gateway route tables themselves are not evaluated
+                return 'reachable', f'route {destination} via transit gateway {transit_gateway_id} in {table_id}'
+            return 'blocked', f'transit gateway {transit_gateway_id} is not attached to both {vpc_id} and {peer_vpc_id}'
+        target = best_route.get('GatewayId') or best_route.get('NatGatewayId') or best_route.get('NetworkInterfaceId') or 'another target'
+        return 'unknown', f'route {destination} in {table_id} goes to {target}, which is not evaluated locally'
+
+    def evaluate(self, source: dict, destination: dict, port: int, protocol: str = 'tcp') -> dict:
+        """
+        Evaluate whether the source endpoint can reach the destination endpoint on the port.
+        Endpoints are dicts with the ip_address, subnet_id, vpc_id and security_group_ids of an ENI or instance.
+        Returns the status (reachable, blocked or unknown) and the explanation of every blocking or unverified rule.
+        """
+        explanations = []
+        unknown = []
+
+        allowed, maybe = self._security_groups_allow(source['security_group_ids'], True, destination['ip_address'],
+                                                     destination['security_group_ids'], port, protocol)
+        if not allowed:
+            (unknown if maybe else explanations).append(
+                f'security groups {", ".join(source["security_group_ids"])} of the source have no outbound rule '
+                f'allowing {protocol}/{port} to {destination["ip_address"]}')
+
+        allowed, maybe = self._security_groups_allow(destination['security_group_ids'], False, source['ip_address'],
+                                                     source['security_group_ids'], port, protocol)
+        if not allowed:
+            (unknown if maybe else explanations).append(
+                f'security groups {", ".join(destination["security_group_ids"])} of the destination have no inbound rule '
+                f'allowing {protocol}/{port} from {source["ip_address"]}')
+
+        # network ACLs only filter traffic crossing the subnet boundary, not within the subnet
+        network_acl_checks = [
+            (source['subnet_id'], True, destination['ip_address'], (port, port), 'outbound'),
+            (destination['subnet_id'], False, source['ip_address'], (port, port), 'inbound'),
+            (destination['subnet_id'], True, source['ip_address'], EPHEMERAL_PORTS, 'return outbound'),
+            (source['subnet_id'], False, destination['ip_address'], EPHEMERAL_PORTS, 'return inbound'),
+        ] if source['subnet_id'] != destination['subnet_id'] else []
+        for subnet_id, egress, peer_ip, ports, direction in network_acl_checks:
+            allowed, rule, denied = self._network_acl_decision(subnet_id, egress, peer_ip, ports, protocol)
+            if not allowed:
+                explanations.append(f'network ACL {rule} of {subnet_id} denies {direction} '
+                                    f'{protocol}/{format_ports(denied)} {"to" if egress else "from"} {peer_ip}')
+
+        for subnet_id, vpc_id, peer, direction in ((source['subnet_id'], source['vpc_id'], destination, 'forward'),
+                                                   (destination['subnet_id'], destination['vpc_id'], source, 'return')):
+            status, description = self._route_decision(subnet_id, vpc_id, peer['ip_address'], peer['vpc_id'])
+            if status == 'blocked':
+                explanations.append(f'{direction} route: {description}')
+            elif status == 'unknown':
+                unknown.append(f'{direction} route: {description}')
+
+        if explanations:
+            return {'status': 'blocked', 'explanations': explanations + unknown}
+        if unknown:
+            return {'status': 'unknown', 'explanations': unknown}
+        return {'status': 'reachable', 'explanations': []}
+
+
+class ReachabilityUtils:
+    def __init__(self, aws_utils: AWSUtils):
+        self.aws_utils = aws_utils
+        self.cache = aws_utils.cache
+
+    @property
+    def ec2(self):
+        return self.aws_utils.clients.client('ec2')
+
+    def _paginate(self, operation: str, key: str, **kwargs) -> list:
+        items = []
+        for page in self.ec2.get_paginator(operation).paginate(**kwargs):
+            items.extend(page[key])
+        return items
+
+    def get_vpc_snapshot(self, vpc_ids: list[str]) -> VPCSnapshot:
+        """
+        Fetch the security groups, network ACLs, route tables, subnets, peering connections and transit gateway
+        attachments of the VPCs in bulk, the snapshot is cached for the rest of the run
+        """
+        vpc_ids = sorted(set(vpc_ids))
+
+        def load() -> VPCSnapshot:
+            vpc_filter = [{'Name': 'vpc-id', 'Values': vpc_ids}]
+            peering_connections = {}
+            for side in ('requester-vpc-info.vpc-id', 'accepter-vpc-info.vpc-id'):
+                for peering_connection in self._paginate('describe_vpc_peering_connections', 'VpcPeeringConnections',
+                                                         Filters=[{'Name': side, 'Values': vpc_ids}]):
+                    peering_connections[peering_connection['VpcPeeringConnectionId']] = peering_connection
+            return VPCSnapshot(
+                security_groups=self._paginate('describe_security_groups', 'SecurityGroups', Filters=vpc_filter),
+                network_acls=self._paginate('describe_network_acls', 'NetworkAcls', Filters=vpc_filter),
+                route_tables=self._paginate('describe_route_tables', 'RouteTables', Filters=vpc_filter),
+                subnets=self._paginate('describe_subnets', 'Subnets', Filters=vpc_filter),
+                peering_connections=list(peering_connections.values()),
+                transit_gateway_attachments=self._paginate(
+                    'describe_transit_gateway_attachments', 'TransitGatewayAttachments',
+                    Filters=[{'Name': 'resource-type', 'Values': ['vpc']}, {'Name': 'resource-id', 'Values': vpc_ids}]),
+            )
+
+        return self.cache.get(('reachability', 'vpc_snapshot', tuple(vpc_ids)), load)
+
+    def get_eni_endpoint(self, eni_id: str) -> dict:
+        """
+        Describe the ENI and return it as an endpoint, the response is cached for the rest of the run
+        """
+        network_interface = self.cache.get(
+            ('ec2', 'describe_network_interfaces', 'network-interface-id', eni_id),
+            lambda: self.ec2.describe_network_interfaces(NetworkInterfaceIds=[eni_id])['NetworkInterfaces'][0]
+        )
+        return {
+            'id': eni_id,
+            'ip_address': network_interface['PrivateIpAddress'],
+            'subnet_id': network_interface['SubnetId'],
+            'vpc_id': network_interface['VpcId'],
+            'security_group_ids': [group['GroupId'] for group in network_interface.get('Groups', [])],
+        }
+
+    def get_instance_endpoint(self, instance_id: str) -> dict:
+        """
+        Describe the instance and return it as an endpoint, the response is cached for the rest of the run
+        """
+        instance = self.cache.get(
+            ('ec2', 'describe_instances', 'instance-id', instance_id),
+            lambda: self.ec2.describe_instances(InstanceIds=[instance_id])['Reservations'][0]['Instances'][0]
+        )
+        return {
+            'id': instance_id,
+            'ip_address': instance['PrivateIpAddress'],
+            'subnet_id': instance['SubnetId'],
+            'vpc_id': instance['VpcId'],
+            'security_group_ids': [group['GroupId'] for group in instance.get('SecurityGroups', [])],
+        }
+
+    def describe_path_inputs(self, source_instance_ids: list[str], destination_eni_ids: list[str]) -> dict:
+        """
+        The network configuration the paths from the instances to the ENIs depend on, in watch mode a Network Insights
+        analysis is only run again when it changes
+        """
+        sources = [self.get_instance_endpoint(instance_id) for instance_id in source_instance_ids]
+        destinations = [self.get_eni_endpoint(eni_id) for eni_id in destination_eni_ids]
+        snapshot = self.get_vpc_snapshot([endpoint['vpc_id'] for endpoint in sources + destinations])
+        return {'sources': sources, 'destinations': destinations, 'snapshot': vars(snapshot)}
+
+    def evaluate(self, sources: list[dict], destinations: list[dict], port: int, protocol: str = 'tcp') -> list[dict]:
+        """
+        Evaluate every source and destination pair with a single snapshot of all VPCs involved
+        """
+        vpc_ids = [endpoint['vpc_id'] for endpoint in sources + destinations]
+        engine = StaticReachability(self.get_vpc_snapshot(vpc_ids))
+        results = []
+        for source in sources:
+            for destination in destinations:
+                verdict = engine.evaluate(source, destination, port, protocol)
+                results.append({'source': source['id'], 'destination': destination['id'], 'port': port, **verdict})
+        return results
@@ -0,0 +1,180 @@
+import base64
+import copy
+import datetime
+import gzip
+import json
+import threading
+import boto3
+from botocore.awsrequest import AWSResponse
+from .call_scheduler import CallScheduler
+from .generic_utils import AWSUtils
+from .nia_utils import NetworkInsightsPoller
+from .resource_cache import ResourceCache
+from .set_logging import logger
+from .virtual_clock import VirtualClock
+
+SNAPSHOT_VERSION = 1
+# generated anew by botocore for every call, so they can't be part of the call key
+IDEMPOTENCY_PARAMS = {'ClientToken', 'ClientRequestToken'}
+# the metric window moves with the clock, a replay answers with the recorded window
+TIME_WINDOW_PARAMS = {'StartTime', 'EndTime'}
+
+
+def encode_value(value):
+    # botocore responses contain datetimes and sometimes bytes, which JSON can't hold as is
+    if isinstance(value, datetime.datetime):
+        return {'__datetime__': value.isoformat()}
+    if isinstance(value, bytes):
+        return {'__bytes__': base64.b64encode(value).decode()}
+    raise TypeError(f'Cannot record value of type {type(value).__name__}')
+
+
+def decode_value(value: dict):
+    if '__datetime__' in value:
+        return datetime.datetime.fromisoformat(value['__datetime__'])
+    if '__bytes__' in value:
+        return base64.b64decode(value['__bytes__'])
+    return value
+
+
+def call_key(service_name: str, operation_name: str, params: dict) -> str:
+    return f'{service_name}.{operation_name} {json.dumps(params, sort_keys=True, default=encode_value)}'
+
+
+def remember_params(params: dict, context: dict, **kwargs) -> None:
+    context['recorded_params'] = {key: value for key, value in params.items()
+                                  if key not in IDEMPOTENCY_PARAMS | TIME_WINDOW_PARAMS}
+
+
+class SessionRecorder:
+    def __init__(self):
+        """
+        Records the parameters and response of every AWS call made through a session
+        """
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def attach(self, session: boto3.Session) -> None:
+        """
+        Hook the botocore events of the session. Must be called before the session creates its first client.
+        """
+        session.events.register('before-parameter-build', remember_params)
+        session.events.register('after-call', self._on_call)
+        session.events.register('after-call-error', self._on_call_error)
+
+    def _on_call(self, event_name: str, http_response, parsed: dict, context: dict, **kwargs) -> None:
+        _, service_name, operation_name = event_name.split('.', 2)
+        response = {key: value for key, value in (parsed or {}).items() if key != 'ResponseMetadata'}
+        with self.lock:
+            self.calls.append({
+                'key': call_key(service_name, operation_name, context.get('recorded_params', {})),
+                'status': http_response.status_code,
+                'response': response,
+            })
+
+    def _on_call_error(self, event_name: str, context: dict, exception: Exception, **kwargs) -> None:
+        _, service_name, operation_name = event_name.split('.', 2)
+        with self.lock:
+            self.calls.append({
+                'key': call_key(service_name, operation_name, context.get('recorded_params', {})),
+                'status': 599,
+                'response': {'Error': {'Code': type(exception).__name__, 'Message': str(exception)}},
+            })
+
+    def save(self, path: str, region: str, cache: ResourceCache = None) -> None:
+        """
+        Write the recorded calls, and the DNS lookups of the run cache, to a gzip-compressed JSON snapshot
+        """
+        dns = {}
+        if cache:
+            with cache.lock:
+                dns = {key[1]: value for key, (value, _) in cache.entries.items()
+                       if isinstance(key, tuple) and key[0] == 'dns'}
+        with self.lock:
+            snapshot = {'version': SNAPSHOT_VERSION, 'region': region, 'dns': dns, 'calls': list(self.calls)}
+        with gzip.open(path, 'wt', encoding='utf-8') as f:
+            json.dump(snapshot, f, default=encode_value, separators=(',', ':'))
+        logger.info(f'Recorded {len(snapshot["calls"])} AWS calls to {path}')
+
+
+class SessionReplayer:
+    def __init__(self, path: str):
+        """
+        Answers the AWS calls of a session from a snapshot written by SessionRecorder, without network access.
+        Identical calls are answered in recorded order, the last response is repeated once they run out.
+        """
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            snapshot = json.load(f, object_hook=decode_value)
+        if snapshot.get('version') != SNAPSHOT_VERSION:
+            raise ValueError(f'Unsupported snapshot version {snapshot.get("version")} in {path}')
+        self.region = snapshot['region']
+        self.dns = snapshot['dns']
+        self.responses = {}
+        self.analyses = {}
+        for call in snapshot['calls']:
+            self.responses.setdefault(call['key'], []).append(call)
+            # the last state of each Network Insights analysis, since the poller may batch them differently on replay
+            for analysis in call['response'].get('NetworkInsightsAnalyses', []):
+                self.analyses[analysis['NetworkInsightsAnalysisId']] = analysis
+        self.positions = {}
+        self.lock = threading.Lock()
+
+    def create_session(self) -> boto3.Session:
+        """
+        Create a session for the recorded region that is answered from the snapshot
+        """
+        session = boto3.Session(region_name=self.region, aws_access_key_id='replay', aws_secret_access_key='replay')
+        self.attach(session)
+        return session
+
+    def attach(self, session: boto3.Session) -> None:
+        """
+        Hook the botocore events of the session. Must be called before the session creates its first client.
+        """
+        session.events.register('before-parameter-build', remember_params)
+        session.events.register('before-call', self._on_call)
+
+    def seed_cache(self, cache: ResourceCache) -> None:
+        """
+        Store the recorded DNS lookups in the run cache so hosts resolve as they did during the recording
+        """
+        for host, ip_address in self.dns.items():
+            cache.set(('dns', host), ip_address, pin=True)
+
+    def _on_call(self, event_name: str, context: dict, **kwargs):
+        _, service_name, operation_name = event_name.split('.', 2)
+        params = context.get('recorded_params', {})
+        if operation_name == 'DescribeNetworkInsightsAnalyses' and params.get('NetworkInsightsAnalysisIds'):
+            analyses = [self.analyses[analysis_id] for analysis_id in params['NetworkInsightsAnalysisIds']
+                        if analysis_id in self.analyses]
+            return AWSResponse('https://replay.amazonaws.com', 200, {}, None), {
+                'NetworkInsightsAnalyses': copy.deepcopy(analyses)
+            }
+
+        key = call_key(service_name, operation_name, params)
+        with self.lock:
+            calls = self.responses.get(key)
+            if not calls:
+                logger.warning(f'No recorded response for {service_name}.{operation_name}')
+                return AWSResponse('https://replay.amazonaws.com', 400, {}, None), {
+                    'Error': {'Code': 'NotRecorded', 'Message': f'{operation_name} was not recorded with these parameters'}
+                }
+            position = self.positions.get(key, 0)
+            self.positions[key] = position + 1
+            call = calls[min(position, len(calls) - 1)]
+        return AWSResponse('https://replay.amazonaws.com', call['status'], {}, None), copy.deepcopy(call['response'])
+
+
+def create_replay_aws_utils(path: str) -> AWSUtils:
+    """
+    Create the AWS utils of a run answered from a snapshot. Network Insights analyses are polled and the calls
+    are paced on a virtual clock, so the replay doesn't wait for them.
+    """
+    replayer = SessionReplayer(path)
+    clock = VirtualClock()
+    aws_utils = AWSUtils(session=replayer.create_session(),
+                         call_scheduler=CallScheduler(clock=clock.time, sleep=clock.sleep))
+    replayer.seed_cache(aws_utils.cache)
+    aws_utils.nia_poller = NetworkInsightsPoller(aws_utils.clients, clock=clock.time, sleep=clock.sleep)
+    logger.info(f'Replaying AWS calls from {path}')
+    return aws_utils
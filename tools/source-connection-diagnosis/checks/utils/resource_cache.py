@@ -0,0 +1,77 @@
+import threading
+import time
+from typing import Any, Callable, Hashable
+
+
+class ResourceCache:
+    def __init__(self, ttl: float = None):
+        """
+        Cache of AWS describe results shared by all checks and utils of a run.
+        Entries never expire unless a TTL in seconds is given.
+        """
+        self.ttl = ttl
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.key_locks = {}
+        self.pinned = set()
+
+    def _is_fresh(self, stored_at: float) -> bool:
+        return self.ttl is None or time.monotonic() - stored_at < self.ttl
+
+    def get(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """
+        Return the cached value for the key, calling the loader only if it is missing or expired.
+        Concurrent callers asking for the same key wait for a single load.
+        Errors raised by the loader are not cached.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and self._is_fresh(entry[1]):
+                return entry[0]
+            key_lock = self.key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with self.lock:
+                entry = self.entries.get(key)
+                if entry and self._is_fresh(entry[1]):
+                    return entry[0]
+            value = loader()
+            with self.lock:
+                self.entries[key] = (value, time.monotonic())
+                # the lock only serializes loads, callers waiting on it find the entry, later ones don't need it
+                self.key_locks.pop(key, None)
+            return value
+
+    def contains(self, key: Hashable) -> bool:
+        with self.lock:
+            entry = self.entries.get(key)
+            return bool(entry) and self._is_fresh(entry[1])
+
+    def set(self, key: Hashable, value: Any, pin: bool = False) -> None:
+        """
+        Store a value fetched elsewhere, e.g. from a bulk describe call.
+        A pinned value can't be fetched again, so it is kept when everything is invalidated.
+        """
+        with self.lock:
+            self.entries[key] = (value, time.monotonic())
+            if pin:
+                self.pinned.add(key)
+
+    def invalidate(self, key: Hashable = None) -> None:
+        """
+        Drop a single entry, all entries whose tuple key starts with the given tuple, or everything but the pinned entries
+        """
+        def matches(cached_key: Hashable) -> bool:
+            if key is None:
+                return cached_key not in self.pinned
+            if isinstance(key, tuple):
+                return cached_key == key or (isinstance(cached_key, tuple) and cached_key[:len(key)] == key)
+            return cached_key == key
+
+        with self.lock:
+            for cached_key in [cached_key for cached_key in self.entries if matches(cached_key)]:
+                del self.entries[cached_key]
+            # the locks left by failed loads, those of loads in progress are dropped when they finish
+            for cached_key in [cached_key for cached_key, key_lock in self.key_locks.items()
+                               if matches(cached_key) and not key_lock.locked()]:
+                del self.key_locks[cached_key]
@@ -0,0 +1,117 @@
+import datetime
+import json
+import sys
+import threading
+from typing import Any, TextIO
+from .set_logging import logger
+
+# statuses of the checks, from best to worst
+CHECK_STATUSES = ('passing', 'warning', 'failing')
+
+
+class CheckOutcome:
+    def __init__(self, status: str, explanation: str = None, details: Any = None):
+        """
+        What a check found: its status, the message explaining it and the structured details behind it.
+        The details are what the checks depending on this one receive.
+        """
+        if status not in CHECK_STATUSES:
+            raise ValueError(f'Unknown check status {status}')
+        self.status = status
+        self.explanation = explanation
+        self.details = details
+
+    def __repr__(self) -> str:
+        return f'CheckOutcome({self.status!r}, {self.explanation!r})'
+
+
+def log_outcome(outcome: CheckOutcome) -> CheckOutcome:
+    """
+    Log the explanation of the outcome with the marker of its status and return the outcome
+    """
+    if outcome.status == 'passing':
+        logger.info(f'{outcome.explanation} ✅')
+    elif outcome.status == 'warning':
+        logger.warning(f'{outcome.explanation} 🚧')
+    else:
+        logger.error(f'{outcome.explanation} ❌')
+    return outcome
+
+
+def worst_outcome(outcomes: list[CheckOutcome], details: Any = None) -> CheckOutcome:
+    """
+    Combine the outcomes of the parts of a check, e.g. one per EKS source, into the outcome of the worst part
+    """
+    worst = max(outcomes, key=lambda outcome: CHECK_STATUSES.index(outcome.status))
+    return CheckOutcome(worst.status, worst.explanation, details)
+
+
+def outcome_of(result: Any, error: Exception = None) -> tuple[Any, dict]:
+    """
+    The details a check returned and its status and explanation. Checks return a CheckOutcome, the lookups
+    the checks depend on return what they found, which fails the lookup when they found nothing.
+    """
+    if error is not None:
+        return None, {'status': 'failing', 'explanation': str(error)}
+    if isinstance(result, CheckOutcome):
+        return result.details, {'status': result.status, 'explanation': result.explanation}
+    if result is None or result == []:
+        return result, {'status': 'failing', 'explanation': 'nothing found'}
+    return result, {'status': 'passing', 'explanation': None}
+
+
+def jsonable(value: Any) -> Any:
+    # JSON object keys must be strings, e.g. the (host, port) keys of a probe report become host:port
+    if isinstance(value, dict):
+        return {':'.join(map(str, key)) if isinstance(key, tuple) else str(key): jsonable(item)
+                for key, item in value.items()}
+    if isinstance(value, (list, tuple, set)):
+        return [jsonable(item) for item in value]
+    return value
+
+
+def check_result(target: str | None, check: str, outcome: dict, duration: float, details: Any = None,
+                 reused: bool = False) -> dict:
+    result = {
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='milliseconds'),
+        'target': target,
+        'check': check,
+        'status': outcome['status'],
+        'duration_s': round(duration, 4),
+        'details': jsonable(details),
+        'explanation': outcome['explanation'],
+    }
+    if reused:
+        result['reused'] = True
+    return result
+
+
+class ResultWriter:
+    def __init__(self, stream: TextIO):
+        """
+        Writes check results as NDJSON, one line per check, as soon as each check finishes.
+        Safe to call from concurrent checks, nothing is kept in memory.
+        """
+        self.stream = stream
+        self.lock = threading.Lock()
+        self.count = 0
+
+    @classmethod
+    def open(cls, path: str, append: bool = False) -> 'ResultWriter':
+        """
+        Open a writer for a file, or for stdout when the path is -. The file is overwritten unless append is True.
+        """
+        if path == '-':
+            return cls(sys.stdout)
+        return cls(open(path, 'a' if append else 'w', encoding='utf-8', buffering=1))
+
+    def write(self, result: dict) -> None:
+        line = json.dumps(result, default=str, ensure_ascii=False, separators=(',', ':')) + '\n'
+        with self.lock:
+            self.stream.write(line)
+            self.stream.flush()
+            self.count += 1
+
+    def close(self) -> None:
+        if self.stream is not sys.stdout:
+            self.stream.close()
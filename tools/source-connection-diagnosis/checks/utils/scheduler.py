@@ -0,0 +1,145 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import TYPE_CHECKING, Any, Callable
+from .result_utils import ResultWriter, check_result, outcome_of
+from .set_logging import logger
+
+if TYPE_CHECKING:
+    from .metrics_utils import CallMetrics
+    from .watch_utils import WatchState
+
+
+class CheckScheduler:
+    def __init__(self, max_workers: int = 8, metrics: 'CallMetrics' = None, target: str = None,
+                 watch_state: 'WatchState' = None, result_writer: ResultWriter = None):
+        self.max_workers = max_workers
+        self.metrics = metrics
+        self.target = target
+        self.watch_state = watch_state
+        self.result_writer = result_writer
+        self.checks = {}
+        self.results = {}
+        self.durations = {}
+        self.failed = set()
+
+    def add_check(self, name: str, func: Callable, *args, depends_on: list[str] = None,
+                  inputs: Callable = None, **kwargs) -> None:
+        """
+        Register a check. A check returns a CheckOutcome, the details of the checks it depends on are passed to it
+        as keyword arguments named after those checks. inputs is called with the same arguments
+        and returns what the check depends on, in watch mode the check is only run again when that changes.
+        """
+        if name in self.checks:
+            raise ValueError(f'Check {name} is already registered')
+        self.checks[name] = {
+            'func': func,
+            'args': args,
+            'kwargs': kwargs,
+            'depends_on': list(depends_on or []),
+            'inputs': inputs,
+        }
+
+    def _validate(self) -> None:
+        """
+        Make sure every dependency is registered and there are no cycles
+        """
+        for name, check in self.checks.items():
+            for dependency in check['depends_on']:
+                if dependency not in self.checks:
+                    raise ValueError(f'Check {name} depends on unknown check {dependency}')
+
+        visiting, visited = set(), set()
+
+        def visit(name: str) -> None:
+            if name in visited:
+                return
+            if name in visiting:
+                raise ValueError(f'Dependency cycle detected at check {name}')
+            visiting.add(name)
+            for dependency in self.checks[name]['depends_on']:
+                visit(dependency)
+            visiting.remove(name)
+            visited.add(name)
+
+        for name in self.checks:
+            visit(name)
+
+    def _run_check(self, name: str) -> Any:
+        check = self.checks[name]
+        kwargs = dict(check['kwargs'])
+        for dependency in check['depends_on']:
+            kwargs[dependency] = self.results.get(dependency)
+
+        def call() -> tuple[Any, dict, bool]:
+            input_fingerprint = None
+            if self.watch_state:
+                inputs = check['inputs'] and (lambda: check['inputs'](*check['args'], **kwargs))
+                reused, input_fingerprint, result, outcome = self.watch_state.lookup(self.target, name, inputs)
+                if reused:
+                    return result, outcome, True
+            try:
+                result, outcome = outcome_of(check['func'](*check['args'], **kwargs))
+            except Exception as e:
+                if self.watch_state:
+                    self.watch_state.store(self.target, name, None, None, outcome_of(None, e)[1])
+                raise
+            if self.watch_state:
+                self.watch_state.store(self.target, name, input_fingerprint, result, outcome)
+            return result, outcome, False
+
+        start = time.monotonic()
+        outcome, reused, result = None, False, None
+        try:
+            if self.metrics:
+                with self.metrics.span(name, self.target):
+                    result, outcome, reused = call()
+            else:
+                result, outcome, reused = call()
+            return result
+        except Exception as e:
+            outcome = outcome_of(None, e)[1]
+            raise
+        finally:
+            self.durations[name] = time.monotonic() - start
+            if self.result_writer:
+                self.result_writer.write(check_result(self.target, name, outcome, self.durations[name], result, reused))
+
+    def run(self) -> dict[str, Any]:
+        """
+        Run all registered checks, starting each one as soon as the checks it depends on have finished
+        """
+        self._validate()
+        start = time.monotonic()
+        pending = dict(self.checks)
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending or running:
+                for name in list(pending):
+                    depends_on = pending[name]['depends_on']
+                    if any(dependency in self.failed for dependency in depends_on):
+                        logger.error(f'Skipping check {name} because one of its dependencies failed ❌')
+                        self.failed.add(name)
+                        if self.watch_state:
+                            self.watch_state.skip_check(self.target, name)
+                        if self.result_writer:
+                            self.result_writer.write(check_result(
+                                self.target, name, {'status': 'skipped', 'explanation': 'one of its dependencies failed'}, 0.0))
+                        del pending[name]
+                    elif all(dependency in self.results for dependency in depends_on):
+                        running[executor.submit(self._run_check, name)] = name
+                        del pending[name]
+
+                if not running:
+                    continue
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        self.results[name] = future.result()
+                    except Exception as e:
+                        logger.error(f'Check {name} failed: {e}')
+                        self.failed.add(name)
+
+        logger.info(f'Finished {len(self.checks)} checks in {time.monotonic() - start:.1f}s')
+        return self.results
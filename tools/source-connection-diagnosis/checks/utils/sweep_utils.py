@@ -0,0 +1,58 @@
+import boto3
+import botocore.session
+from botocore.credentials import (AssumeRoleCredentialFetcher, CredentialProvider, CredentialResolver,
+                                  DeferredRefreshableCredentials)
+
+SWEEP_SESSION_NAME = 'onehouse-source-connection-diagnosis'
+
+
+def parse_sweep_target(spec: str) -> dict:
+    """
+    Parse a sweep target of the form region, region:profile, region:role-arn or region:profile:role-arn
+    """
+    region, _, rest = spec.partition(':')
+    profile, role_arn = None, None
+    if rest.startswith('arn:'):
+        role_arn = rest
+    elif ':arn:' in rest:
+        profile, role_arn = rest.split(':', 1)
+    elif rest:
+        profile = rest
+    if not region or (role_arn is not None and ':role/' not in role_arn):
+        raise ValueError(f'invalid sweep target {spec}, expected region[:profile][:role-arn]')
+    return {'region': region, 'profile': profile, 'role_arn': role_arn}
+
+
+def sweep_target_label(target: dict) -> str:
+    return ':'.join(part for part in (target['region'], target['profile'], target['role_arn']) if part)
+
+
+class SweepRoleProvider(CredentialProvider):
+    METHOD = 'assume-role'
+
+    def __init__(self, fetcher: AssumeRoleCredentialFetcher):
+        """
+        Credentials of the role of a sweep target, assumed on first use and again before they expire
+        """
+        super().__init__()
+        self.fetcher = fetcher
+
+    def load(self) -> DeferredRefreshableCredentials:
+        return DeferredRefreshableCredentials(self.fetcher.fetch_credentials, self.METHOD)
+
+
+def create_sweep_session(target: dict) -> boto3.Session:
+    """
+    Create the session of a sweep target from its profile, or the default credentials, assuming its role if it has one.
+    The role is assumed on the first call and again before its credentials expire, however long the region takes.
+    """
+    if not target['role_arn']:
+        return boto3.Session(profile_name=target['profile'], region_name=target['region'])
+    source = botocore.session.Session(profile=target['profile'])
+    source.set_config_variable('region', target['region'])
+    fetcher = AssumeRoleCredentialFetcher(source.create_client, source.get_credentials(), target['role_arn'],
+                                          extra_args={'RoleSessionName': SWEEP_SESSION_NAME})
+    session = botocore.session.Session()
+    # the role is the only source of credentials of the session, as with a profile that has a role_arn
+    session.register_component('credential_provider', CredentialResolver([SweepRoleProvider(fetcher)]))
+    return boto3.Session(botocore_session=session, region_name=target['region'])
@@ -0,0 +1,130 @@
+import hashlib
+import json
+import logging
+import threading
+from typing import Any, Callable
+from .set_logging import logger
+
+# fields of describe responses that change on every call without the resource changing
+VOLATILE_KEYS = {'ResponseMetadata', 'LatestRestorableTime'}
+# check outcomes and watch summaries are logged with this logger, so they pass the quiet filter
+watch_logger = logging.getLogger('watch')
+
+
+def strip_volatile(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {key: strip_volatile(item) for key, item in value.items() if key not in VOLATILE_KEYS}
+    if isinstance(value, (list, tuple)):
+        return [strip_volatile(item) for item in value]
+    if isinstance(value, set):
+        return sorted(strip_volatile(item) for item in value)
+    return value
+
+
+def fingerprint(value: Any) -> str:
+    return hashlib.sha256(json.dumps(strip_volatile(value), sort_keys=True, default=str).encode()).hexdigest()
+
+
+class QuietFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        # only the watch summaries and the messages of the main thread outside of checks are shown
+        return record.name == watch_logger.name or threading.current_thread() is threading.main_thread()
+
+
+class WatchState:
+    def __init__(self):
+        """
+        The fingerprint of the inputs, the result and the outcome of every check of every target, kept across
+        cycles. A check whose inputs have the same fingerprint as in the previous cycle isn't run again.
+        """
+        self.fingerprints = {}
+        self.results = {}
+        self.outcomes = {}
+        self.current = {}
+        self.full_check = True
+        self.ran = 0
+        self.reused = 0
+        self.lock = threading.Lock()
+        self.quiet_filter = QuietFilter()
+
+    def start_cycle(self, full_check: bool = False) -> None:
+        """
+        Start a cycle, every check is run again when full_check is True
+        """
+        self.current = {}
+        self.full_check = full_check
+        self.ran = 0
+        self.reused = 0
+
+    def quiet(self) -> None:
+        """
+        Hide the output of the checks themselves, only the state transitions are logged from now on
+        """
+        for handler in logger.handlers:
+            if self.quiet_filter not in handler.filters:
+                handler.addFilter(self.quiet_filter)
+
+    def lookup(self, target: str, name: str, inputs: Callable = None) -> tuple[bool, str | None, Any, dict | None]:
+        """
+        Fingerprint the inputs of the check and return whether they are unchanged since the previous cycle,
+        the fingerprint, and the previous result and outcome to reuse when they are
+        """
+        key = (target, name)
+        input_fingerprint = None
+        if inputs:
+            try:
+                input_fingerprint = fingerprint(inputs())
+            except Exception as e:
+                logger.debug(f'Unable to fingerprint the inputs of check {name}: {e}')
+
+        with self.lock:
+            unchanged = (not self.full_check and input_fingerprint is not None and key in self.outcomes
+                         and self.fingerprints.get(key) == input_fingerprint)
+            if not unchanged:
+                return False, input_fingerprint, None, None
+            self.current[key] = self.outcomes[key]
+            self.reused += 1
+            return True, input_fingerprint, self.results.get(key), self.outcomes[key]
+
+    def store(self, target: str, name: str, input_fingerprint: str | None, result: Any, outcome: dict) -> None:
+        """
+        Keep the result and outcome of a check that was run, for the next cycles
+        """
+        key = (target, name)
+        with self.lock:
+            self.current[key] = outcome
+            self.results[key] = result
+            if input_fingerprint is None:
+                self.fingerprints.pop(key, None)
+            else:
+                self.fingerprints[key] = input_fingerprint
+            self.ran += 1
+
+    def skip_check(self, target: str, name: str) -> None:
+        """
+        Record a check that was skipped because one of its dependencies failed
+        """
+        with self.lock:
+            self.current[(target, name)] = {'status': 'skipped', 'explanation': 'one of its dependencies failed'}
+            self.fingerprints.pop((target, name), None)
+
+    def finish_cycle(self) -> list[dict]:
+        """
+        Compare the outcomes of the cycle with the previous ones and return the transitions
+        """
+        transitions = []
+        with self.lock:
+            for key, outcome in sorted(self.current.items()):
+                previous = self.outcomes.get(key)
+                if previous is None or previous['status'] != outcome['status']:
+                    transitions.append({'target': key[0], 'check': key[1],
+                                        'from': previous['status'] if previous else None, **outcome})
+            for key, previous in sorted(self.outcomes.items()):
+                if key not in self.current:
+                    transitions.append({'target': key[0], 'check': key[1], 'from': previous['status'],
+                                        'status': 'gone', 'explanation': 'no longer checked'})
+                    self.fingerprints.pop(key, None)
+                    self.results.pop(key, None)
+            self.outcomes = self.current
+            self.current = {}
+        return transitions
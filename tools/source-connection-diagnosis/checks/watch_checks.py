@@ -0,0 +1,66 @@
+import time
+from typing import Callable
+from .fleet_checks import *
+from .utils.watch_utils import watch_logger
+
+
+class WatchChecks:
+    def __init__(self, fleet_checks: FleetChecks, full_check_every: int = 12):
+        """
+        Re-runs the fleet checks in cycles. Each cycle fetches the cheap describe results again, runs the
+        expensive checks only when the fingerprint of their inputs changed and logs only the state transitions.
+        Every full_check_every cycles all checks are run again, to catch changes the fingerprints don't cover.
+        """
+        if not fleet_checks.watch_state:
+            raise ValueError('The fleet checks must be created with a watch state')
+        self.fleet_checks = fleet_checks
+        self.watch_state = fleet_checks.watch_state
+        self.cache = fleet_checks.aws_utils.cache
+        self.full_check_every = full_check_every
+        self.cycle = 0
+
+    def log_transitions(self, transitions: list[dict]) -> None:
+        for transition in transitions:
+            previous = transition['from'] or 'new'
+            message = (f'{transition["target"]} {transition["check"]}: {previous} -> {transition["status"]}: '
+                       f'{transition["explanation"]}')
+            if transition['status'] == 'failing':
+                watch_logger.error(f'{message} ❌')
+            elif transition['status'] == 'passing':
+                watch_logger.info(f'{message} ✅')
+            else:
+                watch_logger.warning(f'{message} 🚧')
+
+    def run_cycle(self, database_names: list[str] = None, msk_cluster_arns: list[str] = None) -> list[dict]:
+        """
+        Run one cycle and return its state transitions
+        """
+        start = time.monotonic()
+        full_check = self.cycle == 0 or (self.full_check_every and self.cycle % self.full_check_every == 0)
+        # every describe result is fetched again, the Network Insights paths are kept
+        self.cache.invalidate()
+        self.watch_state.start_cycle(full_check=bool(full_check))
+        self.fleet_checks.perform_all_fleet_checks(database_names, msk_cluster_arns)
+        ran, reused = self.watch_state.ran, self.watch_state.reused
+        transitions = self.watch_state.finish_cycle()
+        if self.cycle > 0:
+            self.log_transitions(transitions)
+        watch_logger.info(f'Cycle {self.cycle}: ran {ran} checks, reused {reused} unchanged, '
+                          f'{len(transitions)} transitions in {time.monotonic() - start:.1f}s')
+        self.cycle += 1
+        return transitions
+
+    def watch(self, database_names: list[str] = None, msk_cluster_arns: list[str] = None, interval: float = 300,
+              cycles: int = None, sleep: Callable = time.sleep) -> None:
+        """
+        Run a cycle every interval seconds, forever or for the given number of cycles. The first cycle logs
+        the full output of the checks, the later ones only the state transitions.
+        """
+        while cycles is None or self.cycle < cycles:
+            start = time.monotonic()
+            self.run_cycle(database_names, msk_cluster_arns)
+            if self.cycle == 1:
+                self.watch_state.quiet()
+            if cycles is not None and self.cycle >= cycles:
+                break
+            sleep(max(0.0, interval - (time.monotonic() - start)))
@@ -0,0 +1,333 @@
+import datetime
+import itertools
+import threading
+import time
+import boto3
+from botocore.awsrequest import AWSResponse
+from checks.utils.set_logging import logger
+from checks.utils.virtual_clock import VirtualClock
+
+BENCHMARK_VPC_ID = 'vpc-bench'
+# the EKS node groups, each with nodes in every zone
+BENCHMARK_NODEGROUPS = ['bench-general', 'bench-memory']
+BENCHMARK_NODES_PER_ZONE = 2
+BENCHMARK_ZONES = ['us-west-2a', 'us-west-2b', 'us-west-2c']
+# number of parameters in a real Postgres parameter group, returned 100 per page like RDS does
+PARAMETERS_PER_GROUP = 400
+PARAMETERS_PAGE_SIZE = 100
+
+
+class FakeAWS:
+    def __init__(self, eks_cluster_name: str, database_count: int = 1, msk_cluster_count: int = 0,
+                 brokers_per_cluster: int = 3, parameter_group_count: int = 1, latency: float = 0.05,
+                 nia_duration: float = 60.0, clock: VirtualClock = None):
+        """
+        In-process stand-in for the RDS, EC2, EKS, Glue, MSK and CloudWatch APIs used by the checks.
+        Every call sleeps for the simulated latency and is counted per service and operation.
+        Network Insights analyses finish after nia_duration seconds of the virtual clock.
+        """
+        self.eks_cluster_name = eks_cluster_name
+        self.latency = latency
+        self.nia_duration = nia_duration
+        self.clock = clock or VirtualClock()
+        self.calls = {}
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)
+        self.paths = {}
+        self.analyses = {}
+        self.hosts = {}
+        # a single VPC that allows all traffic within itself
+        self.security_groups = [{
+            'GroupId': 'sg-bench',
+            'VpcId': BENCHMARK_VPC_ID,
+            'IpPermissions': [{'IpProtocol': '-1', 'IpRanges': [{'CidrIp': '10.0.0.0/16'}]}],
+            'IpPermissionsEgress': [{'IpProtocol': '-1', 'IpRanges': [{'CidrIp': '0.0.0.0/0'}]}],
+        }]
+        self.network_acls = [{
+            'NetworkAclId': 'acl-bench',
+            'VpcId': BENCHMARK_VPC_ID,
+            'Associations': [{'SubnetId': f'subnet-bench-{z}'} for z in range(len(BENCHMARK_ZONES))],
+            'Entries': [{'RuleNumber': 100, 'Protocol': '-1', 'RuleAction': 'allow', 'Egress': egress,
+                         'CidrBlock': '0.0.0.0/0'} for egress in (False, True)],
+        }]
+        self.route_tables = [{
+            'RouteTableId': 'rtb-bench',
+            'VpcId': BENCHMARK_VPC_ID,
+            'Associations': [{'Main': True}],
+            'Routes': [{'DestinationCidrBlock': '10.0.0.0/16', 'GatewayId': 'local', 'State': 'active'}],
+        }]
+
+        self.eks_nodes = []
+        for g, nodegroup in enumerate(BENCHMARK_NODEGROUPS):
+            for z, zone in enumerate(BENCHMARK_ZONES):
+                for n in range(BENCHMARK_NODES_PER_ZONE):
+                    self.eks_nodes.append({
+                        'InstanceId': f'i-bench-{g}-{z}-{n}',
+                        'PrivateIpAddress': f'10.0.{252 + z}.{g * 10 + n + 1}',
+                        'SubnetId': f'subnet-bench-{z}',
+                        'VpcId': BENCHMARK_VPC_ID,
+                        'Placement': {'AvailabilityZone': zone},
+                        'SecurityGroups': [{'GroupId': 'sg-bench'}],
+                        'Tags': [{'Key': 'Name', 'Value': eks_cluster_name},
+                                 {'Key': f'kubernetes.io/cluster/{eks_cluster_name}', 'Value': 'owned'},
+                                 {'Key': 'eks:nodegroup-name', 'Value': nodegroup}],
+                    })
+
+        self.db_instances = []
+        self.network_interfaces = []
+        for i in range(database_count):
+            ip_address = f'10.0.{i // 250}.{i % 250 + 1}'
+            host = f'bench-db-{i}.fake.us-west-2.rds.amazonaws.com'
+            self.hosts[host] = ip_address
+            self.db_instances.append({
+                'DBInstanceIdentifier': f'bench-db-{i}',
+                'DBInstanceClass': 'db.r6g.large',
+                'Engine': 'postgres',
+                'DBInstanceStatus': 'available',
+                'Endpoint': {'Address': host, 'Port': 5432},
+                'DBParameterGroups': [{
+                    'DBParameterGroupName': f'bench-pg-{i % parameter_group_count}',
+                    'ParameterApplyStatus': 'in-sync',
+                }],
+                'DBSubnetGroup': {'VpcId': BENCHMARK_VPC_ID},
+                'AllocatedStorage': 100,
+            })
+            self.network_interfaces.append(self._network_interface(f'eni-db-{i}', ip_address, i))
+
+        self.msk_clusters = []
+        self.msk_nodes = {}
+        for j in range(msk_cluster_count):
+            arn = f'arn:aws:kafka:us-west-2:123456789012:cluster/bench-msk-{j}/{j:08d}-0000-0000-0000-000000000000-1'
+            nodes = []
+            for b in range(brokers_per_cluster):
+                ip_address = f'10.1.{j % 250}.{b + 1}'
+                host = f'b-{b + 1}.bench-msk-{j}.fake.c2.kafka.us-west-2.amazonaws.com'
+                self.hosts[host] = ip_address
+                self.network_interfaces.append(self._network_interface(f'eni-msk-{j}-{b}', ip_address, b))
+                nodes.append({'BrokerNodeInfo': {
+                    'BrokerId': float(b + 1),
+                    'Endpoints': [host],
+                    'ClientSubnet': f'subnet-bench-{b % len(BENCHMARK_ZONES)}',
+                    'ClientVpcIpAddress': ip_address,
+                }})
+            self.msk_nodes[arn] = nodes
+            self.msk_clusters.append({
+                'ClusterArn': arn,
+                'ClusterName': f'bench-msk-{j}',
+                'State': 'ACTIVE',
+                'NumberOfBrokerNodes': brokers_per_cluster,
+                'BrokerNodeGroupInfo': {
+                    'InstanceType': 'kafka.m5.large',
+                    'StorageInfo': {'EbsStorageInfo': {'VolumeSize': 1000}},
+                    'ClientSubnets': [f'subnet-bench-{z}' for z in range(len(BENCHMARK_ZONES))],
+                },
+            })
+
+    @staticmethod
+    def _network_interface(eni_id: str, ip_address: str, index: int) -> dict:
+        return {
+            'NetworkInterfaceId': eni_id,
+            'SubnetId': f'subnet-bench-{index % len(BENCHMARK_ZONES)}',
+            'AvailabilityZone': BENCHMARK_ZONES[index % len(BENCHMARK_ZONES)],
+            'VpcId': BENCHMARK_VPC_ID,
+            'PrivateIpAddress': ip_address,
+            'PrivateIpAddresses': [{'PrivateIpAddress': ip_address, 'Primary': True}],
+            'Groups': [{'GroupId': 'sg-bench'}],
+        }
+
+    @staticmethod
+    def _filter_values(params: dict, name: str) -> list | None:
+        for filter_ in params.get('Filters', []):
+            if filter_['Name'] == name:
+                return filter_['Values']
+        return None
+
+    def attach(self, session: boto3.Session) -> None:
+        """
+        Answer every API call made by clients of the session from this fake. Must be called before
+        the session creates its first client.
+        """
+        session.events.register('before-parameter-build', self._remember_params)
+        session.events.register('before-call', self._handle_call)
+
+    def _remember_params(self, params: dict, context: dict, **kwargs) -> None:
+        context['fake_aws_params'] = dict(params)
+
+    def _handle_call(self, model, context: dict, **kwargs):
+        service_name = model.service_model.service_name
+        operation_name = model.name
+        with self.lock:
+            key = f'{service_name}.{operation_name}'
+            self.calls[key] = self.calls.get(key, 0) + 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        handler = getattr(self, f'_{service_name}_{operation_name}', None)
+        if handler is None:
+            logger.warning(f'Fake AWS has no response for {service_name}.{operation_name}')
+            return AWSResponse('https://fake.amazonaws.com', 400, {}, None), {
+                'Error': {'Code': 'UnsupportedOperation', 'Message': f'{operation_name} is not faked'}
+            }
+        return AWSResponse('https://fake.amazonaws.com', 200, {}, None), handler(context.get('fake_aws_params', {}))
+
+    def _rds_DescribeDBInstances(self, params: dict) -> dict:
+        identifier = params.get('DBInstanceIdentifier')
+        if identifier:
+            return {'DBInstances': [db for db in self.db_instances if db['DBInstanceIdentifier'] == identifier]}
+        return {'DBInstances': self.db_instances}
+
+    def _rds_DescribeDBParameters(self, params: dict) -> dict:
+        start = int(params.get('Marker') or 0)
+        parameters = [{'ParameterName': f'bench.parameter_{n}', 'ParameterValue': '0'}
+                      for n in range(start, min(start + PARAMETERS_PAGE_SIZE, PARAMETERS_PER_GROUP))]
+        if start + PARAMETERS_PAGE_SIZE >= PARAMETERS_PER_GROUP:
+            parameters += [
+                {'ParameterName': 'rds.logical_replication', 'ParameterValue': '1'},
+                {'ParameterName': 'max_wal_senders', 'ParameterValue': '20'},
+                {'ParameterName': 'max_replication_slots', 'ParameterValue': '20'},
+                {'ParameterName': 'max_slot_wal_keep_size', 'ParameterValue': '10240'},
+                {'ParameterName': 'max_connections', 'ParameterValue': 'LEAST({DBInstanceClassMemory/9531392},5000)'},
+            ]
+            return {'Parameters': parameters}
+        return {'Parameters': parameters, 'Marker': str(start + PARAMETERS_PAGE_SIZE)}
+
+    @staticmethod
+    def _metric_value(metric_name: str, minute: int) -> float:
+        # a healthy database: a steady slot lag, 100kB/s of WAL and a third of the CPU in use,
+        # and lightly loaded brokers
+        return {
+            'OldestReplicationSlotLag': 50 * 1024 ** 2 + (minute % 5) * 1024 ** 2,
+            'ReplicationSlotDiskUsage': 64 * 1024 ** 2,
+            'TransactionLogsGeneration': 100 * 1024 + (minute % 10) * 1024,
+            'TransactionLogsDiskUsage': 256 * 1024 ** 2,
+            'FreeStorageSpace': 80 * 1024 ** 3,
+            'CPUUtilization': 30.0 + minute % 7,
+            'BytesInPerSec': 2 * 1024 ** 2 + (minute % 10) * 1024 ** 2 / 10,
+            'BytesOutPerSec': 4 * 1024 ** 2,
+            'CpuUser': 15.0 + minute % 5,
+            'CpuSystem': 5.0,
+            'PartitionCount': 200,
+            'KafkaDataLogsDiskUsed': 20.0,
+        }.get(metric_name, 0.0)
+
+    def _cloudwatch_GetMetricData(self, params: dict) -> dict:
+        results = []
+        for query in params['MetricDataQueries']:
+            stat = query['MetricStat']
+            period = stat['Period']
+            timestamps = []
+            timestamp = params['StartTime']
+            while timestamp < params['EndTime']:
+                timestamps.append(timestamp)
+                timestamp += datetime.timedelta(seconds=period)
+            results.append({
+                'Id': query['Id'],
+                'Label': stat['Metric']['MetricName'],
+                'Timestamps': timestamps,
+                'Values': [self._metric_value(stat['Metric']['MetricName'], int(t.timestamp()) // 60) for t in timestamps],
+                'StatusCode': 'Complete',
+            })
+        return {'MetricDataResults': results}
+
+    def _ec2_DescribeNetworkInterfaces(self, params: dict) -> dict:
+        if params.get('NetworkInterfaceIds'):
+            return {'NetworkInterfaces': [eni for eni in self.network_interfaces
+                                          if eni['NetworkInterfaceId'] in params['NetworkInterfaceIds']]}
+        ip_addresses = self._filter_values(params, 'addresses.private-ip-address') or []
+        return {'NetworkInterfaces': [eni for eni in self.network_interfaces if eni['PrivateIpAddress'] in ip_addresses]}
+
+    def _ec2_DescribeInstances(self, params: dict) -> dict:
+        instances = self.eks_nodes
+        if params.get('InstanceIds'):
+            instances = [instance for instance in instances if instance['InstanceId'] in params['InstanceIds']]
+        names = self._filter_values(params, 'tag:Name')
+        if names is not None and self.eks_cluster_name not in names:
+            return {'Reservations': []}
+        tag_keys = self._filter_values(params, 'tag-key')
+        if tag_keys is not None and f'kubernetes.io/cluster/{self.eks_cluster_name}' not in tag_keys:
+            return {'Reservations': []}
+        return {'Reservations': [{'Instances': instances}]}
+
+    def _ec2_DescribeSubnets(self, params: dict) -> dict:
+        subnet_ids = params.get('SubnetIds') or [f'subnet-bench-{z}' for z in range(len(BENCHMARK_ZONES))]
+        return {'Subnets': [{'SubnetId': subnet_id, 'VpcId': BENCHMARK_VPC_ID} for subnet_id in subnet_ids]}
+
+    def _ec2_DescribeInstanceTypes(self, params: dict) -> dict:
+        return {'InstanceTypes': [{'InstanceType': instance_type, 'MemoryInfo': {'SizeInMiB': 16384}}
+                                  for instance_type in params.get('InstanceTypes', [])]}
+
+    def _ec2_DescribeSecurityGroups(self, params: dict) -> dict:
+        return {'SecurityGroups': self.security_groups}
+
+    def _ec2_DescribeNetworkAcls(self, params: dict) -> dict:
+        return {'NetworkAcls': self.network_acls}
+
+    def _ec2_DescribeRouteTables(self, params: dict) -> dict:
+        return {'RouteTables': self.route_tables}
+
+    def _ec2_DescribeVpcPeeringConnections(self, params: dict) -> dict:
+        return {'VpcPeeringConnections': []}
+
+    def _ec2_DescribeTransitGatewayAttachments(self, params: dict) -> dict:
+        return {'TransitGatewayAttachments': []}
+
+    def _ec2_DescribeNetworkInsightsPaths(self, params: dict) -> dict:
+        return {'NetworkInsightsPaths': list(self.paths.values())}
+
+    def _ec2_CreateNetworkInsightsPath(self, params: dict) -> dict:
+        path = {
+            'NetworkInsightsPathId': f'nip-{next(self.ids):08d}',
+            'Source': params['Source'],
+            'Destination': params.get('Destination'),
+            'Protocol': params['Protocol'].lower(),
+            'DestinationPort': params.get('DestinationPort'),
+        }
+        with self.lock:
+            self.paths[path['NetworkInsightsPathId']] = path
+        return {'NetworkInsightsPath': path}
+
+    def _ec2_StartNetworkInsightsAnalysis(self, params: dict) -> dict:
+        analysis_id = f'nia-{next(self.ids):08d}'
+        with self.lock:
+            self.analyses[analysis_id] = self.clock.time()
+        return {'NetworkInsightsAnalysis': {'NetworkInsightsAnalysisId': analysis_id, 'Status': 'running'}}
+
+    def _ec2_DescribeNetworkInsightsAnalyses(self, params: dict) -> dict:
+        analyses = []
+        for analysis_id in params.get('NetworkInsightsAnalysisIds', []):
+            finished = self.clock.time() - self.analyses[analysis_id] >= self.nia_duration
+            analyses.append({
+                'NetworkInsightsAnalysisId': analysis_id,
+                'Status': 'succeeded' if finished else 'running',
+                'NetworkPathFound': finished,
+            })
+        return {'NetworkInsightsAnalyses': analyses}
+
+    def _eks_DescribeCluster(self, params: dict) -> dict:
+        return {'cluster': {'name': params['name'], 'resourcesVpcConfig': {'vpcId': BENCHMARK_VPC_ID}}}
+
+    def _eks_ListNodegroups(self, params: dict) -> dict:
+        return {'nodegroups': BENCHMARK_NODEGROUPS}
+
+    def _eks_DescribeNodegroup(self, params: dict) -> dict:
+        return {'nodegroup': {'nodegroupName': params['nodegroupName'],
+                              'subnets': [f'subnet-bench-{z}' for z in range(len(BENCHMARK_ZONES))]}}
+
+    def _sts_GetCallerIdentity(self, params: dict) -> dict:
+        return {'Account': '123456789012', 'Arn': 'arn:aws:iam::123456789012:user/bench', 'UserId': 'bench'}
+
+    def _glue_ListRegistries(self, params: dict) -> dict:
+        return {'Registries': [{'RegistryName': 'bench-registry'}]}
+
+    def _kafka_ListClusters(self, params: dict) -> dict:
+        return {'ClusterInfoList': self.msk_clusters}
+
+    def _kafka_DescribeCluster(self, params: dict) -> dict:
+        return {'ClusterInfo': next(cluster for cluster in self.msk_clusters if cluster['ClusterArn'] == params['ClusterArn'])}
+
+    def _kafka_GetBootstrapBrokers(self, params: dict) -> dict:
+        hosts = [node['BrokerNodeInfo']['Endpoints'][0] for node in self.msk_nodes[params['ClusterArn']]]
+        return {'BootstrapBrokerStringSaslIam': ','.join(f'{host}:9098' for host in hosts)}
+
+    def _kafka_ListNodes(self, params: dict) -> dict:
+        return {'NodeInfoList': self.msk_nodes[params['ClusterArn']]}
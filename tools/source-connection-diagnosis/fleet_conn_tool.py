@@ -0,0 +1,150 @@
+import time
+
+start_time = time.perf_counter()
+
+import argparse
+from checks.utils.set_logging import logger
+
+# get args from the user
+parser = argparse.ArgumentParser()
+parser.add_argument('--region', type=str, help='AWS region, not needed with --replay or --sweep')
+parser.add_argument('--sweep', type=str, nargs='+', metavar='REGION[:PROFILE][:ROLE_ARN]',
+                    help='Check the fleet of every region and account in parallel, each with a profile and/or role to assume')
+parser.add_argument('--max-parallel-regions', type=int, help='Number of regions to sweep concurrently', default=4)
+parser.add_argument('--sweep-report', type=str,
+                    help='Write the merged results of the sweep and the time spent per region to this JSON file')
+parser.add_argument('--request-id-prefix', type=str, help='Onehouse Request ID prefix', required=True)
+parser.add_argument('--database-names', type=str, nargs='*', help='Postgres Database names or patterns, e.g. prod-*')
+parser.add_argument('--msk-cluster-arns', type=str, nargs='*', help='MSK Cluster ARNs, names or patterns')
+parser.add_argument('--max-parallel-targets', type=int, help='Number of targets to check concurrently', default=16)
+parser.add_argument('--expected-slots', type=int, default=1,
+                    help='Number of replication slots CDC is expected to use per database, for the parameter sizing')
+parser.add_argument('--metric-window', type=int, default=60,
+                    help='Minutes of CloudWatch metrics to read for the replication lag, WAL rate and MSK capacity checks')
+parser.add_argument('--expected-ingest-rate', type=float, default=0.0,
+                    help='Ingest rate in MB/s the MSK capacity check sizes the brokers and partitions for')
+parser.add_argument('--expected-partitions', type=int,
+                    help='Number of partitions the ingest is spread over, all partitions of the cluster by default')
+parser.add_argument('--max-workers', type=int, help='Number of checks to run concurrently per target', default=4)
+parser.add_argument('--reachability-mode', type=str, nargs='+', choices=['nia', 'static'], default=['nia'],
+                    help='Check reachability with Network Insights Analyses and/or a local evaluation of the VPC configuration')
+parser.add_argument('--all-brokers', action='store_true', help='Check every MSK broker instead of a single one')
+parser.add_argument('--metrics-output', type=str, help='Write the AWS call and check timings to this file')
+parser.add_argument('--metrics-format', type=str, choices=['json', 'prometheus'], default='json',
+                    help='Format of the metrics file')
+parser.add_argument('--watch-interval', type=float,
+                    help='Keep running and re-check the fleet every this many seconds, logging only state transitions')
+parser.add_argument('--watch-cycles', type=int, help='Stop watching after this many cycles')
+parser.add_argument('--full-check-every', type=int, default=12,
+                    help='Run every check again every this many watch cycles, even when its inputs are unchanged')
+parser.add_argument('--results-output', type=str,
+                    help='Stream a JSON result per check to this file as each check finishes, - for stdout')
+parser.add_argument('--append-results', action='store_true',
+                    help='Append to the results output file instead of overwriting it')
+parser.add_argument('--record', type=str, help='Record every AWS call of the run to this snapshot file')
+parser.add_argument('--replay', type=str, help='Answer every AWS call from a snapshot file instead of AWS')
+
+# a spawned sweep worker imports this script again, only the tool itself parses the arguments and runs the checks
+if __name__ == '__main__':
+    args = parser.parse_args()
+
+    if not args.database_names and not args.msk_cluster_arns:
+        parser.error('at least one of --database-names or --msk-cluster-arns is required')
+    elif not args.region and not args.replay and not args.sweep:
+        parser.error('--region is required unless --replay or --sweep is used')
+    elif args.sweep and (args.region or args.replay or args.record or args.watch_interval is not None):
+        parser.error('--sweep can not be combined with --region, --replay, --record or --watch-interval')
+    elif args.record and args.watch_interval is not None:
+        # a snapshot holds a single run, recording every cycle would keep every call in memory until the tool stops
+        parser.error('--record can not be combined with --watch-interval')
+    elif args.sweep and args.metrics_output and args.metrics_format != 'json':
+        parser.error('--sweep writes the metrics of every region as JSON')
+    elif args.sweep_report and not args.sweep:
+        parser.error('--sweep-report requires --sweep')
+
+    region = args.region
+    prefix = args.request_id_prefix
+    eks_cluster_name = f'onehouse-customer-cluster-{prefix}'
+
+    # import only what the selected checks need, boto3 and the checks are loaded once the arguments are valid
+    from checks.fleet_checks import *
+    if args.sweep:
+        import json
+        from checks.sweep_checks import SweepChecks
+        from checks.utils.sweep_utils import parse_sweep_target
+    if args.watch_interval is not None:
+        from checks.watch_checks import WatchChecks
+        from checks.utils.watch_utils import WatchState
+    if args.record:
+        from checks.utils.recorder_utils import SessionRecorder
+    if args.replay:
+        from checks.utils.recorder_utils import create_replay_aws_utils
+    if args.results_output:
+        from checks.utils.result_utils import ResultWriter
+
+    if args.sweep:
+        try:
+            sweep_targets = [parse_sweep_target(spec) for spec in args.sweep]
+        except ValueError as e:
+            parser.error(str(e))
+        result_writer = ResultWriter.open(args.results_output, args.append_results) if args.results_output else None
+        sweep_checks = SweepChecks(eks_cluster_name, args.max_parallel_regions, {
+            'max_parallel_targets': args.max_parallel_targets,
+            'max_workers': args.max_workers,
+            'all_msk_brokers': args.all_brokers,
+            'reachability_modes': set(args.reachability_mode),
+            'expected_slots': args.expected_slots,
+            'metric_window_minutes': args.metric_window,
+            'expected_ingest_rate': args.expected_ingest_rate,
+            'expected_partitions': args.expected_partitions,
+        }, result_writer)
+        logger.info(f'Started in {(time.perf_counter() - start_time) * 1000:.0f}ms')
+        sweep_report = sweep_checks.perform_sweep(sweep_targets, args.database_names, args.msk_cluster_arns)
+        if result_writer:
+            result_writer.close()
+        if args.sweep_report:
+            with open(args.sweep_report, 'w') as f:
+                json.dump({key: value for key, value in sweep_report.items() if key != 'metrics'}, f, indent=2,
+                          default=str)
+        if args.metrics_output:
+            with open(args.metrics_output, 'w') as f:
+                json.dump(sweep_report['metrics'], f, indent=2)
+    else:
+        # set session
+        if args.replay:
+            aws_utils = create_replay_aws_utils(args.replay)
+        else:
+            aws_utils = AWSUtils(region)
+        if args.record:
+            recorder = SessionRecorder()
+            recorder.attach(aws_utils.session)
+        metrics = CallMetrics()
+        metrics.attach(aws_utils.session)
+        metrics.call_scheduler = aws_utils.call_scheduler
+        result_writer = ResultWriter.open(args.results_output, args.append_results) if args.results_output else None
+
+        watch_state = WatchState() if args.watch_interval is not None else None
+        fleet_checks = FleetChecks(aws_utils, eks_cluster_name, args.max_parallel_targets, args.max_workers,
+                                   args.all_brokers, metrics, set(args.reachability_mode), watch_state, result_writer,
+                                   args.expected_slots, args.metric_window, args.expected_ingest_rate,
+                                   args.expected_partitions)
+        metrics.startup_s = time.perf_counter() - start_time
+        logger.info(f'Started in {metrics.startup_s * 1000:.0f}ms')
+        if watch_state:
+            watch_checks = WatchChecks(fleet_checks, args.full_check_every)
+            try:
+                watch_checks.watch(args.database_names, args.msk_cluster_arns, args.watch_interval, args.watch_cycles)
+            except KeyboardInterrupt:
+                logger.info(f'Stopped watching after {watch_checks.cycle} cycles')
+        else:
+            fleet_checks.perform_all_fleet_checks(database_names=args.database_names,
+                                                  msk_cluster_arns=args.msk_cluster_arns)
+
+        if result_writer:
+            result_writer.close()
+
+        if args.metrics_output:
+            metrics.write(args.metrics_output, args.metrics_format)
+
+        if args.record:
+            recorder.save(args.record, aws_utils.session.region_name, aws_utils.cache)
@@ -1,26 +1,130 @@
-from checks.generic_checks import *
-import argparse
-import logging
+import time
 
-# configure logging
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger()
+start_time = time.perf_counter()
+
+import argparse
+from checks.utils.set_logging import logger
 
 # get args from the user
 parser = argparse.ArgumentParser()
-parser.add_argument('--region', type=str, help='AWS region', required=True)
+parser.add_argument('--region', type=str, help='AWS region, not needed with --replay')
 parser.add_argument('--request-id-prefix', type=str, help='Onehouse Request ID prefix', required=True)
 parser.add_argument('--msk-cluster-arn', type=str, help='MSK Cluster ARN', required=True)
+parser.add_argument('--metric-window', type=int, default=60,
+                    help='Minutes of CloudWatch metrics to read for the MSK capacity check')
+parser.add_argument('--expected-ingest-rate', type=float, default=0.0,
+                    help='Ingest rate in MB/s the MSK capacity check sizes the brokers and partitions for')
+parser.add_argument('--expected-partitions', type=int,
+                    help='Number of partitions the ingest is spread over, all partitions of the cluster by default')
+parser.add_argument('--max-workers', type=int, help='Number of checks to run concurrently', default=8)
+parser.add_argument('--reachability-mode', type=str, nargs='+', choices=['nia', 'probe', 'static', 'both'], default=['nia'],
+                    help='Check reachability with a Network Insights Analysis, direct connection probes, a local '
+                         'evaluation of the VPC configuration, or nia and probe together (both)')
+parser.add_argument('--probe-count', type=int, help='Number of connections to open per endpoint', default=5)
+parser.add_argument('--probe-concurrency', type=int, help='Number of probe connections open at once', default=16)
+parser.add_argument('--probe-timeout', type=float, help='Probe connect timeout in seconds', default=3.0)
+parser.add_argument('--all-brokers', action='store_true', help='Check every MSK broker instead of a single one')
+parser.add_argument('--probe-tls', action='store_true', help='Measure the TLS handshake after connecting')
+parser.add_argument('--kafka-benchmark', action='store_true',
+                    help='Produce and consume records through the brokers and measure throughput and latency, '
+                         'requires kafka-python')
+parser.add_argument('--kafka-records', type=int, help='Number of records the Kafka benchmark produces', default=10000)
+parser.add_argument('--kafka-record-size', type=int, help='Size of a Kafka benchmark record in bytes', default=1024)
+parser.add_argument('--kafka-batch-size', type=int, help='Producer batch size in bytes', default=16384)
+parser.add_argument('--kafka-linger-ms', type=int, help='Producer linger in milliseconds', default=5)
+parser.add_argument('--kafka-concurrency', type=int, help='Number of producers running at once', default=4)
+parser.add_argument('--kafka-timeout', type=float, help='Kafka benchmark timeout in seconds', default=60.0)
+parser.add_argument('--kafka-security-protocol', type=str, choices=['SASL_SSL', 'SSL', 'PLAINTEXT'], default='SASL_SSL',
+                    help='Protocol of the Kafka benchmark clients, SASL_SSL authenticates with MSK IAM')
+parser.add_argument('--kafka-bootstrap-servers', type=str, nargs='+',
+                    help='Benchmark these host:port bootstrap servers instead of the MSK brokers, '
+                         'e.g. a local Kafka-compatible broker')
+parser.add_argument('--metrics-output', type=str, help='Write the AWS call and check timings to this file')
+parser.add_argument('--metrics-format', type=str, choices=['json', 'prometheus'], default='json',
+                    help='Format of the metrics file')
+parser.add_argument('--results-output', type=str,
+                    help='Stream a JSON result per check to this file as each check finishes, - for stdout')
+parser.add_argument('--append-results', action='store_true',
+                    help='Append to the results output file instead of overwriting it')
+parser.add_argument('--record', type=str, help='Record every AWS call of the run to this snapshot file')
+parser.add_argument('--replay', type=str, help='Answer every AWS call from a snapshot file instead of AWS')
 args = parser.parse_args()
+reachability_modes = set(args.reachability_mode)
+if 'both' in reachability_modes:
+    reachability_modes |= {'nia', 'probe'}
+if not args.region and not args.replay:
+    parser.error('--region is required unless --replay is used')
 
 region = args.region
 prefix = args.request_id_prefix
 eks_cluster_name = f'onehouse-customer-cluster-{prefix}'
 msk_cluster_arn = args.msk_cluster_arn
 
+# import only what the selected checks need, boto3 and the checks are loaded once the arguments are valid
+from checks.generic_checks import *
+from checks.msk_checks import MSKChecks
+from checks.utils.metrics_utils import CallMetrics
+if 'probe' in reachability_modes:
+    from checks.probe_checks import ProbeChecks, ProbeUtils
+if args.kafka_benchmark:
+    from checks.kafka_bench_checks import KafkaBenchmark, KafkaBenchmarkChecks
+if args.record:
+    from checks.utils.recorder_utils import SessionRecorder
+if args.replay:
+    from checks.utils.recorder_utils import create_replay_aws_utils
+if args.results_output:
+    from checks.utils.result_utils import ResultWriter
+
 # set session
-aws_utils = AWSUtils(region)
+if args.replay:
+    aws_utils = create_replay_aws_utils(args.replay)
+else:
+    aws_utils = AWSUtils(region)
+if args.record:
+    recorder = SessionRecorder()
+    recorder.attach(aws_utils.session)
+metrics = CallMetrics()
+metrics.attach(aws_utils.session)
+metrics.call_scheduler = aws_utils.call_scheduler
+result_writer = ResultWriter.open(args.results_output, args.append_results) if args.results_output else None
 session = aws_utils.session
 
-generic_checks = GenericChecks(session)
-generic_checks.perform_all_generic_checks(msk_cluster_arn=msk_cluster_arn, eks_cluster_name=eks_cluster_name)
+scheduler = CheckScheduler(max_workers=args.max_workers, metrics=metrics, target=msk_cluster_arn,
+                           result_writer=result_writer)
+
+msk_checks = MSKChecks(session, msk_cluster_arn, aws_utils.msk_utils, args.expected_ingest_rate,
+                       args.expected_partitions, args.metric_window)
+msk_checks.schedule_all_msk_checks(scheduler)
+
+generic_checks = GenericChecks(session, aws_utils, args.max_workers)
+generic_checks.schedule_all_generic_checks(scheduler, msk_cluster_arn=msk_cluster_arn, eks_cluster_name=eks_cluster_name,
+                                           network_insights='nia' in reachability_modes,
+                                           all_msk_brokers=args.all_brokers,
+                                           static_reachability='static' in reachability_modes)
+
+if 'probe' in reachability_modes:
+    probe_utils = ProbeUtils(timeout=args.probe_timeout, count=args.probe_count,
+                             concurrency=args.probe_concurrency, tls=args.probe_tls)
+    probe_checks = ProbeChecks(aws_utils, probe_utils)
+    probe_checks.schedule_all_probe_checks(scheduler, msk_cluster_arn=msk_cluster_arn, all_msk_brokers=args.all_brokers)
+
+if args.kafka_benchmark:
+    kafka_benchmark = KafkaBenchmark(record_count=args.kafka_records, record_size=args.kafka_record_size,
+                                     batch_size=args.kafka_batch_size, linger_ms=args.kafka_linger_ms,
+                                     concurrency=args.kafka_concurrency, security_protocol=args.kafka_security_protocol,
+                                     region=aws_utils.session.region_name, timeout=args.kafka_timeout)
+    kafka_benchmark_checks = KafkaBenchmarkChecks(aws_utils, kafka_benchmark)
+    kafka_benchmark_checks.schedule_all_kafka_benchmark_checks(scheduler, msk_cluster_arn, args.kafka_bootstrap_servers)
+
+metrics.startup_s = time.perf_counter() - start_time
+logger.info(f'Started in {metrics.startup_s * 1000:.0f}ms')
+scheduler.run()
+
+if result_writer:
+    result_writer.close()
+
+if args.metrics_output:
+    metrics.write(args.metrics_output, args.metrics_format)
+
+if args.record:
+    recorder.save(args.record, aws_utils.session.region_name, aws_utils.cache)
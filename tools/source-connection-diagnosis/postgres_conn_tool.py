@@ -1,31 +1,127 @@
-from checks.generic_checks import *
-from checks.db_checks import *
-import argparse
-import logging
+import time
+
+start_time = time.perf_counter()
 
-# configure logging
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger()
+import argparse
+from checks.utils.set_logging import logger
 
 # get args from the user
 parser = argparse.ArgumentParser()
-parser.add_argument('--region', type=str, help='AWS region', required=True)
+parser.add_argument('--region', type=str, help='AWS region, not needed with --replay')
 parser.add_argument('--request-id-prefix', type=str, help='Onehouse Request ID prefix', required=True)
 parser.add_argument('--database-name', type=str, help='Postgres Database name', required=True)
+parser.add_argument('--expected-slots', type=int, default=1,
+                    help='Number of replication slots CDC is expected to use per database, for the parameter sizing')
+parser.add_argument('--metric-window', type=int, default=60,
+                    help='Minutes of CloudWatch metrics to read for the replication lag and WAL rate check')
+parser.add_argument('--max-workers', type=int, help='Number of checks to run concurrently', default=8)
+parser.add_argument('--reachability-mode', type=str, nargs='+', choices=['nia', 'probe', 'static', 'both'], default=['nia'],
+                    help='Check reachability with a Network Insights Analysis, direct connection probes, a local '
+                         'evaluation of the VPC configuration, or nia and probe together (both)')
+parser.add_argument('--probe-count', type=int, help='Number of connections to open per endpoint', default=5)
+parser.add_argument('--probe-concurrency', type=int, help='Number of probe connections open at once', default=16)
+parser.add_argument('--probe-timeout', type=float, help='Probe connect timeout in seconds', default=3.0)
+parser.add_argument('--probe-tls', action='store_true', help='Measure the TLS handshake after connecting')
+parser.add_argument('--decoding-benchmark', action='store_true',
+                    help='Write a synthetic load and decode it through a temporary logical replication slot, '
+                         'requires psycopg2 and database credentials')
+parser.add_argument('--db-user', type=str, help='Database user of the decoding benchmark, PGUSER by default')
+parser.add_argument('--db-name', type=str, help='Database the decoding benchmark writes to, PGDATABASE or postgres by default')
+parser.add_argument('--db-host', type=str, help='Benchmark this host instead of the RDS instance, e.g. a local Postgres')
+parser.add_argument('--db-port', type=int, help='Port of --db-host', default=5432)
+parser.add_argument('--db-sslmode', type=str, help='sslmode of the decoding benchmark connections', default='prefer')
+parser.add_argument('--decoding-rows', type=int, help='Number of rows the decoding benchmark writes', default=100000)
+parser.add_argument('--decoding-row-size', type=int, help='Payload size of a row in bytes', default=512)
+parser.add_argument('--decoding-batch-size', type=int, help='Rows per write transaction', default=1000)
+parser.add_argument('--decoding-concurrency', type=int, help='Number of writers running at once', default=2)
+parser.add_argument('--decoding-timeout', type=float, help='Decoding benchmark timeout in seconds', default=120.0)
+parser.add_argument('--metrics-output', type=str, help='Write the AWS call and check timings to this file')
+parser.add_argument('--metrics-format', type=str, choices=['json', 'prometheus'], default='json',
+                    help='Format of the metrics file')
+parser.add_argument('--results-output', type=str,
+                    help='Stream a JSON result per check to this file as each check finishes, - for stdout')
+parser.add_argument('--append-results', action='store_true',
+                    help='Append to the results output file instead of overwriting it')
+parser.add_argument('--record', type=str, help='Record every AWS call of the run to this snapshot file')
+parser.add_argument('--replay', type=str, help='Answer every AWS call from a snapshot file instead of AWS')
 args = parser.parse_args()
+reachability_modes = set(args.reachability_mode)
+if 'both' in reachability_modes:
+    reachability_modes |= {'nia', 'probe'}
+if not args.region and not args.replay:
+    parser.error('--region is required unless --replay is used')
 
 region = args.region
 prefix = args.request_id_prefix
 eks_cluster_name = f'onehouse-customer-cluster-{prefix}'
 database_name = args.database_name
 
+# import only what the selected checks need, boto3 and the checks are loaded once the arguments are valid
+from checks.generic_checks import *
+from checks.db_checks import *
+from checks.utils.metrics_utils import CallMetrics
+if 'probe' in reachability_modes:
+    from checks.probe_checks import ProbeChecks, ProbeUtils
+if args.decoding_benchmark:
+    from checks.decoding_bench_checks import DecodingBenchmarkChecks, LogicalDecodingBenchmark
+if args.record:
+    from checks.utils.recorder_utils import SessionRecorder
+if args.replay:
+    from checks.utils.recorder_utils import create_replay_aws_utils
+if args.results_output:
+    from checks.utils.result_utils import ResultWriter
+
 # set session
-aws_utils = AWSUtils(region)
+if args.replay:
+    aws_utils = create_replay_aws_utils(args.replay)
+else:
+    aws_utils = AWSUtils(region)
+if args.record:
+    recorder = SessionRecorder()
+    recorder.attach(aws_utils.session)
+metrics = CallMetrics()
+metrics.attach(aws_utils.session)
+metrics.call_scheduler = aws_utils.call_scheduler
+result_writer = ResultWriter.open(args.results_output, args.append_results) if args.results_output else None
 session = aws_utils.session
 
-# check database infra setup
-database_checks = DatabaseChecks(session, database_name)
-database_checks.perform_all_database_checks()
+# check database infra setup and reachability concurrently
+scheduler = CheckScheduler(max_workers=args.max_workers, metrics=metrics, target=database_name,
+                           result_writer=result_writer)
+
+database_checks = DatabaseChecks(session, database_name, aws_utils.db_utils, args.expected_slots, args.metric_window)
+database_checks.schedule_all_database_checks(scheduler)
+
+generic_checks = GenericChecks(session, aws_utils, args.max_workers)
+generic_checks.schedule_all_generic_checks(scheduler, database_name=database_name, eks_cluster_name=eks_cluster_name,
+                                           network_insights='nia' in reachability_modes,
+                                           static_reachability='static' in reachability_modes)
+
+if 'probe' in reachability_modes:
+    probe_utils = ProbeUtils(timeout=args.probe_timeout, count=args.probe_count,
+                             concurrency=args.probe_concurrency, tls=args.probe_tls)
+    probe_checks = ProbeChecks(aws_utils, probe_utils)
+    probe_checks.schedule_all_probe_checks(scheduler, database_name=database_name)
+
+if args.decoding_benchmark:
+    decoding_benchmark = LogicalDecodingBenchmark(user=args.db_user, dbname=args.db_name,
+                                                  rows=args.decoding_rows, row_size=args.decoding_row_size,
+                                                  batch_size=args.decoding_batch_size,
+                                                  concurrency=args.decoding_concurrency, sslmode=args.db_sslmode,
+                                                  timeout=args.decoding_timeout)
+    decoding_benchmark_checks = DecodingBenchmarkChecks(aws_utils.db_utils, decoding_benchmark)
+    decoding_benchmark_checks.schedule_all_decoding_benchmark_checks(scheduler, database_name, args.db_host,
+                                                                     args.db_port if args.db_host else None)
+
+metrics.startup_s = time.perf_counter() - start_time
+logger.info(f'Started in {metrics.startup_s * 1000:.0f}ms')
+scheduler.run()
+
+if result_writer:
+    result_writer.close()
+
+if args.metrics_output:
+    metrics.write(args.metrics_output, args.metrics_format)
 
-generic_checks = GenericChecks(session)
-generic_checks.perform_all_generic_checks(database_name=database_name, eks_cluster_name=eks_cluster_name)
+if args.record:
+    recorder.save(args.record, aws_utils.session.region_name, aws_utils.cache)
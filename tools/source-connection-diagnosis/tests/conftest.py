@@ -0,0 +1,13 @@
+import os
+import sys
+
+import boto3
+import pytest
+
+# the tools import the checks package from their own directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def session():
+    return boto3.Session(aws_access_key_id='testing', aws_secret_access_key='testing', region_name='us-west-2')
@@ -0,0 +1,21 @@
+import os
+
+import pytest
+
+from checks.utils.decoding_bench_utils import LogicalDecodingBenchmark
+
+# a Postgres with wal_level = logical to run the benchmark against, the user and password come from
+# PGUSER and PGPASSWORD or ~/.pgpass like for psql
+PGHOST = os.environ.get('PGHOST')
+
+pytestmark = pytest.mark.skipif(not PGHOST, reason='PGHOST is not set')
+
+
+def test_benchmark_decodes_every_written_row():
+    pytest.importorskip('psycopg2')
+    benchmark = LogicalDecodingBenchmark(rows=2000, row_size=128, batch_size=500, sample_interval=0.1, timeout=30)
+    report = benchmark.run(PGHOST, int(os.environ.get('PGPORT', 5432)))
+    assert report['write_errors'] == []
+    assert report['written_rows'] == report['decoded_rows'] == 2000
+    assert report['lag_samples']
+    assert LogicalDecodingBenchmark.log_report('decoding_benchmark', report)
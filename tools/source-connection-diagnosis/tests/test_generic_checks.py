@@ -0,0 +1,44 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from checks.generic_checks import GenericChecks
+
+
+def test_reachability_checks_share_the_analysis_workers(session, monkeypatch):
+    generic_checks = GenericChecks(session, max_workers=2)
+    lock = threading.Lock()
+    running = []
+    peak = 0
+
+    def run_network_insights_analysis(path_id: str) -> dict:
+        nonlocal peak
+        with lock:
+            running.append(path_id)
+            peak = max(peak, len(running))
+        time.sleep(0.02)
+        with lock:
+            running.remove(path_id)
+        return {'Status': 'succeeded', 'NetworkPathFound': True}
+
+    monkeypatch.setattr(generic_checks, 'run_network_insights_analysis', run_network_insights_analysis)
+    sources = [{'instance_id': f'i-{index}', 'availability_zone': 'us-west-2a'} for index in range(4)]
+
+    def check(name: str):
+        return generic_checks.check_reachability_from_sources(name, 'eks', sources,
+                                                              lambda instance_id: f'{name}-{instance_id}')
+
+    # the checks run at the same time like the scheduler runs them, their analyses still share the two workers
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        outcomes = list(executor.map(check, ['db-1', 'db-2', 'db-3']))
+
+    assert [outcome.status for outcome in outcomes] == ['passing'] * 3
+    assert peak == 2
+
+
+def test_msk_brokers_reachability_inputs_without_brokers(session):
+    generic_checks = GenericChecks(session)
+    sources = [{'instance_id': 'i-1', 'availability_zone': 'us-west-2a'}]
+
+    assert generic_checks.msk_brokers_reachability_inputs('arn', 'eks', None, sources) == {'msk_brokers': None}
+    assert generic_checks.msk_brokers_reachability_inputs('arn', 'eks', [], sources) == {'msk_brokers': None}
@@ -0,0 +1,31 @@
+import os
+import threading
+
+import pytest
+
+from checks.utils.kafka_bench_utils import KafkaBenchmark
+
+# a Kafka-compatible broker to run the benchmark against, e.g. KAFKA_BOOTSTRAP=localhost:9092
+KAFKA_BOOTSTRAP = os.environ.get('KAFKA_BOOTSTRAP')
+
+pytestmark = pytest.mark.skipif(not KAFKA_BOOTSTRAP, reason='KAFKA_BOOTSTRAP is not set')
+
+
+def test_benchmark_round_trips_every_record():
+    pytest.importorskip('kafka')
+    benchmark = KafkaBenchmark(record_count=200, record_size=128, concurrency=2, security_protocol='PLAINTEXT',
+                               timeout=30)
+    report = benchmark.run(KAFKA_BOOTSTRAP.split(','))
+    assert report['produced'] == report['received'] == 200
+    assert all(broker['errors'] == 0 for broker in report['brokers'].values())
+    assert KafkaBenchmark.log_report('kafka_benchmark', report)
+
+
+def test_benchmark_stops_the_consumer_at_the_timeout():
+    pytest.importorskip('kafka')
+    # more records than make it through in the timeout, the consumer thread is stopped before the consumer is closed
+    benchmark = KafkaBenchmark(record_count=100000, record_size=128, concurrency=1, security_protocol='PLAINTEXT',
+                               timeout=2)
+    report = benchmark.run(KAFKA_BOOTSTRAP.split(','))
+    assert report['received'] <= report['produced']
+    assert not any(thread.name.endswith('(consume)') for thread in threading.enumerate())
@@ -0,0 +1,47 @@
+import pytest
+
+from checks.utils.metrics_utils import CallMetrics, LatencyHistogram
+
+
+def test_histogram_quantiles_and_buckets():
+    histogram = LatencyHistogram()
+    for latency in [0.02] * 90 + [0.3] * 9 + [20.0]:
+        histogram.observe(latency)
+
+    assert histogram.count == 100
+    assert histogram.sum == pytest.approx(0.02 * 90 + 0.3 * 9 + 20.0)
+    assert histogram.max == 20.0
+    # the 50th latency is in the 10-25ms bucket that holds the first 90
+    assert 0.01 < histogram.quantile(0.5) <= 0.025
+    assert 0.25 < histogram.quantile(0.95) <= 0.5
+    # beyond the last bound the quantile is the maximum
+    assert histogram.quantile(1.0) == 20.0
+    buckets = dict(histogram.cumulative())
+    assert buckets['0.01'] == 0
+    assert buckets['0.025'] == 90
+    assert buckets['0.5'] == 99
+    assert buckets['+Inf'] == 100
+    assert len(histogram.counts) == len(histogram.bounds) + 1
+
+
+def test_empty_histogram():
+    histogram = LatencyHistogram()
+
+    assert histogram.quantile(0.5) is None
+    assert histogram.cumulative()[-1] == ('+Inf', 0)
+
+
+def test_spans_keep_the_last_run_of_each_check():
+    metrics = CallMetrics()
+    for _ in range(1000):
+        with metrics.span('database', 'db-1'):
+            pass
+    with pytest.raises(RuntimeError):
+        with metrics.span('database', 'db-1'):
+            raise RuntimeError('boom')
+
+    checks = metrics.to_dict()['checks']
+    assert len(checks) == 1
+    assert checks[0]['runs'] == 1001
+    assert checks[0]['status'] == 'error'
+    assert 'check_runs_total{check="database",target="db-1"} 1001' in metrics.to_prometheus()
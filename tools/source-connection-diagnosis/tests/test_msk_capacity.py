@@ -0,0 +1,102 @@
+import datetime
+
+import pytest
+from botocore.stub import ANY, Stubber
+
+from checks.utils.msk_capacity_utils import MB, analyze_msk_capacity
+from checks.utils.msk_utils import MSKUtils
+
+CLUSTER_ARN = 'arn:aws:kafka:us-west-2:123456789012:cluster/orders/11111111-2222-3333-4444-555555555555-1'
+
+
+def cluster_info(instance_type: str = 'kafka.m5.large', broker_count: int = 3) -> dict:
+    return {
+        'ClusterArn': CLUSTER_ARN,
+        'ClusterName': 'orders',
+        'NumberOfBrokerNodes': broker_count,
+        'BrokerNodeGroupInfo': {
+            'InstanceType': instance_type,
+            'ClientSubnets': ['subnet-1', 'subnet-2', 'subnet-3'],
+            'StorageInfo': {'EbsStorageInfo': {'VolumeSize': 1000}},
+        },
+    }
+
+
+def broker_metrics(bytes_in: float, bytes_out: float, cpu_user: float, cpu_system: float = 0.0) -> dict[str, float]:
+    return {
+        'BytesInPerSec': bytes_in,
+        'BytesOutPerSec': bytes_out,
+        'CpuUser': cpu_user,
+        'CpuSystem': cpu_system,
+        'PartitionCount': 300,
+        'KafkaDataLogsDiskUsed': 20,
+    }
+
+
+def get_broker_series(session, brokers: dict[int, dict[str, float]]) -> dict[int, dict[str, list]]:
+    """
+    Fetch the series of the brokers through MSKUtils, with the Kafka and CloudWatch responses stubbed
+    """
+    msk_utils = MSKUtils(session)
+    timestamps = [datetime.datetime(2024, 1, 1, 12, minute, tzinfo=datetime.timezone.utc) for minute in range(5)]
+    with Stubber(msk_utils.msk) as kafka, Stubber(msk_utils.cloudwatch) as cloudwatch:
+        kafka.add_response('describe_cluster', {'ClusterInfo': cluster_info(broker_count=len(brokers))},
+                           {'ClusterArn': CLUSTER_ARN})
+        kafka.add_response('list_nodes', {'NodeInfoList': [
+            {'BrokerNodeInfo': {'BrokerId': float(broker_id)}} for broker_id in brokers
+        ]}, {'ClusterArn': CLUSTER_ARN})
+        cloudwatch.add_response('get_metric_data', {'MetricDataResults': [
+            {'Id': f'b{i}_m{j}', 'Timestamps': timestamps, 'Values': [value] * len(timestamps)}
+            for i, metrics in enumerate(brokers.values()) for j, value in enumerate(metrics.values())
+        ]}, {'MetricDataQueries': ANY, 'StartTime': ANY, 'EndTime': ANY, 'ScanBy': 'TimestampAscending'})
+        series = msk_utils.get_broker_metric_data([CLUSTER_ARN])[CLUSTER_ARN]
+        kafka.assert_no_pending_responses()
+        cloudwatch.assert_no_pending_responses()
+    return series
+
+
+def test_idle_cluster_cpu_is_unknown(session):
+    series = get_broker_series(session, {broker_id: broker_metrics(2000, 2000, 4, 1) for broker_id in (1, 2, 3)})
+    report = analyze_msk_capacity(cluster_info(), series, expected_ingest_bytes_per_s=5 * MB)
+
+    # whether the brokers have the CPU for the expected rate is not known, so the cluster is not passing
+    assert report['status'] == 'warning'
+    assert all('cpu' not in broker['utilization'] for broker in report['brokers'])
+    unknown = [finding['message'] for finding in report['findings'] if finding['status'] == 'unknown']
+    assert len(unknown) == 3
+    assert all('too little to project its CPU' in message for message in unknown)
+
+
+def test_idle_cluster_running_hot_is_a_warning(session):
+    series = get_broker_series(session, {broker_id: broker_metrics(2000, 2000, 50, 20) for broker_id in (1, 2, 3)})
+    report = analyze_msk_capacity(cluster_info(), series, expected_ingest_bytes_per_s=5 * MB)
+
+    assert report['status'] == 'warning'
+    assert 'Broker 1 CPU peaked at 70%' in [finding['message'] for finding in report['findings']]
+
+
+def test_loaded_cluster_projects_cpu(session):
+    series = get_broker_series(session, {broker_id: broker_metrics(10 * MB, 10 * MB, 15, 5) for broker_id in (1, 2, 3)})
+    report = analyze_msk_capacity(cluster_info(), series, expected_ingest_bytes_per_s=15 * MB)
+
+    assert report['status'] == 'ok'
+    for broker in report['brokers']:
+        assert broker['utilization']['cpu'] == pytest.approx(0.3)
+
+
+def test_cpu_not_projected_beyond_the_cap(session):
+    series = get_broker_series(session, {broker_id: broker_metrics(2 * MB, 2 * MB, 10, 5) for broker_id in (1, 2, 3)})
+    report = analyze_msk_capacity(cluster_info(), series, expected_ingest_bytes_per_s=30 * MB)
+
+    assert all('cpu' not in broker['utilization'] for broker in report['brokers'])
+    assert any('too little to project its CPU' in finding['message'] for finding in report['findings'])
+
+
+def test_unknown_instance_type_without_metrics_is_a_warning():
+    report = analyze_msk_capacity(cluster_info('express.m7g.large'), {}, expected_ingest_bytes_per_s=5 * MB)
+
+    assert report['status'] == 'warning'
+    assert [finding['message'] for finding in report['findings']] == [
+        'Unknown capacity of broker instance type express.m7g.large',
+        'No broker metrics, the headroom of the brokers is unknown',
+    ]
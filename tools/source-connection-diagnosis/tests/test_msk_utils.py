@@ -0,0 +1,48 @@
+from botocore.stub import Stubber
+
+from checks.utils.msk_utils import MSKUtils, broker_id_from_host
+
+CLUSTER_ARN = 'arn:aws:kafka:us-west-2:123456789012:cluster/orders/11111111-2222-3333-4444-555555555555-1'
+
+
+def broker_host(broker_id: int) -> str:
+    return f'b-{broker_id}.orders.abc123.c3.kafka.us-west-2.amazonaws.com'
+
+
+def test_broker_id_from_host():
+    assert broker_id_from_host(broker_host(12)) == 12
+    assert broker_id_from_host('localhost') is None
+
+
+def test_bootstrap_brokers_keep_their_broker_ids(session):
+    msk_utils = MSKUtils(session)
+    msk_utils.cache.set(('dns', broker_host(3)), '10.0.0.3')
+    msk_utils.cache.set(('dns', broker_host(1)), '10.0.0.1')
+    with Stubber(msk_utils.msk) as kafka, Stubber(msk_utils.ec2) as ec2:
+        kafka.add_client_error('list_nodes', 'AccessDeniedException', expected_params={'ClusterArn': CLUSTER_ARN})
+        kafka.add_response('get_bootstrap_brokers', {
+            'BootstrapBrokerStringSaslIam': f'{broker_host(3)}:9098,{broker_host(1)}:9098',
+        }, {'ClusterArn': CLUSTER_ARN})
+        ec2.add_response('describe_network_interfaces', {'NetworkInterfaces': [{
+            'NetworkInterfaceId': f'eni-{broker_id}',
+            'SubnetId': f'subnet-{broker_id}',
+            'AvailabilityZone': 'us-west-2a',
+            'PrivateIpAddresses': [{'PrivateIpAddress': f'10.0.0.{broker_id}'}],
+        } for broker_id in (1, 3)]}, {'Filters': [
+            {'Name': 'addresses.private-ip-address', 'Values': ['10.0.0.1', '10.0.0.3']},
+        ]})
+        brokers = msk_utils.get_msk_brokers(CLUSTER_ARN)
+        kafka.assert_no_pending_responses()
+        ec2.assert_no_pending_responses()
+
+    assert [(broker['broker_id'], broker['eni_id']) for broker in brokers] == [(1, 'eni-1'), (3, 'eni-3')]
+
+
+def test_ip_address_of_a_single_bootstrap_broker(session):
+    msk_utils = MSKUtils(session)
+    msk_utils.cache.set(('dns', broker_host(1)), '10.0.0.1')
+    with Stubber(msk_utils.msk) as kafka:
+        kafka.add_response('get_bootstrap_brokers', {'BootstrapBrokerStringSaslIam': f'{broker_host(1)}:9098'},
+                           {'ClusterArn': CLUSTER_ARN})
+
+        assert msk_utils.get_msk_ip_address(CLUSTER_ARN) == '10.0.0.1'
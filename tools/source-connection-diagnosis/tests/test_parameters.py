@@ -0,0 +1,161 @@
+from botocore.stub import Stubber
+
+from checks.db_checks import DatabaseChecks
+from checks.utils.parameter_utils import ParameterIndex, analyze_cdc_readiness, evaluate_formula
+from checks.utils.watch_utils import fingerprint
+
+GIB = 1024 ** 3
+
+
+def parameter_index(**values: str) -> ParameterIndex:
+    return ParameterIndex([{'ParameterName': name.replace('__', '.'), 'ParameterValue': value}
+                           for name, value in values.items()])
+
+
+def findings_by_parameter(report: dict) -> dict[str, dict]:
+    return {finding['parameter']: finding for finding in report['findings']}
+
+
+def test_evaluate_formula():
+    variables = {'DBInstanceClassMemory': 16 * GIB}
+
+    assert evaluate_formula('20', variables) == 20
+    assert evaluate_formula('-1', variables) == -1
+    assert evaluate_formula('{DBInstanceClassMemory/1048576}', variables) == 16384
+    assert evaluate_formula('GREATEST({DBInstanceClassMemory/9531392},5000)', variables) == 5000
+    assert evaluate_formula('LEAST({DBInstanceClassMemory/9531392},5000)', variables) == 1802
+    assert evaluate_formula('SUM({DBInstanceClassMemory/1073741824},4)', variables) == 20
+    # division of formulas is integer division, as in RDS
+    assert evaluate_formula('{DBInstanceClassMemory*3/4}', {'DBInstanceClassMemory': 10}) == 7
+
+
+def test_evaluate_unsupported_formula_is_unknown():
+    variables = {'DBInstanceClassMemory': 16 * GIB}
+
+    # RDS supports log(), the evaluator doesn't, so the value is unknown rather than wrong
+    assert evaluate_formula('LEAST({DBInstanceClassMemory/9531392},log(DBInstanceClassMemory))', variables) is None
+    assert evaluate_formula('{DBInstanceVCPU*2}', variables) is None
+    assert evaluate_formula('{DBInstanceClassMemory/0}', variables) is None
+    assert evaluate_formula('on', variables) is None
+
+
+def test_cdc_not_ready_without_logical_replication():
+    report = analyze_cdc_readiness(parameter_index(), 16 * GIB, 100)
+
+    assert report['verdict'] == 'not ready'
+    assert findings_by_parameter(report)['rds.logical_replication']['status'] == 'blocking'
+    # the PostgreSQL defaults apply to the parameters the group leaves unset
+    assert report['slot_capacity'] == 10
+
+
+def test_cdc_ready():
+    report = analyze_cdc_readiness(parameter_index(
+        rds__logical_replication='1', max_slot_wal_keep_size='10240'), 16 * GIB, 100, expected_slots=2)
+
+    assert report['verdict'] == 'ready'
+    assert {finding['status'] for finding in report['findings']} == {'ok'}
+
+
+def test_cdc_blocked_by_too_few_slots():
+    report = analyze_cdc_readiness(parameter_index(
+        rds__logical_replication='1', max_replication_slots='2', max_slot_wal_keep_size='10240'),
+        16 * GIB, 100, expected_slots=3)
+
+    assert report['verdict'] == 'not ready'
+    assert findings_by_parameter(report)['max_replication_slots']['status'] == 'blocking'
+    assert findings_by_parameter(report)['max_wal_senders']['status'] == 'ok'
+    assert report['slot_capacity'] == 2
+
+
+def test_cdc_ready_with_warnings():
+    report = analyze_cdc_readiness(parameter_index(
+        rds__logical_replication='1', wal_sender_timeout='5000', max_slot_wal_keep_size='-1',
+        logical_decoding_work_mem='log(4096)'), 16 * GIB, 100)
+    findings = findings_by_parameter(report)
+
+    assert report['verdict'] == 'ready with warnings'
+    assert findings['wal_sender_timeout']['status'] == 'warning'
+    assert findings['max_slot_wal_keep_size']['status'] == 'warning'
+    assert findings['logical_decoding_work_mem']['status'] == 'unknown'
+
+
+def test_cdc_slot_wal_keep_size_against_storage():
+    report = analyze_cdc_readiness(parameter_index(
+        rds__logical_replication='1', max_slot_wal_keep_size='40960'), 16 * GIB, 100, expected_slots=2)
+
+    assert findings_by_parameter(report)['max_slot_wal_keep_size']['status'] == 'warning'
+    assert 'more than half of the 100GB storage' in findings_by_parameter(report)['max_slot_wal_keep_size']['message']
+
+
+def test_cluster_parameter_group_takes_precedence():
+    instance = parameter_index(rds__logical_replication='0', max_replication_slots='5')
+    cluster = ParameterIndex([{'ParameterName': 'rds.logical_replication', 'ParameterValue': '1'},
+                              {'ParameterName': 'max_replication_slots'}])
+
+    assert instance.merge(cluster).cdc_values()['rds.logical_replication'] == '1'
+    assert instance.merge(cluster).cdc_values()['max_replication_slots'] == '5'
+
+
+def add_aurora_responses(rds: Stubber, cluster_parameters: list[dict]) -> None:
+    """
+    Stub the RDS responses describing an Aurora instance, its instance and cluster parameter groups
+    """
+    rds.add_response('describe_db_instances', {'DBInstances': [{
+        'DBInstanceIdentifier': 'orders-1',
+        'DBInstanceClass': 'db.r6g.large',
+        'Engine': 'aurora-postgresql',
+        # the storage of Aurora is the cluster volume, the instance reports a placeholder
+        'AllocatedStorage': 1,
+        'DBClusterIdentifier': 'orders',
+        'DBParameterGroups': [{'DBParameterGroupName': 'orders-instance', 'ParameterApplyStatus': 'in-sync'}],
+    }]}, {'DBInstanceIdentifier': 'orders-1'})
+    rds.add_response('describe_db_parameters', {'Parameters': [
+        {'ParameterName': 'max_replication_slots', 'ParameterValue': '20'},
+    ]}, {'DBParameterGroupName': 'orders-instance', 'MaxRecords': 100})
+    rds.add_response('describe_db_clusters', {'DBClusters': [
+        {'DBClusterIdentifier': 'orders', 'DBClusterParameterGroup': 'orders-cluster'},
+    ]}, {'DBClusterIdentifier': 'orders'})
+    rds.add_response('describe_db_cluster_parameters', {'Parameters': cluster_parameters},
+                     {'DBClusterParameterGroupName': 'orders-cluster', 'MaxRecords': 100})
+
+
+def logical_replication_fingerprint(session, cluster_parameters: list[dict]) -> str:
+    """
+    The fingerprint of the inputs of the logical replication check of an Aurora instance, with the RDS
+    responses stubbed
+    """
+    database_checks = DatabaseChecks(session, 'orders-1')
+    with Stubber(database_checks.rds) as rds:
+        add_aurora_responses(rds, cluster_parameters)
+        inputs = database_checks.logical_replication_inputs()
+        rds.assert_no_pending_responses()
+    assert inputs['parameters']['max_replication_slots'] == '20'
+    return fingerprint(inputs)
+
+
+def test_logical_replication_inputs_cover_the_cluster_parameter_values(session):
+    disabled = [{'ParameterName': 'rds.logical_replication', 'ParameterValue': '0'}]
+    enabled = [{'ParameterName': 'rds.logical_replication', 'ParameterValue': '1'}]
+    resized = [*enabled, {'ParameterName': 'max_slot_wal_keep_size', 'ParameterValue': '10240'}]
+
+    assert logical_replication_fingerprint(session, enabled) == logical_replication_fingerprint(session, enabled)
+    assert logical_replication_fingerprint(session, disabled) != logical_replication_fingerprint(session, enabled)
+    # a dynamic parameter changes without the apply status of the group changing
+    assert logical_replication_fingerprint(session, resized) != logical_replication_fingerprint(session, enabled)
+
+
+def test_aurora_slot_wal_keep_size_is_not_compared_with_the_instance_storage(session):
+    database_checks = DatabaseChecks(session, 'orders-1')
+    cluster_parameters = [{'ParameterName': 'rds.logical_replication', 'ParameterValue': '1'},
+                          {'ParameterName': 'max_wal_senders', 'ParameterValue': '20'},
+                          {'ParameterName': 'max_slot_wal_keep_size', 'ParameterValue': '10240'}]
+    with Stubber(database_checks.rds) as rds, Stubber(database_checks.db_utils.ec2) as ec2:
+        add_aurora_responses(rds, cluster_parameters)
+        ec2.add_response('describe_instance_types', {'InstanceTypes': [
+            {'InstanceType': 'r6g.large', 'MemoryInfo': {'SizeInMiB': 16384}},
+        ]}, {'InstanceTypes': ['r6g.large']})
+        outcome = database_checks.check_logical_replication()
+        rds.assert_no_pending_responses()
+
+    assert outcome.status == 'passing'
+    assert findings_by_parameter(outcome.details)['max_slot_wal_keep_size']['status'] == 'ok'
@@ -0,0 +1,184 @@
+import pytest
+
+from checks.utils.reachability_utils import StaticReachability, VPCSnapshot
+
+SOURCE = {'id': 'i-node', 'ip_address': '10.0.1.10', 'subnet_id': 'subnet-eks', 'vpc_id': 'vpc-eks',
+          'security_group_ids': ['sg-eks']}
+DATABASE = {'id': 'eni-db', 'ip_address': '10.0.2.20', 'subnet_id': 'subnet-db', 'vpc_id': 'vpc-eks',
+            'security_group_ids': ['sg-db']}
+PEERED_DATABASE = {'id': 'eni-peered', 'ip_address': '172.16.0.20', 'subnet_id': 'subnet-peered',
+                   'vpc_id': 'vpc-db', 'security_group_ids': ['sg-db']}
+
+
+def security_group(group_id: str, inbound: list[dict] = None, outbound: list[dict] = None) -> dict:
+    return {'GroupId': group_id, 'IpPermissions': inbound or [], 'IpPermissionsEgress': outbound or [
+        {'IpProtocol': '-1', 'IpRanges': [{'CidrIp': '0.0.0.0/0'}]},
+    ]}
+
+
+def acl_entry(rule_number: int, egress: bool, action: str = 'allow', ports: tuple[int, int] = None,
+              cidr: str = '0.0.0.0/0', protocol: str = '6') -> dict:
+    entry = {'RuleNumber': rule_number, 'Egress': egress, 'RuleAction': action, 'CidrBlock': cidr,
+             'Protocol': protocol}
+    if ports:
+        entry['PortRange'] = {'From': ports[0], 'To': ports[1]}
+    return entry
+
+
+def network_acl(network_acl_id: str, subnet_ids: list[str], entries: list[dict]) -> dict:
+    return {'NetworkAclId': network_acl_id, 'Associations': [{'SubnetId': subnet_id} for subnet_id in subnet_ids],
+            'Entries': entries + [acl_entry(32767, egress, 'deny', protocol='-1') for egress in (False, True)]}
+
+
+OPEN_ACL_ENTRIES = [acl_entry(100, egress, protocol='-1') for egress in (False, True)]
+LOCAL_ROUTE = {'DestinationCidrBlock': '10.0.0.0/16', 'GatewayId': 'local', 'State': 'active'}
+
+
+def snapshot(security_groups: list[dict] = None, network_acls: list[dict] = None, routes: list[dict] = None,
+             peered_routes: list[dict] = None, peering_status: str = 'active') -> VPCSnapshot:
+    """
+    The EKS VPC with a node subnet and a database subnet, peered with a second VPC holding another database
+    """
+    return VPCSnapshot(
+        security_groups=security_groups or [
+            security_group('sg-eks'),
+            security_group('sg-db', inbound=[{'IpProtocol': 'tcp', 'FromPort': 5432, 'ToPort': 5432,
+                                              'UserIdGroupPairs': [{'GroupId': 'sg-eks'}]}]),
+        ],
+        network_acls=network_acls or [network_acl('acl-open', ['subnet-eks', 'subnet-db', 'subnet-peered'],
+                                                  OPEN_ACL_ENTRIES)],
+        route_tables=[
+            {'RouteTableId': 'rtb-eks', 'VpcId': 'vpc-eks', 'Associations': [{'Main': True}],
+             'Routes': routes if routes is not None else [LOCAL_ROUTE]},
+            {'RouteTableId': 'rtb-db', 'VpcId': 'vpc-db', 'Associations': [{'SubnetId': 'subnet-peered'}],
+             'Routes': peered_routes if peered_routes is not None else [
+                 {'DestinationCidrBlock': '172.16.0.0/16', 'GatewayId': 'local', 'State': 'active'},
+                 {'DestinationCidrBlock': '10.0.0.0/16', 'VpcPeeringConnectionId': 'pcx-1', 'State': 'active'},
+             ]},
+        ],
+        subnets=[{'SubnetId': 'subnet-eks', 'VpcId': 'vpc-eks'}, {'SubnetId': 'subnet-db', 'VpcId': 'vpc-eks'},
+                 {'SubnetId': 'subnet-peered', 'VpcId': 'vpc-db'}],
+        peering_connections=[{'VpcPeeringConnectionId': 'pcx-1', 'Status': {'Code': peering_status},
+                              'RequesterVpcInfo': {'VpcId': 'vpc-eks'}, 'AccepterVpcInfo': {'VpcId': 'vpc-db'}}],
+        transit_gateway_attachments=[],
+    )
+
+
+def evaluate(vpc_snapshot: VPCSnapshot, destination: dict = DATABASE, source: dict = SOURCE) -> dict:
+    return StaticReachability(vpc_snapshot).evaluate(source, destination, 5432)
+
+
+def test_reachable():
+    assert evaluate(snapshot()) == {'status': 'reachable', 'explanations': []}
+
+
+@pytest.mark.parametrize('inbound, status', [
+    ([{'IpProtocol': 'tcp', 'FromPort': 5432, 'ToPort': 5432, 'IpRanges': [{'CidrIp': '10.0.1.0/24'}]}], 'reachable'),
+    ([{'IpProtocol': '-1', 'IpRanges': [{'CidrIp': '10.0.0.0/16'}]}], 'reachable'),
+    ([{'IpProtocol': 'tcp', 'FromPort': 3306, 'ToPort': 3306, 'UserIdGroupPairs': [{'GroupId': 'sg-eks'}]}], 'blocked'),
+    ([{'IpProtocol': 'udp', 'FromPort': 5432, 'ToPort': 5432, 'IpRanges': [{'CidrIp': '0.0.0.0/0'}]}], 'blocked'),
+    ([{'IpProtocol': 'tcp', 'FromPort': 5432, 'ToPort': 5432, 'IpRanges': [{'CidrIp': '10.0.3.0/24'}]}], 'blocked'),
+    # prefix lists are not resolved locally
+    ([{'IpProtocol': 'tcp', 'FromPort': 5432, 'ToPort': 5432, 'PrefixListIds': [{'PrefixListId': 'pl-1'}]}], 'unknown'),
+])
+def test_security_group_inbound(inbound, status):
+    report = evaluate(snapshot(security_groups=[security_group('sg-eks'), security_group('sg-db', inbound=inbound)]))
+
+    assert report['status'] == status
+    if status != 'reachable':
+        assert 'sg-db of the destination have no inbound rule allowing tcp/5432' in report['explanations'][0]
+
+
+def test_security_group_outbound():
+    source_group = security_group('sg-eks', outbound=[{'IpProtocol': 'tcp', 'FromPort': 443, 'ToPort': 443,
+                                                       'IpRanges': [{'CidrIp': '0.0.0.0/0'}]}])
+    report = evaluate(snapshot(security_groups=[source_group, snapshot().security_groups['sg-db']]))
+
+    assert report['status'] == 'blocked'
+    assert 'sg-eks of the source have no outbound rule' in report['explanations'][0]
+
+
+@pytest.mark.parametrize('entries, explanation', [
+    # the return traffic to the node is allowed on the whole ephemeral range
+    ([acl_entry(100, False, ports=(1024, 65535)), acl_entry(100, True, protocol='-1')], None),
+    # split over two rules
+    ([acl_entry(100, False, ports=(1024, 40000)), acl_entry(110, False, ports=(40001, 65535)),
+      acl_entry(100, True, protocol='-1')], None),
+    # only the lower end of the ephemeral range, the upper end is left to the catch-all deny
+    ([acl_entry(100, False, ports=(32768, 50000)), acl_entry(100, True, protocol='-1')],
+     'network ACL acl-eks rule 32767 of subnet-eks denies return inbound tcp/50001-60999 from 10.0.2.20'),
+    # a deny in the middle of the range that checking both ends misses
+    ([acl_entry(90, False, 'deny', ports=(40000, 40100)), acl_entry(100, False, ports=(1024, 65535)),
+      acl_entry(100, True, protocol='-1')],
+     'network ACL acl-eks rule 90 of subnet-eks denies return inbound tcp/40000-40100 from 10.0.2.20'),
+    # a deny of a lower numbered rule wins over a later allow
+    ([acl_entry(100, True, 'deny', ports=(5432, 5432)), acl_entry(200, True, protocol='-1'),
+      acl_entry(100, False, protocol='-1')],
+     'network ACL acl-eks rule 100 of subnet-eks denies outbound tcp/5432 to 10.0.2.20'),
+    # a later deny doesn't apply to ports an earlier rule allowed
+    ([acl_entry(100, False, protocol='-1'), acl_entry(110, False, 'deny', ports=(40000, 40100)),
+      acl_entry(100, True, protocol='-1')], None),
+])
+def test_network_acl_of_the_source_subnet(entries, explanation):
+    network_acls = [network_acl('acl-eks', ['subnet-eks'], entries),
+                    network_acl('acl-db', ['subnet-db'], OPEN_ACL_ENTRIES)]
+    report = evaluate(snapshot(network_acls=network_acls))
+
+    if explanation is None:
+        assert report == {'status': 'reachable', 'explanations': []}
+    else:
+        assert report == {'status': 'blocked', 'explanations': [explanation]}
+
+
+def test_network_acl_of_the_destination_subnet():
+    network_acls = [network_acl('acl-eks', ['subnet-eks'], OPEN_ACL_ENTRIES),
+                    network_acl('acl-db', ['subnet-db'], [acl_entry(100, False, ports=(5432, 5432), cidr='10.0.1.0/24'),
+                                                          acl_entry(100, True, ports=(1024, 32767))])]
+    report = evaluate(snapshot(network_acls=network_acls))
+
+    assert report == {'status': 'blocked', 'explanations': [
+        'network ACL acl-db rule 32767 of subnet-db denies return outbound tcp/32768-60999 to 10.0.1.10',
+    ]}
+
+
+def test_network_acl_within_the_same_subnet():
+    # traffic between two addresses of the same subnet doesn't cross the network ACL
+    network_acls = [network_acl('acl-closed', ['subnet-eks'], [])]
+    destination = {**DATABASE, 'ip_address': '10.0.1.20', 'subnet_id': 'subnet-eks'}
+
+    assert evaluate(snapshot(network_acls=network_acls), destination)['status'] == 'reachable'
+    assert evaluate(snapshot(network_acls=network_acls))['status'] == 'blocked'
+
+
+def test_route_via_active_peering():
+    routes = [LOCAL_ROUTE, {'DestinationCidrBlock': '172.16.0.0/16', 'VpcPeeringConnectionId': 'pcx-1'}]
+
+    assert evaluate(snapshot(routes=routes), PEERED_DATABASE)['status'] == 'reachable'
+
+
+@pytest.mark.parametrize('routes, peered_routes, peering_status, explanation', [
+    ([LOCAL_ROUTE], None, 'active', 'forward route: route table rtb-eks has no route to 172.16.0.20'),
+    ([LOCAL_ROUTE, {'DestinationCidrBlock': '172.16.0.0/16', 'VpcPeeringConnectionId': 'pcx-1', 'State': 'blackhole'}],
+     None, 'active', 'forward route: route 172.16.0.0/16 in rtb-eks is a blackhole'),
+    ([LOCAL_ROUTE, {'DestinationCidrBlock': '172.16.0.0/16', 'VpcPeeringConnectionId': 'pcx-1'}],
+     None, 'pending-acceptance',
+     'forward route: peering connection pcx-1 in rtb-eks is not active between vpc-eks and vpc-db'),
+    ([LOCAL_ROUTE, {'DestinationCidrBlock': '172.16.0.0/16', 'VpcPeeringConnectionId': 'pcx-1'}],
+     [{'DestinationCidrBlock': '172.16.0.0/16', 'GatewayId': 'local'}], 'active',
+     'return route: route table rtb-db has no route to 10.0.1.10'),
+])
+def test_route_blocked(routes, peered_routes, peering_status, explanation):
+    report = evaluate(snapshot(routes=routes, peered_routes=peered_routes, peering_status=peering_status),
+                      PEERED_DATABASE)
+
+    assert report['status'] == 'blocked'
+    assert explanation in report['explanations']
+
+
+def test_route_via_an_unevaluated_target_is_unknown():
+    routes = [LOCAL_ROUTE, {'DestinationCidrBlock': '0.0.0.0/0', 'NatGatewayId': 'nat-1'}]
+    report = evaluate(snapshot(routes=routes), PEERED_DATABASE)
+
+    assert report == {'status': 'unknown', 'explanations': [
+        'forward route: route 0.0.0.0/0 in rtb-eks goes to nat-1, which is not evaluated locally',
+    ]}
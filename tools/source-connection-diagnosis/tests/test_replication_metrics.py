@@ -0,0 +1,109 @@
+import datetime
+
+import pytest
+from botocore.stub import ANY, Stubber
+
+from checks.db_checks import DatabaseChecks
+from checks.utils.cloudwatch_utils import analyze_replication_metrics
+from checks.utils.db_utils import DatabaseUtils
+
+GB = 1024 ** 3
+# the order of the RDS metrics the queries of a database are numbered in
+METRIC_IDS = {
+    'OldestReplicationSlotLag': 'm0',
+    'ReplicationSlotDiskUsage': 'm1',
+    'TransactionLogsGeneration': 'm2',
+    'TransactionLogsDiskUsage': 'm3',
+    'FreeStorageSpace': 'm4',
+    'CPUUtilization': 'm5',
+}
+
+
+def get_series(session, metrics: dict[str, list[float]]) -> dict[str, list]:
+    """
+    Fetch the series of a database through DatabaseUtils, with one point per minute of the given values and
+    the CloudWatch response stubbed
+    """
+    db_utils = DatabaseUtils(session)
+    start = datetime.datetime(2024, 1, 1, 12, tzinfo=datetime.timezone.utc)
+    with Stubber(db_utils.cloudwatch) as cloudwatch:
+        cloudwatch.add_response('get_metric_data', {'MetricDataResults': [
+            {'Id': f'db0_{METRIC_IDS[metric_name]}',
+             'Timestamps': [start + datetime.timedelta(minutes=minute) for minute in range(len(values))],
+             'Values': values}
+            for metric_name, values in metrics.items()
+        ]}, {'MetricDataQueries': ANY, 'StartTime': ANY, 'EndTime': ANY, 'ScanBy': 'TimestampAscending'})
+        series = db_utils.get_db_metric_data(['orders'])['orders']
+        cloudwatch.assert_no_pending_responses()
+    return series
+
+
+def statuses(report: dict) -> list[str]:
+    return [finding['status'] for finding in report['findings']]
+
+
+def test_keeping_up(session):
+    report = analyze_replication_metrics(get_series(session, {
+        'OldestReplicationSlotLag': [50 * 1024 ** 2] * 10,
+        'TransactionLogsGeneration': [100 * 1024] * 10,
+        'FreeStorageSpace': [80 * GB] * 10,
+        'CPUUtilization': [20] * 10,
+    }))
+
+    assert report['status'] == 'ok'
+    assert report['headroom']['cdc_read_rate_bytes_per_s'] == 100 * 1024
+    assert report['headroom']['estimated_max_wal_rate_bytes_per_s'] == 500 * 1024
+
+
+def test_lag_growing_faster_than_half_the_wal_rate(session):
+    # the lag grows 1MB a minute while the database writes 10kB/s of WAL
+    report = analyze_replication_metrics(get_series(session, {
+        'OldestReplicationSlotLag': [minute * 1024 ** 2 for minute in range(10)],
+        'TransactionLogsGeneration': [10 * 1024] * 10,
+    }))
+
+    assert report['status'] == 'warning'
+    assert report['findings'][0]['status'] == 'warning'
+    assert 'grows 17.1kB/s' in report['findings'][0]['message']
+    # CDC reads nothing while the lag grows faster than the WAL is written
+    assert report['headroom']['cdc_read_rate_bytes_per_s'] == 0
+
+
+def test_retained_wal_exhausting_the_storage(session):
+    # the slots retain 1GB more every minute with 10GB of free storage left
+    report = analyze_replication_metrics(get_series(session, {
+        'OldestReplicationSlotLag': [50 * 1024 ** 2] * 10,
+        'ReplicationSlotDiskUsage': [minute * GB for minute in range(10)],
+        'TransactionLogsGeneration': [100 * 1024] * 10,
+        'FreeStorageSpace': [10 * GB] * 10,
+    }))
+
+    assert report['status'] == 'error'
+    # 10GB at 1GB a minute
+    assert report['hours_to_storage_full'] == pytest.approx(10 / 60)
+    assert 'error' in statuses(report)
+
+
+def test_no_data_is_not_ok(session):
+    report = analyze_replication_metrics(get_series(session, {}))
+
+    assert report['status'] == 'warning'
+    assert statuses(report) == ['unknown', 'unknown']
+    assert report['headroom'] is None
+
+
+def test_missing_wal_generation_is_a_warning(session):
+    report = analyze_replication_metrics(get_series(session, {'OldestReplicationSlotLag': [50 * 1024 ** 2] * 10}))
+
+    assert report['status'] == 'warning'
+    assert statuses(report) == ['ok', 'unknown']
+
+
+def test_check_without_data_is_not_keeping_up(session):
+    db_utils = DatabaseUtils(session)
+    with Stubber(db_utils.cloudwatch) as cloudwatch:
+        cloudwatch.add_response('get_metric_data', {'MetricDataResults': []})
+        outcome = DatabaseChecks(session, 'orders', db_utils).check_replication_metrics()
+
+    assert outcome.status == 'warning'
+    assert outcome.explanation.startswith('No replication slot lag reported')
@@ -0,0 +1,58 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from checks.utils.resource_cache import ResourceCache
+
+
+def test_concurrent_callers_wait_for_a_single_load():
+    cache = ResourceCache()
+    loads = []
+
+    def load() -> str:
+        loads.append(threading.current_thread().name)
+        time.sleep(0.05)
+        return 'vpc-1'
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        values = list(executor.map(lambda _: cache.get(('ec2', 'describe_vpcs'), load), range(8)))
+
+    assert values == ['vpc-1'] * 8
+    assert len(loads) == 1
+    assert cache.key_locks == {}
+
+
+def test_key_locks_do_not_grow_with_the_keys():
+    cache = ResourceCache()
+    for cycle in range(3):
+        for index in range(100):
+            cache.get(('rds', 'describe_db_instances', f'db-{index}'), lambda: {'cycle': cycle})
+        cache.invalidate()
+
+    assert cache.key_locks == {}
+
+
+def test_invalidate_drops_the_lock_of_a_failed_load():
+    cache = ResourceCache()
+
+    def fail():
+        raise RuntimeError('throttled')
+
+    with pytest.raises(RuntimeError):
+        cache.get(('kafka', 'list_nodes', 'orders'), fail)
+    cache.invalidate(('kafka',))
+
+    assert cache.key_locks == {}
+    assert cache.get(('kafka', 'list_nodes', 'orders'), lambda: []) == []
+
+
+def test_invalidate_keeps_pinned_entries():
+    cache = ResourceCache()
+    cache.set(('dns', 'b-1.orders'), '10.0.0.1', pin=True)
+    cache.set(('ec2', 'describe_subnets'), ['subnet-1'])
+    cache.invalidate()
+
+    assert cache.contains(('dns', 'b-1.orders'))
+    assert not cache.contains(('ec2', 'describe_subnets'))
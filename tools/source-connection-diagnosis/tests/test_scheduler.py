@@ -0,0 +1,71 @@
+import io
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from checks.utils.result_utils import CheckOutcome, ResultWriter, worst_outcome
+from checks.utils.scheduler import CheckScheduler
+
+
+def run_checks(*checks) -> tuple[dict, dict[str, dict]]:
+    stream = io.StringIO()
+    scheduler = CheckScheduler(max_workers=4, target='db-1', result_writer=ResultWriter(stream))
+    for name, func, depends_on in checks:
+        scheduler.add_check(name, func, depends_on=depends_on)
+    results = scheduler.run()
+    return results, {record['check']: record for record in map(json.loads, stream.getvalue().splitlines())}
+
+
+def test_outcomes_and_details_are_recorded():
+    def check_parts() -> CheckOutcome:
+        # the parts run on threads of their own, the outcome doesn't depend on the thread that logs
+        def check_part(part: int) -> CheckOutcome:
+            if part == 2:
+                return CheckOutcome('failing', f'Part {part} on {threading.current_thread().name} is broken')
+            return CheckOutcome('passing', f'Part {part} works')
+
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            outcomes = list(executor.map(check_part, range(3)))
+        return worst_outcome(outcomes, {'parts': [outcome.status for outcome in outcomes]})
+
+    results, records = run_checks(
+        ('eni', lambda: 'eni-1', None),
+        ('parts', check_parts, None),
+        ('uses_eni', lambda eni: CheckOutcome('warning', f'Looked at {eni}', {'eni': eni}), ['eni']),
+    )
+
+    assert records['eni']['status'] == 'passing'
+    assert records['eni']['details'] == 'eni-1'
+    assert records['parts']['status'] == 'failing'
+    assert records['parts']['explanation'].startswith('Part 2 on ')
+    assert records['parts']['details'] == {'parts': ['passing', 'passing', 'failing']}
+    assert records['uses_eni']['status'] == 'warning'
+    assert records['uses_eni']['details'] == {'eni': 'eni-1'}
+    # the checks depending on a check receive its details
+    assert results['uses_eni'] == {'eni': 'eni-1'}
+
+
+def test_lookup_finding_nothing_fails_and_errors_skip_dependents():
+    def broken() -> CheckOutcome:
+        raise RuntimeError('boom')
+
+    _, records = run_checks(
+        ('eni', lambda: None, None),
+        ('broken', broken, None),
+        ('after_broken', lambda broken: CheckOutcome('passing', 'unreachable'), ['broken']),
+    )
+
+    assert records['eni']['status'] == 'failing'
+    assert records['broken'] == {**records['broken'], 'status': 'failing', 'explanation': 'boom'}
+    assert records['after_broken']['status'] == 'skipped'
+
+
+def test_result_writer_overwrites_unless_appending(tmp_path):
+    path = str(tmp_path / 'results.ndjson')
+    for append in (False, False, True):
+        writer = ResultWriter.open(path, append)
+        writer.write({'check': 'database'})
+        writer.close()
+
+    with open(path, encoding='utf-8') as f:
+        assert len(f.readlines()) == 2
@@ -0,0 +1,57 @@
+import datetime
+
+import pytest
+from botocore.credentials import AssumeRoleCredentialFetcher, DeferredRefreshableCredentials
+
+from checks.utils.sweep_utils import create_sweep_session, parse_sweep_target
+
+ROLE_ARN = 'arn:aws:iam::123456789012:role/diagnosis'
+
+
+@pytest.fixture(autouse=True)
+def default_credentials(monkeypatch):
+    monkeypatch.delenv('AWS_PROFILE', raising=False)
+    monkeypatch.setenv('AWS_CONFIG_FILE', '/dev/null')
+    monkeypatch.setenv('AWS_SHARED_CREDENTIALS_FILE', '/dev/null')
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+
+
+def test_parse_sweep_target():
+    assert parse_sweep_target('us-west-2') == {'region': 'us-west-2', 'profile': None, 'role_arn': None}
+    assert parse_sweep_target('us-west-2:prod') == {'region': 'us-west-2', 'profile': 'prod', 'role_arn': None}
+    assert parse_sweep_target(f'us-west-2:{ROLE_ARN}') == {'region': 'us-west-2', 'profile': None, 'role_arn': ROLE_ARN}
+    assert parse_sweep_target(f'us-west-2:prod:{ROLE_ARN}') == {'region': 'us-west-2', 'profile': 'prod',
+                                                                'role_arn': ROLE_ARN}
+    with pytest.raises(ValueError):
+        parse_sweep_target('us-west-2:arn:aws:iam::123456789012:user/diagnosis')
+
+
+def test_sweep_session_assumes_the_role_again_before_it_expires(monkeypatch):
+    fetches = []
+
+    def fetch_credentials(self) -> dict:
+        fetches.append(self._role_arn)
+        # inside the window botocore refreshes in, so every use assumes the role again
+        expiry = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(minutes=5)
+        return {'access_key': f'role-{len(fetches)}', 'secret_key': 'secret', 'token': 'token',
+                'expiry_time': expiry.isoformat()}
+
+    monkeypatch.setattr(AssumeRoleCredentialFetcher, 'fetch_credentials', fetch_credentials)
+    session = create_sweep_session({'region': 'eu-west-1', 'profile': None, 'role_arn': ROLE_ARN})
+
+    credentials = session.get_credentials()
+    assert isinstance(credentials, DeferredRefreshableCredentials)
+    # the role is only assumed once the credentials are used
+    assert fetches == []
+    assert credentials.get_frozen_credentials().access_key == 'role-1'
+    assert credentials.get_frozen_credentials().access_key == 'role-2'
+    assert fetches == [ROLE_ARN, ROLE_ARN]
+    assert session.region_name == 'eu-west-1'
+
+
+def test_sweep_session_without_a_role_uses_the_default_credentials():
+    session = create_sweep_session({'region': 'eu-west-1', 'profile': None, 'role_arn': None})
+
+    assert session.get_credentials().get_frozen_credentials().access_key == 'testing'
+    assert session.region_name == 'eu-west-1'